@@ -0,0 +1,91 @@
+"""
+Measures how long it takes to get a usable browser:
+cold start (no cached driver or profile template), warm start (cached driver and
+seeded profile) and restart_driver() with and without a spare browser.
+
+    python benchmarks/driver_startup.py --runs 3
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from driver_cache import DRIVER_CACHE_DIR, PROFILE_DIR
+from selenium_utils import SeleniumHandler
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def first_page(handler):
+    handler.driver.get("about:blank")
+    return handler
+
+
+def start_handler(**options):
+    return first_page(SeleniumHandler(headless=True, use_search_cache=False, **options))
+
+
+def bench_cold(runs):
+    times = []
+    for _ in range(runs):
+        shutil.rmtree(DRIVER_CACHE_DIR, ignore_errors=True)
+        shutil.rmtree(PROFILE_DIR, ignore_errors=True)
+        elapsed, handler = timed(lambda: start_handler())
+        handler.close()
+        times.append(elapsed)
+    return times
+
+
+def bench_warm(runs):
+    # One start to populate the driver cache and the profile template
+    start_handler().close()
+    times = []
+    for _ in range(runs):
+        elapsed, handler = timed(lambda: start_handler())
+        handler.close()
+        times.append(elapsed)
+    return times
+
+
+def bench_restart(runs, keep_spare):
+    handler = start_handler(keep_spare=keep_spare)
+    times = []
+    for _ in range(runs):
+        # Give the spare the time it would have during normal row processing
+        if keep_spare and handler._spare_thread is not None:
+            handler._spare_thread.join()
+        elapsed, _ = timed(lambda: (handler.restart_driver(), first_page(handler)))
+        times.append(elapsed)
+    handler.close()
+    return times
+
+
+def report(name, times):
+    print(f"{name:<24} median {statistics.median(times):6.2f}s  "
+          f"min {min(times):6.2f}s  max {max(times):6.2f}s  (n={len(times)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Chrome startup and restart times")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--skip-cold", action="store_true",
+                        help="Keep the existing driver cache and profiles")
+    args = parser.parse_args()
+
+    if not args.skip_cold:
+        report("cold start", bench_cold(args.runs))
+    report("warm start", bench_warm(args.runs))
+    report("restart", bench_restart(args.runs, keep_spare=False))
+    report("restart with spare", bench_restart(args.runs, keep_spare=True))
+
+
+if __name__ == "__main__":
+    main()
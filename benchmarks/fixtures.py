@@ -0,0 +1,217 @@
+"""
+Synthetic hospital web for offline benchmarks.
+
+Every hospital site gets its own HTTP server on 127.0.0.1 (the pipeline groups rows by
+scheme://netloc, so sites need distinct ports), plus one server that answers Bing-style
+result pages. Sites are generated deterministically from a seed and cover:
+cms-hpt.txt files of several sizes, 404 and soft-404 cms-hpt.txt, bot-blocked files,
+slow homepages and homepages without a price transparency link.
+"""
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+
+# What /cms-hpt.txt returns
+CMS_FILE = "file"
+CMS_NOT_FOUND = "404"
+CMS_SOFT_404 = "soft404"
+CMS_BLOCKED = "blocked"
+
+CMS_SIZES = [1, 5, 50, 500, 5000]
+
+SAINTS = ["Saint Mary", "Saint Joseph", "Good Samaritan", "Mercy", "Providence", "Sacred Heart",
+          "Valley View", "Mountain Vista", "Lakeside", "Pioneer", "Summit", "Heritage", "Riverbend"]
+KINDS = ["Medical Center", "Hospital", "Regional Hospital", "Community Hospital",
+         "Memorial Hospital", "Health Center", "Surgical Hospital", "Behavioral Health"]
+CITIES = ["Denver", "Aurora", "Boulder", "Pueblo", "Greeley", "Durango", "Montrose", "Salida",
+          "Longmont", "Loveland", "Lamar", "Sterling", "Trinidad", "Delta", "Craig"]
+
+SOFT_404_PAGE = "<html><head><title>Page Not Found</title></head><body><h1>Sorry, that page does not exist.</h1></body></html>"
+CHALLENGE_PAGE = "<html><head><title>Just a moment...</title></head><body>Checking your browser. Verify you are human.</body></html>"
+
+
+class Site:
+    def __init__(self, number, rng):
+        self.number = number
+        self.system = f"{rng.choice(SAINTS)} Health {number}"
+        self.port = None
+        self.delay = rng.choice([0, 0, 0, 0.25, 1.0])
+        self.has_price_page = rng.random() > 0.1
+        self.cms = rng.choices([CMS_FILE, CMS_NOT_FOUND, CMS_SOFT_404, CMS_BLOCKED], [6, 2, 1, 1])[0]
+        self.cms_size = CMS_SIZES[number % len(CMS_SIZES)]
+
+        facility_count = rng.randint(1, 3)
+        self.facilities = [
+            {'name': f"{self.system} {rng.choice(KINDS)} {rng.choice(CITIES)}", 'city': rng.choice(CITIES)}
+            for _ in range(facility_count)
+        ]
+        self.rng = random.Random(number)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def mrf_path(self, location):
+        return f"/mrf/{self.number:05d}-{location}_standardcharges.json"
+
+    def cms_txt(self):
+        names = [facility['name'] for facility in self.facilities]
+        # Fill larger files with other locations of the same system
+        while len(names) < self.cms_size:
+            names.append(f"{self.system} Clinic {len(names)} {self.rng.choice(CITIES)}")
+        entries = []
+        for location, name in enumerate(names):
+            entries.append(
+                f"location-name: {name}\n"
+                f"source-page-url: {self.url}/price-transparency\n"
+                f"mrf-url: {self.url}{self.mrf_path(location)}\n"
+                f"last-updated-on: 2025-07-01\n"
+            )
+        return "\n".join(entries)
+
+    def homepage(self):
+        links = ['<a href="/about">About Us</a>', '<a href="/careers">Careers</a>', '<a href="/billing">Billing</a>']
+        if self.has_price_page:
+            links.append('<a href="/price-transparency">Price Transparency</a>')
+        filler = "".join(f"<p>{self.system} cares for patients across Colorado. Section {i}.</p>" for i in range(40))
+        return f"<html><head><title>{self.system}</title></head><body><nav>{' '.join(links)}</nav>{filler}</body></html>"
+
+    def price_page(self):
+        links = [
+            f'<a href="{self.mrf_path(0)}">Download standard charges (JSON)</a>',
+            '<a href="/files/patient-rights.pdf">Patient rights</a>',
+            '<a href="/estimate">Shoppable services estimator</a>',
+            '<a href="/files/financial-assistance.pdf">Financial assistance</a>',
+        ]
+        return f"<html><head><title>Price Transparency</title></head><body><ul>{''.join(f'<li>{link}</li>' for link in links)}</ul></body></html>"
+
+
+class FixtureWeb:
+    """Starts the SERP server and one server per site; use as a context manager"""
+
+    def __init__(self, site_count=30, seed=7):
+        rng = random.Random(seed)
+        self.sites = [Site(number, rng) for number in range(site_count)]
+        self.servers = []
+        self.serp_port = None
+        self.queries = {}
+
+    def __enter__(self):
+        for site in self.sites:
+            site.port = self._serve(self._site_handler(site))
+        for site in self.sites:
+            for facility in site.facilities:
+                self.queries[normalize(f"{facility['name']} {facility['city']}")] = site
+        self.serp_port = self._serve(self._serp_handler())
+        return self
+
+    def __exit__(self, *exc):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    @property
+    def serp_url(self):
+        return f"http://127.0.0.1:{self.serp_port}/search"
+
+    def rows(self):
+        """Input rows in the same columns as test.csv"""
+        rows = []
+        for site in self.sites:
+            for facility in site.facilities:
+                rows.append({
+                    'Facility ID': f"{site.number:04d}{len(rows):04d}",
+                    'Facility Name': facility['name'],
+                    'City/Town': facility['city'],
+                    'State': "CO",
+                })
+        return pd.DataFrame(rows)
+
+    def _serve(self, handler):
+        server = QuietServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.servers.append(server)
+        return server.server_address[1]
+
+    def _site_handler(self, site):
+        class Handler(QuietHandler):
+            def do_GET(self):
+                path = urlparse(self.path).path
+                if path in ("/", "/index.html"):
+                    time.sleep(site.delay)
+                    self.send(200, site.homepage())
+                elif path == "/price-transparency" and site.has_price_page:
+                    self.send(200, site.price_page())
+                elif path == "/cms-hpt.txt":
+                    time.sleep(site.delay)
+                    if site.cms == CMS_FILE:
+                        self.send(200, site.cms_txt(), "text/plain")
+                    elif site.cms == CMS_SOFT_404:
+                        self.send(200, SOFT_404_PAGE)
+                    elif site.cms == CMS_BLOCKED:
+                        self.send(403, CHALLENGE_PAGE)
+                    else:
+                        self.send(404, SOFT_404_PAGE)
+                elif path.startswith("/mrf/"):
+                    self.send(200, '{"hospital_name": "%s", "standard_charge_information": []}' % site.system,
+                              "application/json")
+                else:
+                    self.send(404, SOFT_404_PAGE)
+        return Handler
+
+    def _serp_handler(self):
+        web = self
+
+        class Handler(QuietHandler):
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query).get("q", [""])[0]
+                site = web.queries.get(normalize(query))
+                self.send(200, serp_page(query, site))
+        return Handler
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients that only read headers (check_url streams) close the connection early
+        pass
+
+
+class QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def send(self, status, body, content_type="text/html"):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def normalize(query):
+    return " ".join(query.lower().split())
+
+
+def serp_page(query, site):
+    """A results page with the parts serp_parser reads: the Website button and organic results"""
+    results = []
+    website = ""
+    if site is not None:
+        website = f'<div class="b_tpcn"><a href="{site.url}/" aria-label="Website">Website</a></div>'
+        results.insert(0, f'<li class="b_algo"><h2><a href="{site.url}/">{site.system}</a></h2></li>')
+    return (f"<html><head><title>{query} - Search</title></head><body>"
+            f"<ol id=\"b_results\">{website}{''.join(results)}</ol></body></html>")
@@ -0,0 +1,276 @@
+"""
+Offline throughput benchmarks against the synthetic hospital web in fixtures.py.
+
+Suites:
+  http      search, cms-hpt.txt probe, parse and match over plain HTTP (no browser needed)
+  pipeline  main.run_serial, the same two-pass run main.py does
+  cms       get_best_mrf_match_selenium for every facility
+  manual    get_source_mrf_manually for every site
+
+    python benchmarks/run_benchmarks.py --suites http pipeline --sites 30
+    python benchmarks/run_benchmarks.py --suites http --compare benchmarks/results/http-20250701-120000.json
+
+Each suite runs in its own temporary directory, so the search, HTTP and manual-result
+caches start cold and nothing touches the real cache/ or output files. Results are saved
+as JSON in benchmarks/results for comparison with later runs.
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from urllib.parse import urlparse
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import driver_cache
+import http_cache
+import metrics
+import rate_limiter
+import serp_parser
+from benchmarks.fixtures import FixtureWeb
+from cms_parser import iter_cms_records
+from http_utils import CMS_FOUND, check_url, get_session, probe_cms_txt
+from matching import LocationMatcher
+from pipeline import facility_id_for, group_by_root_url, search_query_for
+
+RESULTS_DIR = os.path.join(REPO_DIR, "benchmarks", "results")
+SUITES = ["http", "pipeline", "cms", "manual"]
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+
+class PeakMemory:
+    """Samples the RSS of this process and all its children (Chrome included) in the background"""
+
+    def __init__(self, interval=0.2):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+
+    def _sample(self):
+        process = psutil.Process()
+        total = 0
+        for member in [process] + process.children(recursive=True):
+            try:
+                total += member.memory_info().rss
+            except psutil.Error:
+                continue
+        self.peak_mb = max(self.peak_mb, total / (1024 * 1024))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        if PSUTIL_AVAILABLE:
+            self._sample()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if not PSUTIL_AVAILABLE:
+            # Peak of this process and of waited-for children only; ru_maxrss is in KB on Linux
+            self_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            children_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+            self.peak_mb = (self_kb + children_kb) / 1024
+
+
+def offline_environment(web):
+    """Point search at the fixture SERP server and lift politeness limits meant for real sites"""
+    serp_parser.BING_SEARCH_URL = web.serp_url
+    rate_limiter._limiter = rate_limiter.RateLimiter(
+        policies={}, default_policy={"rate": 1000.0, "capacity": 1000, "jitter": 0})
+    # Keep the patched chromedriver and profile template between suites
+    driver_cache.DRIVER_CACHE_DIR = os.path.join(REPO_DIR, driver_cache.DRIVER_CACHE_DIR)
+    driver_cache.PROFILE_DIR = os.path.join(REPO_DIR, driver_cache.PROFILE_DIR)
+    driver_cache.PROFILE_TEMPLATE = os.path.join(driver_cache.PROFILE_DIR, "template")
+
+
+def new_handler():
+    from selenium_utils import SEARCH_MODE_HTTP, SeleniumHandler
+    return SeleniumHandler(headless=True, use_search_cache=False, search_mode=SEARCH_MODE_HTTP)
+
+
+def run_http(df):
+    """The browser-free part of the pipeline: HTTP search, cms-hpt.txt probe, parse and match"""
+    tracer = metrics.get_metrics()
+    root_urls = {}
+    for i, row in df.iterrows():
+        tracer.start("resolve", [facility_id_for(row, i)])
+        with tracer.stage(metrics.STAGE_SEARCH):
+            response = get_session().get(serp_parser.bing_search_url(search_query_for(row)), timeout=15)
+            results = serp_parser.ranked_results(serp_parser.parse_serp(response.text))
+            root_urls[i] = None
+            for url, _ in results[:4]:
+                status, final_url = check_url(url)
+                if status is not None and status < 400:
+                    parsed = urlparse(final_url)
+                    root_urls[i] = f"{parsed.scheme}://{parsed.netloc}"
+                    break
+        tracer.finish("ok" if root_urls[i] else "not_found")
+
+    for root_url, indices in group_by_root_url(root_urls).items():
+        if not root_url:
+            continue
+        tracer.start("domain", [facility_id_for(df.loc[i], i) for i in indices], root_url=root_url)
+        with tracer.stage(metrics.STAGE_CMS_PROBE):
+            state, _, text = probe_cms_txt(f"{root_url}/cms-hpt.txt")
+        if state == CMS_FOUND:
+            with tracer.stage(metrics.STAGE_CMS_PARSE):
+                matcher = LocationMatcher(iter_cms_records(text.splitlines()))
+                matcher.match([df.loc[i, 'Facility Name'] for i in indices],
+                              cities=[df.loc[i, 'City/Town'] for i in indices])
+        tracer.finish(state)
+
+
+def run_pipeline(df):
+    from main import run_serial
+    from result_journal import ResultJournal
+
+    journal = ResultJournal("journal.jsonl", resume=False)
+    try:
+        run_serial(df, journal, {}, {'use_search_cache': False, 'search_mode': "http"},
+                   {'max_error_rate': 1.0, 'max_consecutive': 0})
+    finally:
+        journal.close()
+
+
+def run_cms(df, web):
+    from get_source_and_mrf_cms_txt import get_best_mrf_match_selenium
+
+    tracer = metrics.get_metrics()
+    handler = new_handler()
+    try:
+        site_of = {facility['name']: site for site in web.sites for facility in site.facilities}
+        for i, row in df.iterrows():
+            tracer.start("cms", [facility_id_for(row, i)])
+            site = site_of[row['Facility Name']]
+            match = get_best_mrf_match_selenium(handler, f"{site.url}/cms-hpt.txt", row['Facility Name'])
+            tracer.finish("found" if match else "missing")
+    finally:
+        handler.close()
+
+
+def run_manual(df, web):
+    tracer = metrics.get_metrics()
+    handler = new_handler()
+    try:
+        for site in web.sites:
+            tracer.start("manual", [site.number], root_url=site.url)
+            with tracer.stage(metrics.STAGE_MANUAL):
+                source, mrf = handler.get_source_mrf_manually(site.url, site.system)
+            tracer.finish("found" if mrf and mrf != "MRF Link Not Found" else "missing")
+    finally:
+        handler.close()
+
+
+def run_suite(name, web):
+    df = web.rows()
+    workdir = tempfile.mkdtemp(prefix=f"mrf-bench-{name}-")
+    previous_dir = os.getcwd()
+    os.chdir(workdir)
+    # Fresh process-wide caches and trace inside the suite's directory
+    http_cache._cache = None
+    metrics._metrics = metrics.RunMetrics(os.path.join(workdir, "run_trace.jsonl"))
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        with PeakMemory() as memory:
+            if name == "http":
+                run_http(df)
+            elif name == "pipeline":
+                run_pipeline(df)
+            elif name == "cms":
+                run_cms(df, web)
+            else:
+                run_manual(df, web)
+    finally:
+        elapsed = time.perf_counter() - start
+        _, python_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        os.chdir(previous_dir)
+
+    summary = metrics.summarize(metrics.load_trace(os.path.join(workdir, "run_trace.jsonl")))
+    rows = len(web.sites) if name == "manual" else len(df)
+    return {
+        'suite': name,
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'sites': len(web.sites),
+        'rows': rows,
+        'elapsed': elapsed,
+        'rows_per_minute': rows / elapsed * 60 if elapsed else 0.0,
+        'peak_rss_mb': memory.peak_mb,
+        'python_peak_mb': python_peak / (1024 * 1024),
+        'stages': {stage: {'count': stats['count'], 'sum': stats['sum'],
+                           **{f"p{round(q * 100)}": value for q, value in stats['quantiles'].items()}}
+                   for stage, stats in summary['stages'].items() if stats['count']},
+        'events': summary['events'],
+        'statuses': summary['statuses'],
+        'workdir': workdir,
+    }
+
+
+def print_result(result, baseline=None):
+    def change(new, old):
+        if not old:
+            return ""
+        return f" ({(new - old) / old:+.0%})"
+
+    base_stages = (baseline or {}).get('stages', {})
+    print(f"\n== {result['suite']}: {result['rows']} rows in {result['elapsed']:.1f}s")
+    print(f"rows/min      {result['rows_per_minute']:10.1f}{change(result['rows_per_minute'], (baseline or {}).get('rows_per_minute'))}")
+    print(f"peak RSS MB   {result['peak_rss_mb']:10.1f}{change(result['peak_rss_mb'], (baseline or {}).get('peak_rss_mb'))}")
+    print(f"python MB     {result['python_peak_mb']:10.1f}")
+    for stage, stats in result['stages'].items():
+        old = base_stages.get(stage, {})
+        print(f"{stage:<14}" + "".join(
+            f" {key} {stats[key]:7.3f}s{change(stats[key], old.get(key))}" for key in ("p50", "p95", "p99")))
+    print("status: " + ", ".join(f"{status}={count}" for status, count in result['statuses'].items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline against a local fixture web")
+    parser.add_argument("--suites", nargs="+", choices=SUITES, default=["http"])
+    parser.add_argument("--sites", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--compare", help="Earlier result file (or directory of them) to compare against")
+    parser.add_argument("--no-save", action="store_true")
+    args = parser.parse_args()
+
+    baselines = {}
+    if args.compare:
+        paths = ([os.path.join(args.compare, name) for name in sorted(os.listdir(args.compare))]
+                 if os.path.isdir(args.compare) else [args.compare])
+        for path in paths:
+            with open(path) as fh:
+                baseline = json.load(fh)
+            baselines[baseline['suite']] = baseline
+
+    with FixtureWeb(args.sites, args.seed) as web:
+        offline_environment(web)
+        for name in args.suites:
+            result = run_suite(name, web)
+            print_result(result, baselines.get(name))
+            if not args.no_save:
+                os.makedirs(RESULTS_DIR, exist_ok=True)
+                path = os.path.join(RESULTS_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+                with open(path, "w") as fh:
+                    json.dump(result, fh, indent=2)
+                print(f"Saved {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urljoin, urlparse
+import pandas as pd
+from http_utils import CMS_BLOCKED, get_session, probe_cms_txt
+
+
+CMS_PROBE_RESULTS = "cms_probe_results.csv"
+CMS_PROBE_ERROR = "error"
+
+
+def root_url_of(url):
+    """Return scheme://netloc for a URL, or None for anything that isn't http(s)"""
+    if not isinstance(url, str) or not url.startswith(('http://', 'https://')):
+        return None
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+async def probe_domain(root_url, global_limit, host_limits, timeout):
+    cms_url = urljoin(root_url, "cms-hpt.txt")
+    host = urlparse(root_url).netloc
+
+    async with global_limit, host_limits[host]:
+        try:
+            # requests is blocking; run it on the executor and bound the total wait. The thread
+            # cannot be cancelled, so probe_cms_txt gives up on its own at the same deadline.
+            state, status_code, _ = await asyncio.wait_for(
+                asyncio.to_thread(probe_cms_txt, cms_url, timeout, max_seconds=timeout + 5), timeout + 6
+            )
+        except asyncio.TimeoutError:
+            state, status_code = CMS_PROBE_ERROR, None
+
+    # A transport failure is not proof the file is blocked, keep it retryable
+    if state == CMS_BLOCKED and status_code is None:
+        state = CMS_PROBE_ERROR
+
+    return {
+        'root_url': root_url,
+        'cms_url': cms_url,
+        'state': state,
+        'status_code': status_code,
+        'checked_at': datetime.now(timezone.utc).isoformat(),
+    }
+
+
+async def probe_domains(root_urls, concurrency=50, per_host=2, timeout=15):
+    """Probe cms-hpt.txt for every root URL with bounded global and per-host concurrency"""
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+    get_session(pool_size=concurrency)
+
+    global_limit = asyncio.Semaphore(concurrency)
+    host_limits = defaultdict(lambda: asyncio.Semaphore(per_host))
+
+    tasks = [probe_domain(url, global_limit, host_limits, timeout) for url in root_urls]
+    results = []
+    for done, task in enumerate(asyncio.as_completed(tasks), start=1):
+        result = await task
+        results.append(result)
+        if done % 100 == 0 or done == len(tasks):
+            print(f"Probed {done}/{len(tasks)} domains")
+    return results
+
+
+def discover(root_urls, output=CMS_PROBE_RESULTS, concurrency=50, per_host=2, timeout=15):
+    """Probe all unique root URLs and write the results table"""
+    unique = sorted({url for url in (root_url_of(u) for u in root_urls) if url})
+    results = asyncio.run(probe_domains(unique, concurrency, per_host, timeout))
+    df = pd.DataFrame(results, columns=['root_url', 'cms_url', 'state', 'status_code', 'checked_at'])
+    df.sort_values('root_url').to_csv(output, index=False)
+    return df
+
+
+def load_probe_results(path=CMS_PROBE_RESULTS):
+    """Return {root_url: state} from a previous discovery run, or {} if none exists"""
+    if not os.path.exists(path):
+        return {}
+    df = pd.read_csv(path)
+    return dict(zip(df['root_url'], df['state']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-probe cms-hpt.txt for every known hospital domain")
+    parser.add_argument("input", help="CSV file with hospital URLs (e.g. output_links.csv)")
+    parser.add_argument("--column", default="Hospital Link", help="Column holding the hospital URL")
+    parser.add_argument("--output", default=CMS_PROBE_RESULTS)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--per-host", type=int, default=2)
+    parser.add_argument("--timeout", type=float, default=15)
+    args = parser.parse_args()
+
+    start_time = time.time()
+    urls = pd.read_csv(args.input)[args.column].tolist()
+    df = discover(urls, args.output, args.concurrency, args.per_host, args.timeout)
+
+    print(df['state'].value_counts().to_string())
+    print(f"Results saved to {args.output}")
+    print(f"Execution Time: {time.time() - start_time:.2f} seconds")
+
+
+if __name__ == '__main__':
+    main()
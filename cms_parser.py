@@ -0,0 +1,95 @@
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+
+def normalize(text):
+    text = text.lower()
+    text = re.sub(r"[^\w\s]", "", text)  # Remove punctuation
+    return set(text.split())
+
+
+@dataclass
+class LocationRecord:
+    location_name: str = ""
+    source_page_url: str = ""
+    mrf_url: str = ""
+    last_updated_on: str = ""
+    extra: dict = field(default_factory=dict)
+
+    KNOWN_KEYS = {
+        "location-name": "location_name",
+        "source-page-url": "source_page_url",
+        "mrf-url": "mrf_url",
+        "last-updated-on": "last_updated_on",
+    }
+
+    @classmethod
+    def from_fields(cls, fields):
+        record = cls()
+        for key, value in fields.items():
+            attr = cls.KNOWN_KEYS.get(key)
+            if attr:
+                setattr(record, attr, value)
+            else:
+                record.extra[key] = value
+        return record
+
+    def links(self):
+        return (self.source_page_url, self.mrf_url)
+
+
+def iter_cms_records(lines):
+    """
+    Stream LocationRecords out of cms-hpt.txt lines.
+    lines can be any iterable (a list, an open file, response.iter_lines(decode_unicode=True)),
+    so large multi-location files are never held in memory as a whole.
+    A record ends at a blank line or when the next location-name: line starts.
+    """
+    fields = {}
+
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="replace")
+        line = line.strip()
+
+        if not line:
+            if fields:
+                yield LocationRecord.from_fields(fields)
+            fields = {}
+            continue
+
+        if line.lower().startswith("location-name:") and fields:
+            yield LocationRecord.from_fields(fields)
+            fields = {}
+
+        if ":" in line:
+            key, value = line.split(":", 1)
+            fields[key.strip().lower()] = value.strip()
+
+    if fields:
+        yield LocationRecord.from_fields(fields)
+
+
+class LocationIndex:
+    """
+    Inverted token index over location-name.
+    Matchers only score records that share at least one token with the query (see
+    matching.LocationMatcher), so matching many facilities against large multi-location
+    files stays cheap.
+    """
+
+    def __init__(self, records=()):
+        self.records = []
+        self.postings = defaultdict(list)
+        for record in records:
+            self.add(record)
+
+    def add(self, record):
+        record_id = len(self.records)
+        self.records.append(record)
+        for token in normalize(record.location_name):
+            self.postings[token].append(record_id)
+
+    def __len__(self):
+        return len(self.records)
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import undetected_chromedriver as uc
+
+
+DRIVER_CACHE_DIR = os.path.join("cache", "chromedriver")
+PROFILE_DIR = os.path.join("cache", "profiles")
+PROFILE_TEMPLATE = os.path.join(PROFILE_DIR, "template")
+
+# Lock files, caches and logs are not worth copying between profiles
+PROFILE_IGNORE = shutil.ignore_patterns(
+    "Singleton*", "*.lock", "lockfile", "Cache", "Code Cache", "GPUCache", "ShaderCache",
+    "GrShaderCache", "Crashpad", "*.log", "*.tmp",
+)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cached_driver_path(version_main):
+    name = "chromedriver.exe" if os.name == "nt" else "chromedriver"
+    return os.path.abspath(os.path.join(DRIVER_CACHE_DIR, str(version_main), name))
+
+
+def is_cached_driver_valid(path, version_main):
+    """The cached binary exists, was built for version_main, is unchanged and still patched"""
+    meta_path = path + ".json"
+    if not os.path.exists(path) or not os.path.exists(meta_path):
+        return False
+    try:
+        with open(meta_path) as fh:
+            meta = json.load(fh)
+    except (OSError, ValueError):
+        return False
+    if meta.get("version_main") != version_main or meta.get("sha256") != _sha256(path):
+        return False
+    return uc.Patcher(executable_path=path).is_binary_patched()
+
+
+def get_patched_driver(version_main):
+    """
+    Return the path of an undetected_chromedriver-patched chromedriver for version_main,
+    downloading and patching it only when no valid cached copy exists.
+    Returns None if the driver could not be prepared; callers then let uc do it itself.
+    """
+    path = cached_driver_path(version_main)
+    if is_cached_driver_valid(path, version_main):
+        return path
+
+    try:
+        print(f"Preparing patched chromedriver {version_main}...")
+        patcher = uc.Patcher(version_main=version_main)
+        patcher.auto()
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.copy2(patcher.executable_path, temp_path)
+        os.replace(temp_path, path)
+        with open(path + ".json", "w") as fh:
+            json.dump({"version_main": version_main, "sha256": _sha256(path), "created_at": time.time()}, fh)
+        return path
+    except Exception as e:
+        print(f"Could not cache patched chromedriver: {e}")
+        return None
+
+
+def new_profile_dir(name):
+    """Create a profile directory for one Chrome instance, seeded from the template if there is one"""
+    path = os.path.abspath(os.path.join(PROFILE_DIR, name))
+    if os.path.exists(path):
+        return path
+    if os.path.exists(PROFILE_TEMPLATE):
+        shutil.copytree(PROFILE_TEMPLATE, path, ignore=PROFILE_IGNORE)
+    else:
+        os.makedirs(path, exist_ok=True)
+    return path
+
+
+def save_profile_template(profile_dir):
+    """Keep a closed, initialized profile as the seed for future instances"""
+    if os.path.exists(PROFILE_TEMPLATE) or not profile_dir or not os.path.exists(profile_dir):
+        return
+    temp_path = f"{PROFILE_TEMPLATE}.{os.getpid()}.tmp"
+    try:
+        shutil.copytree(profile_dir, temp_path, ignore=PROFILE_IGNORE)
+        os.rename(temp_path, PROFILE_TEMPLATE)
+    except OSError:
+        # Another process saved a template first
+        shutil.rmtree(temp_path, ignore_errors=True)
+
+
+def remove_profile_dir(profile_dir):
+    if profile_dir:
+        shutil.rmtree(profile_dir, ignore_errors=True)
@@ -1,36 +1,64 @@
 import time
-import re
 import pandas as pd
-from selenium_utils import SeleniumHandler
+from selenium_utils import WAIT_LOAD_COMPLETE, SeleniumHandler, page_exists
 from selenium.webdriver.common.by import By
+from http_utils import CMS_BLOCKED, CMS_FOUND, CMS_MISSING, fetch_cms_txt, looks_like_cms_txt
+from cms_parser import iter_cms_records
+from matching import DEFAULT_MIN_OVERLAP, LocationMatcher
+from http_cache import get_cache
 
-def normalize(text):
-    text = text.lower()
-    text = re.sub(r"[^\w\s]", "", text)  # Remove punctuation
-    return set(text.split())
+def get_best_mrf_match_selenium(selenium_handler, url, hospital_name, min_overlap=DEFAULT_MIN_OVERLAP,
+                                probe_state=None):
+    """
+    Finds the best (source-page-url, mrf-url) match from a CMS .txt file with the pipeline's LocationMatcher.
+    Returns False if the file does not exist.
+    probe_state is the result of a previous cms_discovery run for this domain, if any.
+    """
+    lines = fetch_cms_lines(selenium_handler, url, probe_state)
+    if lines is False:
+        return False
+    return match_cms_records(lines, hospital_name, min_overlap)
 
-def get_best_mrf_match_selenium(selenium_handler, url, hospital_name, min_overlap=2):
+
+def fetch_cms_lines(selenium_handler, url, probe_state=None):
     """
-    Finds the best (source-page-url, mrf-url) match from a CMS .txt file based on keyword overlap.
-    Uses Selenium instead of requests to avoid 403 errors.
-    First checks if the URL exists, returns False if not found.
+    Returns the lines of a CMS .txt file, or False if it does not exist.
+    Tries a plain HTTP request first and only uses Selenium when the request is
+    blocked (403s, bot challenges) to avoid loading every text file in Chrome.
     """
-    # First check if the CMS URL exists
-    if not selenium_handler.url_exists_selenium(url):
+    if probe_state == CMS_MISSING:
+        print(f"CMS URL not found (discovery): {url}")
+        return False
+
+    if probe_state == CMS_BLOCKED:
+        entry = get_cache().get(url)
+        if get_cache().is_fresh(entry):
+            return entry['body'].splitlines()
+    else:
+        state, text_content = fetch_cms_txt(url)
+        if state == CMS_FOUND:
+            return text_content.splitlines()
+        if state != CMS_BLOCKED:
+            print(f"CMS URL not found: {url}")
+            return False
+
+    # Load the file once and check the real status of that same response
+    try:
+        response = selenium_handler.fetch_page(url, WAIT_LOAD_COMPLETE)
+    except Exception as e:
+        print(f"Error fetching file from {url}: {e}")
+        return False
+
+    if not page_exists(response, selenium_handler.driver.title):
         print(f"CMS URL not found: {url}")
         return False
     
     try:
-        # Use Selenium to get the content instead of requests
-        selenium_handler.driver.get(url)
-        time.sleep(3)  # Give page time to load
-        selenium_handler.wait_for_page_load()
-        
-        # Get the page source (text content)
-        page_source = selenium_handler.driver.page_source
+        page_source = response['body']
         
         try:
-            if '<pre>' in page_source or page_source.count('<') < 10:  # Likely a plain text file
+            if (response['content_type'].startswith('text/plain') or '<pre>' in page_source
+                    or page_source.count('<') < 10):  # Likely a plain text file
                 # Extract text from <pre> tags or get all text
                 text_content = selenium_handler.driver.find_element(By.TAG_NAME, 'body').text
             else:
@@ -38,45 +66,29 @@ def get_best_mrf_match_selenium(selenium_handler, url, hospital_name, min_overla
         except:
             text_content = page_source
         
-        lines = text_content.splitlines()        
+        # A challenge page the browser rendered must not be served from the cache later
+        if looks_like_cms_txt(text_content):
+            get_cache().put(url, text_content)
+        return text_content.splitlines()
     except Exception as e:
         print(f"Error fetching file from {url}: {e}")
         return False
 
-    hospital_words = normalize(hospital_name)
-    best_match = None
-    max_overlap = 0
-    record = {}
-
-    for line in lines + [""]:  # Forces last record to be processed
-        line = line.strip()
-        if line.lower().startswith("location-name:") and record:
-            location = record.get("location-name", "")
-            location_words = normalize(location)
-            overlap = len(location_words & hospital_words)
-            if overlap >= min_overlap and overlap > max_overlap:
-                max_overlap = overlap
-                best_match = (record.get("source-page-url", ""), record.get("mrf-url", ""))
-            record = {}
-
-        if not line:
-            if record:
-                location = record.get("location-name", "")
-                location_words = normalize(location)
-                overlap = len(location_words & hospital_words)
-                if overlap >= min_overlap and overlap > max_overlap:
-                    max_overlap = overlap
-                    best_match = (record.get("source-page-url", ""), record.get("mrf-url", ""))
-            record = {}
-        else:
-            if ":" in line:
-                key, value = line.split(":", 1)
-                record[key.strip().lower()] = value.strip()
-
-
-    return [best_match] if best_match else []
-
-def get_best_mrf_match(url, hospital_name, min_overlap=2):
+
+def match_cms_records_many(records, hospital_names, min_overlap=DEFAULT_MIN_OVERLAP):
+    """
+    Matches many hospital names against LocationRecords (or a prebuilt LocationMatcher).
+    Returns a list with [(source-page-url, mrf-url)] or [] for each hospital name.
+    """
+    matcher = records if isinstance(records, LocationMatcher) else LocationMatcher(records)
+    return [[match[1].links()] if match else [] for match in matcher.match(hospital_names, min_overlap=min_overlap)]
+
+
+def match_cms_records(lines, hospital_name, min_overlap=DEFAULT_MIN_OVERLAP):
+    """Returns [(source-page-url, mrf-url)] for the record that best matches hospital_name"""
+    return match_cms_records_many(iter_cms_records(lines), [hospital_name], min_overlap)[0]
+
+def get_best_mrf_match(url, hospital_name, min_overlap=DEFAULT_MIN_OVERLAP):
     """
     Wrapper function that creates a Selenium instance for fetching CMS text files
     """
@@ -109,8 +121,6 @@ def main():
 
             if result:
                 df.at[i, 'source_link'], df.at[i, 'mrf_link'] = result[0]
-                
-            time.sleep(2)
     finally:
         selenium_handler.close()
 
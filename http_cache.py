@@ -0,0 +1,152 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+CACHE_PATH = os.path.join("cache", "http_cache.sqlite3")
+DEFAULT_TTL = 7 * 24 * 3600  # cms-hpt.txt files change a few times a year
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+class ContentCache:
+    """
+    SQLite-backed cache of fetched documents keyed by URL.
+    Stores ETag / Last-Modified so stale entries can be revalidated with a conditional GET.
+    Entries younger than ttl are served without touching the network; the least recently
+    used entries are evicted once the stored bodies exceed max_bytes.
+    Safe to share between threads and between worker processes.
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS documents (
+                url TEXT PRIMARY KEY,
+                body TEXT NOT NULL,
+                status INTEGER,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                size INTEGER NOT NULL
+            )"""
+        )
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS manual_results (
+                url TEXT PRIMARY KEY,
+                source_url TEXT,
+                mrf_url TEXT,
+                fetched_at REAL NOT NULL
+            )"""
+        )
+        self.conn.commit()
+
+    def get(self, url):
+        """Returns the cached entry as a dict, or None"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT body, status, etag, last_modified, fetched_at FROM documents WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE documents SET last_access = ? WHERE url = ?", (time.time(), url))
+            self.conn.commit()
+
+        body, status, etag, last_modified, fetched_at = row
+        return {
+            'body': body,
+            'status': status,
+            'etag': etag,
+            'last_modified': last_modified,
+            'fetched_at': fetched_at,
+        }
+
+    def is_fresh(self, entry):
+        return entry is not None and time.time() - entry['fetched_at'] < self.ttl
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def put(self, url, body, status=200, etag=None, last_modified=None):
+        now = time.time()
+        size = len(body.encode("utf-8"))
+        with self._lock:
+            self.conn.execute(
+                """INSERT OR REPLACE INTO documents
+                   (url, body, status, etag, last_modified, fetched_at, last_access, size)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (url, body, status, etag, last_modified, now, now, size),
+            )
+            self.conn.commit()
+        self.evict()
+
+    def touch(self, url):
+        """Mark an entry as revalidated (after a 304)"""
+        now = time.time()
+        with self._lock:
+            self.conn.execute(
+                "UPDATE documents SET fetched_at = ?, last_access = ? WHERE url = ?", (now, now, url)
+            )
+            self.conn.commit()
+
+    def evict(self):
+        """Drop least recently used documents until the cache fits in max_bytes"""
+        with self._lock:
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM documents").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            rows = self.conn.execute("SELECT url, size FROM documents ORDER BY last_access").fetchall()
+            for url, size in rows:
+                if total <= self.max_bytes:
+                    break
+                self.conn.execute("DELETE FROM documents WHERE url = ?", (url,))
+                total -= size
+            self.conn.commit()
+
+    def get_manual_result(self, url):
+        """Returns a cached (source_url, mrf_url) from get_source_mrf_manually if still within ttl"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT source_url, mrf_url, fetched_at FROM manual_results WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None or time.time() - row[2] >= self.ttl:
+            return None
+        return row[0], row[1]
+
+    def put_manual_result(self, url, source_url, mrf_url):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO manual_results (url, source_url, mrf_url, fetched_at) VALUES (?, ?, ?, ?)",
+                (url, source_url, mrf_url, time.time()),
+            )
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+_cache = None
+
+
+def get_cache():
+    """Return the process-wide ContentCache"""
+    global _cache
+    if _cache is None:
+        _cache = ContentCache()
+    return _cache
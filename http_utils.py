@@ -0,0 +1,194 @@
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3Error
+from urllib3.util.retry import Retry
+from http_cache import get_cache
+from rate_limiter import get_rate_limiter
+
+
+USER_AGENT = (
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/139.0.0.0 Safari/537.36"
+)
+
+DEFAULT_HEADERS = {
+    "User-Agent": USER_AGENT,
+    "Accept": "text/plain,text/html;q=0.9,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.9",
+}
+
+# Status codes that usually mean a bot wall rather than a missing file
+BLOCKED_STATUS_CODES = {401, 403, 429, 503}
+
+CHALLENGE_INDICATORS = [
+    'cf-chl', 'challenge-platform', 'just a moment', 'attention required',
+    'captcha', 'verify you are human', 'are you a robot', 'access denied',
+    'incapsula', 'perimeterx', 'ddos protection',
+]
+
+# Result states returned by fetch_cms_txt
+CMS_FOUND = "found"
+CMS_MISSING = "missing"
+CMS_BLOCKED = "blocked"
+
+_session = None
+
+
+def get_session(pool_size=20):
+    """Return a process-wide keep-alive session with a connection pool"""
+    global _session
+    if _session is None:
+        session = requests.Session()
+        retry = Retry(total=2, connect=2, read=1, backoff_factor=0.5,
+                      status_forcelist=[502, 504], allowed_methods=["GET", "HEAD"])
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update(DEFAULT_HEADERS)
+        _session = session
+    return _session
+
+
+def is_bot_challenge(status_code, body):
+    """Check whether a response looks like a bot/captcha challenge page"""
+    if status_code in BLOCKED_STATUS_CODES:
+        return True
+    lowered = body[:5000].lower()
+    return any(indicator in lowered for indicator in CHALLENGE_INDICATORS)
+
+
+def looks_like_cms_txt(body):
+    return 'location-name' in body.lower() or 'mrf-url' in body.lower()
+
+
+def classify_cms_response(status_code, body):
+    """Map an HTTP status and body of a cms-hpt.txt request to found/missing/blocked"""
+    if status_code == 200 and looks_like_cms_txt(body):
+        return CMS_FOUND
+    if is_bot_challenge(status_code, body):
+        return CMS_BLOCKED
+    # 404/410 or a soft-404 HTML page without any records
+    return CMS_MISSING
+
+
+def check_url(url, timeout=10):
+    """
+    Request url without downloading its body.
+    Returns (status_code, final_url), or (None, None) if the request failed.
+    """
+    get_rate_limiter().wait(url)
+    try:
+        with get_session().get(url, timeout=timeout, allow_redirects=True, stream=True) as response:
+            return response.status_code, response.url
+    except requests.RequestException as e:
+        print(f"HTTP check failed for {url}: {e}")
+        return None, None
+
+
+def read_body(response, max_seconds=None):
+    """
+    Read a streamed response body as text, or return None once max_seconds have passed.
+    timeout only bounds each read, so a server trickling bytes could otherwise hold the thread forever.
+    """
+    started = time.monotonic()
+    chunks = []
+    while True:
+        # read1 returns whatever has arrived instead of waiting for a full chunk
+        chunk = response.raw.read1(16 * 1024, decode_content=True)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        if max_seconds is not None and time.monotonic() - started > max_seconds:
+            return None
+    return b"".join(chunks).decode(response.encoding or "utf-8", errors="replace")
+
+
+def probe_cms_txt(url, timeout=15, use_cache=True, max_seconds=None):
+    """
+    Request a cms-hpt.txt file over plain HTTP.
+    Returns (state, status_code, text). Network errors, and bodies that take longer than
+    max_seconds to arrive, are reported as CMS_BLOCKED with status_code None so the caller
+    falls back to the browser.
+    Fresh cache entries are returned without a request; stale ones are revalidated
+    with a conditional GET so unchanged files only cost a 304.
+    """
+    cache = get_cache() if use_cache else None
+    entry = cache.get(url) if cache else None
+    if cache and cache.is_fresh(entry):
+        return CMS_FOUND, entry['status'], entry['body']
+
+    headers = cache.conditional_headers(entry) if cache else {}
+    get_rate_limiter().wait(url)
+    try:
+        with get_session().get(url, timeout=timeout, allow_redirects=True, headers=headers, stream=True) as response:
+            body = read_body(response, max_seconds)
+    except (requests.RequestException, Urllib3Error) as e:
+        print(f"HTTP fetch failed for {url}: {e}")
+        return CMS_BLOCKED, None, None
+    if body is None:
+        print(f"HTTP fetch of {url} took longer than {max_seconds}s")
+        return CMS_BLOCKED, None, None
+
+    if response.status_code == 304 and entry:
+        cache.touch(url)
+        return CMS_FOUND, 304, entry['body']
+
+    state = classify_cms_response(response.status_code, body)
+    if state == CMS_FOUND and cache:
+        cache.put(url, body, response.status_code,
+                  response.headers.get('ETag'), response.headers.get('Last-Modified'))
+    return state, response.status_code, body if state == CMS_FOUND else None
+
+
+def fetch_cms_txt(url, timeout=15):
+    """
+    Fetch a cms-hpt.txt file over plain HTTP.
+    Returns (state, text) where state is CMS_FOUND, CMS_MISSING or CMS_BLOCKED.
+    """
+    state, status_code, text = probe_cms_txt(url, timeout)
+    print(f"HTTP {status_code} for {url} -> {state}")
+    return state, text
+
+
+def fetch_prefix(url, max_bytes=4096, timeout=15, stop=None, max_seconds=None):
+    """
+    Read only the first max_bytes of url: asks for them with a Range request and stops
+    reading after max_bytes even if the server ignores Range and sends the whole file.
+    stop(prefix) is called after every chunk and ends the download early when it returns True.
+    After max_seconds the download also ends, with whatever prefix has arrived by then.
+    Returns (status_code, headers, prefix, final_url), or (None, {}, b"", url) if the request failed.
+    """
+    headers = {"Range": f"bytes=0-{max_bytes - 1}", "Accept": "*/*", "Accept-Encoding": "identity"}
+    get_rate_limiter().wait(url)
+    try:
+        with get_session().get(url, timeout=timeout, allow_redirects=True, stream=True, headers=headers) as response:
+            started = time.monotonic()
+            prefix = bytearray()
+            while len(prefix) < max_bytes:
+                # read1 returns whatever has arrived instead of waiting for a full chunk
+                chunk = response.raw.read1(min(max_bytes - len(prefix), 16 * 1024), decode_content=True)
+                if not chunk:
+                    break
+                prefix += chunk
+                if stop and stop(prefix):
+                    break
+                if max_seconds is not None and time.monotonic() - started > max_seconds:
+                    print(f"Stopped reading {url} after {max_seconds}s")
+                    break
+            return response.status_code, response.headers, bytes(prefix[:max_bytes]), response.url
+    except (requests.RequestException, Urllib3Error) as e:
+        print(f"HTTP fetch failed for {url}: {e}")
+        return None, {}, b"", url
+
+
+def fetch_headers(url, timeout=15):
+    """HEAD url. Returns (status_code, headers, final_url), or (None, {}, url) if the request failed"""
+    get_rate_limiter().wait(url)
+    try:
+        response = get_session().head(url, timeout=timeout, allow_redirects=True)
+        return response.status_code, response.headers, response.url
+    except requests.RequestException as e:
+        print(f"HTTP HEAD failed for {url}: {e}")
+        return None, {}, url
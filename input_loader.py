@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import time
+import pandas as pd
+from openpyxl import load_workbook
+
+
+INPUT_COLUMNS = ['Facility ID', 'Facility Name', 'City/Town', 'State']
+INPUT_CACHE_DIR = os.path.join("cache", "input")
+
+try:
+    import pyarrow  # noqa: F401
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _cache_paths(path, sheet, state, columns):
+    """One cache entry per workbook, sheet, state filter and column selection"""
+    key = json.dumps([os.path.abspath(path), sheet, state, list(columns)])
+    name = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+    base = os.path.join(INPUT_CACHE_DIR, name)
+    return base + ".json", base + (".parquet" if PYARROW_AVAILABLE else ".pkl")
+
+
+def _cell(row, position):
+    # Read-only rows stop at the last filled cell
+    return row[position] if position < len(row) else None
+
+
+def _matches_state(value, state):
+    return state is None or (isinstance(value, str) and value.strip().upper() == state.upper())
+
+
+def read_workbook(path, sheet, columns=INPUT_COLUMNS, state=None):
+    """
+    Stream a sheet in read-only mode, keeping only the wanted columns of rows in state.
+    Only one row is materialized at a time, so memory follows the filtered result, not the workbook.
+    """
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        # Without a configured sheet name, use the sheet the workbook opens on
+        worksheet = workbook[sheet] if sheet else workbook.active
+        rows = worksheet.iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else "" for cell in next(rows, [])]
+        missing = [column for column in columns if column not in header]
+        if missing:
+            raise ValueError(f"Columns {missing} not found in sheet {sheet!r} of {path}")
+
+        positions = [header.index(column) for column in columns]
+        state_position = header.index('State') if 'State' in header else None
+        data = {column: [] for column in columns}
+        for row in rows:
+            if state is not None and state_position is not None and not _matches_state(_cell(row, state_position), state):
+                continue
+            values = [_cell(row, position) for position in positions]
+            if all(value is None for value in values):
+                continue  # trailing empty rows
+            for column, value in zip(columns, values):
+                data[column].append(value)
+    finally:
+        workbook.close()
+    return pd.DataFrame(data, columns=list(columns))
+
+
+
+
+def _write_cache(df, data_path):
+    """Write the parsed rows and return the path they ended up in"""
+    if PYARROW_AVAILABLE:
+        try:
+            df.to_parquet(data_path, index=False)
+            return data_path
+        except Exception as e:
+            # Mixed-type object columns (IDs that are sometimes numbers) are not valid parquet
+            print(f"Could not write parquet input cache, using pickle: {e}")
+            data_path = os.path.splitext(data_path)[0] + ".pkl"
+    df.to_pickle(data_path)
+    return data_path
+
+
+def _read_cache(data_path):
+    if data_path.endswith(".parquet"):
+        return pd.read_parquet(data_path)
+    return pd.read_pickle(data_path)
+
+
+def load_facilities(path, sheet=None, state=None, columns=INPUT_COLUMNS, use_cache=True):
+    """
+    Load the facility list from the master workbook with only the given columns and, when
+    state is set, only that state's rows. CSV files (the test.csv sample) are read whole.
+    Workbooks are parsed once and cached under cache/input; the cache is reused while the
+    workbook's modification time is unchanged, or its content hash if only the mtime moved.
+    """
+    start_time = time.time()
+    if path.lower().endswith(".csv"):
+        return pd.read_csv(path)
+
+    meta_path, data_path = _cache_paths(path, sheet, state, columns)
+    stat = os.stat(path)
+    meta = None
+    if use_cache and os.path.exists(meta_path):
+        try:
+            with open(meta_path) as fh:
+                meta = json.load(fh)
+        except (OSError, ValueError):
+            meta = None
+
+    if meta and os.path.exists(meta.get('data_path', "")):
+        fresh = meta['mtime_ns'] == stat.st_mtime_ns and meta['size'] == stat.st_size
+        if not fresh and meta['size'] == stat.st_size and meta['sha256'] == _sha256(path):
+            # Copied or touched but not changed
+            meta['mtime_ns'] = stat.st_mtime_ns
+            with open(meta_path, "w") as fh:
+                json.dump(meta, fh)
+            fresh = True
+        if fresh:
+            df = _read_cache(meta['data_path'])
+            print(f"Loaded {len(df)} facilities from input cache in {time.time() - start_time:.2f} seconds")
+            return df
+
+    df = read_workbook(path, sheet, columns, state)
+    print(f"Read {len(df)} facilities from {path} in {time.time() - start_time:.2f} seconds")
+    if use_cache:
+        os.makedirs(INPUT_CACHE_DIR, exist_ok=True)
+        data_path = _write_cache(df, data_path)
+        with open(meta_path, "w") as fh:
+            json.dump({'path': os.path.abspath(path), 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+                       'sha256': _sha256(path), 'data_path': data_path}, fh)
+    return df
@@ -0,0 +1,58 @@
+import re
+
+
+MRF_KEYWORDS = frozenset(
+    "standardcharges price transparency mrf standard charges chargemaster charge master".split()
+)
+
+# Machine-readable formats rank above documents meant for people
+EXTENSION_WEIGHTS = {
+    'json': 3.0, 'csv': 3.0, 'zip': 2.5, 'xlsx': 2.0, 'xls': 1.5, 'txt': 1.0, 'pdf': 0.5,
+}
+
+HREF_WEIGHT = 1.0
+TEXT_WEIGHT = 0.75
+VISIBLE_WEIGHT = 0.25
+
+EXTENSION_PATTERN = re.compile(r"\.([a-z0-9]{2,5})(?:$|[?#])")
+SKIP_SCHEMES = ('javascript:', 'mailto:', 'tel:', '#')
+
+
+def score_links(links, keywords=MRF_KEYWORDS):
+    """
+    Score anchors as MRF candidates from their href tokens, link text / aria-label and
+    file extension. Returns the links that match at least one keyword or a known file
+    extension, best first, as dicts with url, score and text.
+    """
+    scored = {}
+    for link in links:
+        href = link['href']
+        if not href or href.lower().startswith(SKIP_SCHEMES):
+            continue
+
+        href_score = len(keywords & tokenize_href(href))
+        text_score = len(keywords & normalize_to_keywords(f"{link['text']} {link['aria_label']}"))
+        extension = EXTENSION_PATTERN.search(href.lower())
+        extension_score = EXTENSION_WEIGHTS.get(extension.group(1), 0) if extension else 0
+
+        if not (href_score or text_score or extension_score):
+            continue
+
+        score = (HREF_WEIGHT * href_score + TEXT_WEIGHT * text_score + extension_score
+                 + (VISIBLE_WEIGHT if link['visible'] else 0))
+        # The same file is often linked several times; keep its best score
+        if href not in scored or score > scored[href]['score']:
+            scored[href] = {'url': href, 'score': score, 'text': link['text']}
+
+    return sorted(scored.values(), key=lambda candidate: -candidate['score'])
+
+
+def normalize_to_keywords(text):
+    text = re.sub(r"[^\w\s]", " ", text.lower())  # replace punctuation with space
+    return set(text.split())
+
+
+def tokenize_href(href):
+    # Replace separators with space and normalize
+    tokens = re.sub(r"[\/_\-\.?=&]", " ", href)  # split on URL separators
+    return normalize_to_keywords(tokens)
@@ -1,12 +1,20 @@
+import argparse
 import glob
+import multiprocessing
 import os
 import time
 import json
-import random
-import pandas as pd
-from urllib.parse import urljoin, urlparse
-from selenium_utils import SeleniumHandler
-from get_source_and_mrf_cms_txt import get_best_mrf_match_selenium
+from selenium_utils import SEARCH_MODES, SeleniumHandler
+from pipeline import (ErrorBudget, facility_id_for, group_by_root_url, is_driver_error, process_group,
+                      resolve_root_url, search_query_for)
+from worker_pool import WorkerPool, queue_worker
+from work_queue import WorkQueue
+from input_loader import load_facilities
+from cms_discovery import load_probe_results
+from result_journal import JOURNAL_PATH, ResultJournal, is_finished, load_journal
+from mrf_validation import validate
+from mrf_verification import verify
+from metrics import TRACE_PATH, format_report, get_metrics, load_trace, summarize, write_prometheus
 
 
 def load_config():
@@ -14,14 +22,180 @@ def load_config():
         return json.load(config)
 
 
-def main():
+def parse_args():
+    parser = argparse.ArgumentParser(description="Find hospital price transparency links and MRF files")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of parallel browser worker processes (default: 1)")
+    parser.add_argument("--input", default=None,
+                        help="Facility workbook or CSV (default: the filename in config.json, else test.csv)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip facilities already finished in the result journal")
+    parser.add_argument("--refresh-failed-searches", action="store_true",
+                        help="Search again for facilities whose cached search found no website")
+    parser.add_argument("--lean", action="store_true",
+                        help="Block images, fonts, media and trackers in Chrome")
+    parser.add_argument("--validate-mrf", action="store_true",
+                        help="Check every File URL with a small range request and record its status and format")
+    parser.add_argument("--verify-mrf", action="store_true",
+                        help="Read the header of each MRF file to confirm it belongs to the facility")
+    parser.add_argument("--metrics-file", default=None,
+                        help="Write per-stage timings in Prometheus text format to this file")
+    parser.add_argument("--search-mode", choices=SEARCH_MODES, default=None,
+                        help="type: type into bing.com (default), direct: open the results URL, "
+                             "http: fetch results over HTTP with the browser as fallback")
+    parser.add_argument("--queue", default=None,
+                        help="Shared work queue database; every main.py started with the same queue "
+                             "(on this or other machines) takes rows from it and writes the merged output")
+    return parser.parse_args()
+
+
+def run_parallel(df, workers, journal, handler_options, budget_options):
+    """Process all rows with a pool of isolated SeleniumHandler processes"""
+    pool = WorkerPool(workers, headless=True, handler_options=handler_options, budget_options=budget_options)
+    rows = ((i, row.to_dict()) for i, row in df.iterrows())
+
+    for done, (i, result) in enumerate(pool.run(rows), start=1):
+        journal.record_result(facility_id_for(df.loc[i], i), result)
+        print(f"[{done}/{len(df)}] Finished row {i+1}: {result['Hospital Link']}")
+
+    print(f"Worker pool respawned {pool.respawn_count} workers")
+
+
+def run_serial(df, journal, resolved, handler_options, budget_options):
+    """Resolve rows one by one, then process them grouped by domain"""
+    selenium = SeleniumHandler(headless=True, **handler_options)
+    probe_results = load_probe_results()
+    budget = ErrorBudget(**budget_options)
+    metrics = get_metrics()
+
+    def failed(e):
+        selenium.record_error()
+        budget.record(False)
+        # If it's a driver-related error, restart the driver
+        if is_driver_error(e):
+            print("Driver-related error detected. Restarting driver...")
+            selenium.restart_driver()
+
+    # Pass 1: resolve every facility to its website root
+    root_urls = {}
+    for n, (i, row) in enumerate(df.iterrows()):
+        facility_id = facility_id_for(row, i)
+        if facility_id in resolved:
+            root_urls[i] = resolved[facility_id]
+            continue
+
+        metrics.start("resolve", [facility_id])
+        status = "ok"
+        try:
+            print(f"[{n+1}/{len(df)}] Searching: {search_query_for(row)}")
+            root_urls[i] = resolve_root_url(selenium, row)
+            journal.record_resolved(facility_id, root_urls[i])
+            selenium.record_success()
+            budget.record(True)
+        except Exception as e:
+            print(f"Error processing row {n+1}: {e}")
+            journal.record_result(facility_id, {'Hospital Link': f"Error: {str(e)}"})
+            failed(e)
+            status = "error"
+
+        # Restart the driver only when it has grown too large or keeps failing
+        selenium.recycle_if_needed()
+        metrics.finish(status)
+
+        reason = budget.exhausted()
+        if reason:
+            print(f"Error budget exhausted ({reason}). There might be a persistent issue.")
+            break
+
+    # Pass 2: fetch and parse each domain's cms-hpt.txt once for all its facilities
+    groups = group_by_root_url(root_urls)
+    print(f"Resolved {len(root_urls)} rows to {len(groups)} domains")
+    for root_url, indices in groups.items():
+        if budget.exhausted():
+            break
+        metrics.start("domain", [facility_id_for(df.loc[i], i) for i in indices], root_url=root_url)
+        status = "ok"
+        try:
+            print(f"Processing {root_url} for {len(indices)} facilities")
+            rows = [(i, df.loc[i]) for i in indices]
+            for i, result in process_group(selenium, root_url, rows, probe_results).items():
+                journal.record_result(facility_id_for(df.loc[i], i), result)
+            selenium.record_success()
+            budget.record(True)
+        except Exception as e:
+            print(f"Error processing domain {root_url}: {e}")
+            for i in indices:
+                journal.record_result(facility_id_for(df.loc[i], i), {'Hospital Link': f"Error: {str(e)}"})
+            failed(e)
+            status = "error"
+
+        selenium.recycle_if_needed()
+        metrics.finish(status)
+
+    selenium.close()
+    print(f"Driver was restarted {selenium.restart_count} times")
+
+
+def run_queue(df, queue_path, workers, handler_options, budget_options, lease_seconds):
+    """Add the rows to the shared queue and work on it with this machine's workers until it is drained"""
+    work_queue = WorkQueue(queue_path, lease_seconds=lease_seconds)
+    added = work_queue.enqueue((facility_id_for(row, i), row.to_dict()) for i, row in df.iterrows())
+    counts = work_queue.counts()
+    work_queue.close()
+    print(f"Queue {queue_path}: added {added} rows, {counts['done']} of {sum(counts.values())} done")
+
+    if workers == 1:
+        queue_worker(0, queue_path, True, handler_options, budget_options, lease_seconds)
+        return
+    # Chrome does not survive fork() well, always start workers fresh
+    ctx = multiprocessing.get_context("spawn")
+    processes = [ctx.Process(target=queue_worker,
+                             args=(worker_id, queue_path, True, handler_options, budget_options, lease_seconds))
+                 for worker_id in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+def apply_journal(df, results):
+    """Fill the output columns of df from journaled results"""
+    for i, row in df.iterrows():
+        result = results.get(facility_id_for(row, i))
+        if not result:
+            continue
+        for column, value in result.items():
+            df.at[i, column] = value
+    return df
+
+
+def add_mrf_validation(df):
+    """Add status, format, size and date columns for every File URL, without downloading the files"""
+    checks = validate(df['File URL'].tolist()).set_index('url')
+    columns = {'status_code': 'MRF Status', 'format': 'MRF Format', 'content_length': 'MRF Size',
+               'last_modified': 'MRF Last Modified', 'valid': 'MRF Valid'}
+    for source, column in columns.items():
+        df[column] = df['File URL'].map(checks[source])
+    return df
+
+
+def add_mrf_verification(df):
+    """Add the hospital name found in each MRF header and whether it matches the facility"""
+    checks = verify(df)
+    if len(checks):
+        df['MRF Hospital Name'] = checks['hospital_name']
+        df['MRF Verified'] = checks['verdict']
+    return df
+
+
+def main(workers=1, resume=False, refresh_failed_searches=False, lean=False, search_mode=None,
+         metrics_file=None, validate_mrf=False, verify_mrf=False, input_path=None, queue_path=None):
     start_time = time.time()
-    selenium = SeleniumHandler(headless=True)
 
     config = load_config()
-    df = pd.read_csv("test.csv")
-    # df=pd.read_excel(config['filename'],sheet_name=config['sheetname'], usecols=['Facility ID','Facility Name','City/Town','State'])
-    # df=df[df['State']==config['state']]
+    # The master workbook when it is present, the small test.csv sample otherwise
+    input_path = input_path or (config['filename'] if os.path.exists(config['filename']) else "test.csv")
+    df = load_facilities(input_path, config.get('sheetname'), config.get('state'))
     df['Hospital Link'] = ''
     df['has_cms_txt'] = False
     df['Source URL'] = ''
@@ -30,84 +204,72 @@ def main():
     # Create screenshots directory if it doesn't exist
     os.makedirs("screenshots", exist_ok=True)
 
-    driver_restart_counter = 0
-    max_driver_restarts = 10
+    resolved, results = load_journal(JOURNAL_PATH) if resume else ({}, {})
+    finished = {facility_id for facility_id, result in results.items() if is_finished(result)}
+    pending = df[[facility_id_for(row, i) not in finished for i, row in df.iterrows()]]
+    if resume:
+        print(f"Resuming: {len(df) - len(pending)} of {len(df)} rows already finished")
 
-    for i, row in df.iterrows():
-        try:
-            search_query = f"{row['Facility Name']} {row['City/Town']}"
-            print(f"[{i+1}/{len(df)}] Searching: {search_query}")
-            
-            result_url = selenium.get_url(search_query)
-
-            if result_url:
-                parsed = urlparse(result_url)
-                root_url = f"{parsed.scheme}://{parsed.netloc}"
-                cms_url = urljoin(root_url, "cms-hpt.txt")
-                
-                # Try to get MRF match from CMS file (includes URL existence check)
-                result_links = get_best_mrf_match_selenium(selenium, cms_url, search_query)
-                
-                if result_links is not False and result_links:  # CMS file exists and has matches
-                    df.at[i, 'Hospital Link'] = cms_url
-                    df.at[i, 'has_cms_txt'] = True
-                    print(f"Found CMS: {cms_url}")
-                    for source, mrf in result_links:
-                        df.at[i, 'Source URL'] = source
-                        df.at[i, 'File URL'] = mrf
-                elif result_links is not False:  # CMS file exists but no matches
-                    df.at[i, 'Hospital Link'] = cms_url
-                    df.at[i, 'has_cms_txt'] = True
-                    print(f"Found CMS but no matching records: {cms_url}")
-                else:  # CMS file doesn't exist
-                    df.at[i, 'Hospital Link'] = root_url
-                    df.at[i, 'has_cms_txt'] = False
-                    # Try manual search for source and MRF
-                    source, mrf = selenium.get_source_mrf_manually(root_url, search_query)
-                    df.at[i, 'Source URL'] = source
-                    df.at[i, 'File URL'] = mrf
+    handler_options = {
+        'search_cache_days': config.get('search_cache_days', 30),
+        'refresh_failed_searches': refresh_failed_searches,
+        'lean': lean or config.get('lean_profile', False),
+        'search_mode': search_mode or config.get('search_mode', 'type'),
+        'warm_profile': config.get('warm_profile', True),
+        'keep_spare': config.get('keep_spare_browser', False),
+        'max_rss_mb': config.get('max_browser_rss_mb', 1500),
+        'max_window_handles': config.get('max_window_handles', 4),
+        'verify_mrf': verify_mrf or config.get('verify_mrf', False),
+        'http_crawl': config.get('http_crawl', True),
+        'sitemap_discovery': config.get('sitemap_discovery', True),
+    }
+    budget_options = {
+        'max_error_rate': config.get('max_error_rate', 0.5),
+        'max_consecutive': config.get('max_consecutive_failures', 25),
+    }
+
+    # A resumed run keeps extending the trace of the run it continues
+    if not resume and os.path.exists(TRACE_PATH):
+        os.remove(TRACE_PATH)
 
+    if queue_path:
+        # The queue replaces the local journal: it holds every machine's results
+        run_queue(df, queue_path, workers, handler_options, budget_options,
+                  config.get('queue_lease_seconds', 300))
+        work_queue = WorkQueue(queue_path)
+        results = work_queue.results()
+        work_queue.close()
+    else:
+        journal = ResultJournal(JOURNAL_PATH, resume=resume)
+        try:
+            if workers > 1:
+                run_parallel(pending, workers, journal, handler_options, budget_options)
             else:
-                df.at[i, 'Hospital Link'] = "Link Not Found"
-                print("No valid link found.")
-
-            # Save progress after each row
-            if (i + 1) % 5 == 0:  # Save every 5 rows
-                df.to_csv("output_links_progress.csv", index=False)
-                print(f"Progress saved after {i + 1} rows")
-
-            # Restart driver periodically to prevent memory issues
-            if (i + 1) % 10 == 0:
-                print(f"Restarting driver after {i + 1} rows for maintenance...")
-                selenium.restart_driver()
-                driver_restart_counter += 1
-                
-                # If we've restarted too many times, there might be a persistent issue
-                if driver_restart_counter >= max_driver_restarts:
-                    print("Too many driver restarts. There might be a persistent issue.")
-                    break
-
-            time.sleep(random.uniform(4, 9))
-            
-        except Exception as e:
-            print(f"Error processing row {i+1}: {e}")
-            df.at[i, 'Hospital Link'] = f"Error: {str(e)}"
-            
-            # If it's a driver-related error, restart the driver
-            if any(keyword in str(e).lower() for keyword in ['timeout', 'connection', 'webdriver', 'chrome']):
-                print("Driver-related error detected. Restarting driver...")
-                selenium.restart_driver()
-                driver_restart_counter += 1
-            
-            continue
+                run_serial(pending, journal, resolved, handler_options, budget_options)
+        finally:
+            journal.close()
 
-    selenium.close()
+        # Build the final output from everything the journal has recorded
+        _, results = load_journal(JOURNAL_PATH)
+    apply_journal(df, results)
+    if validate_mrf:
+        add_mrf_validation(df)
+    if verify_mrf or handler_options['verify_mrf']:
+        add_mrf_verification(df)
     df.to_csv("output_links.csv", index=True)
 
     print("Done. Results saved to output_links.csv")
+
+    summary = summarize(load_trace(TRACE_PATH))
+    print(format_report(summary))
+    if metrics_file:
+        write_prometheus(summary, metrics_file)
     print(f"Execution Time: {time.time() - start_time:.2f} seconds")
-    print(f"Driver was restarted {driver_restart_counter} times")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    main(workers=args.workers, resume=args.resume, refresh_failed_searches=args.refresh_failed_searches,
+         lean=args.lean, search_mode=args.search_mode, metrics_file=args.metrics_file,
+         validate_mrf=args.validate_mrf, verify_mrf=args.verify_mrf,
+         input_path=args.input, queue_path=args.queue)
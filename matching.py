@@ -0,0 +1,91 @@
+import math
+from collections import defaultdict
+from cms_parser import LocationIndex, normalize
+
+
+DEFAULT_MIN_SCORE = 0.35
+# Names must share this many words with a location (fewer only when the name is shorter)
+DEFAULT_MIN_OVERLAP = 2
+# Enough to break ties between otherwise equal locations, not to force a match
+CITY_BONUS = 0.02
+STATE_BONUS = 0.01
+
+
+class LocationMatcher(LocationIndex):
+    """
+    TF-IDF matcher for facility names against the location-name entries of one cms-hpt.txt.
+    Words that appear in many locations ("hospital", "medical", "center") get a low weight, so
+    distinctive words decide the match. Facility words the file never uses get the highest
+    weight: they count against every location instead of being ignored.
+    Names are scored one at a time, with no document-term matrix: the postings lists of the
+    name's words give the locations that share a word with it, and only those accumulate a dot
+    product (location norms are computed once per file). City and state are tie-breakers.
+    """
+
+    def __init__(self, records=()):
+        self.location_tokens = []
+        self._norms = None
+        super().__init__(records)
+
+    def add(self, record):
+        super().add(record)
+        self.location_tokens.append(normalize(record.location_name))
+        self._norms = None
+
+    def _prepare(self):
+        """Smoothed inverse document frequency over the locations in this file, and location norms"""
+        if self._norms is not None:
+            return
+        document_count = len(self.records)
+        self.idf = {token: math.log((1 + document_count) / (1 + len(postings))) + 1
+                    for token, postings in self.postings.items()}
+        self.unseen_idf = math.log(1 + document_count) + 1
+        self._norms = [math.sqrt(sum(self.idf[token] ** 2 for token in tokens)) for tokens in self.location_tokens]
+
+    def _contains(self, record_id, value):
+        """The location name has every word of value"""
+        tokens = normalize(value) if isinstance(value, str) else set()
+        return bool(tokens) and tokens <= self.location_tokens[record_id]
+
+    def best(self, name, city=None, state=None, min_overlap=DEFAULT_MIN_OVERLAP):
+        """Returns (score, record_id) of the best scoring location for name, or None if none overlaps enough"""
+        self._prepare()
+        tokens = normalize(str(name))
+        if not tokens or not self.records:
+            return None
+
+        weights = {token: self.idf.get(token, self.unseen_idf) for token in tokens}
+        query_norm = math.sqrt(sum(weight ** 2 for weight in weights.values()))
+        dots = defaultdict(float)
+        overlaps = defaultdict(int)
+        for token, weight in weights.items():
+            for record_id in self.postings.get(token, ()):
+                dots[record_id] += weight ** 2
+                overlaps[record_id] += 1
+
+        required = min(min_overlap, len(tokens))
+        best = None
+        for record_id, dot in dots.items():
+            if overlaps[record_id] < required or not self._norms[record_id]:
+                continue
+            score = dot / (query_norm * self._norms[record_id])
+            if city is not None and self._contains(record_id, city):
+                score += CITY_BONUS
+            if state is not None and self._contains(record_id, state):
+                score += STATE_BONUS
+            if best is None or (score, -record_id) > (best[0], -best[1]):
+                best = (score, record_id)
+        return best
+
+    def match(self, names, cities=None, states=None, min_score=DEFAULT_MIN_SCORE, min_overlap=DEFAULT_MIN_OVERLAP):
+        """Returns (score, record) for the best location of each name, or None below min_score"""
+        cities = cities if cities is not None else [None] * len(names)
+        states = states if states is not None else [None] * len(names)
+        matches = []
+        for name, city, state in zip(names, cities, states):
+            best = self.best(name, city, state, min_overlap)
+            if best is None or best[0] < min_score:
+                matches.append(None)
+            else:
+                matches.append((best[0], self.records[best[1]]))
+        return matches
@@ -0,0 +1,194 @@
+import argparse
+import json
+import math
+import os
+import time
+from contextlib import contextmanager
+
+
+TRACE_PATH = "run_trace.jsonl"
+
+# Stages timed for every row
+STAGE_SEARCH = "get_url"
+STAGE_CMS_PROBE = "cms_probe"
+STAGE_CMS_PARSE = "cms_parse"
+STAGE_MANUAL = "manual_search"
+STAGES = [STAGE_SEARCH, STAGE_CMS_PROBE, STAGE_CMS_PARSE, STAGE_MANUAL]
+
+# Events counted for every row
+EVENT_RETRY = "retry"
+EVENT_RESTART = "restart"
+EVENT_CAPTCHA = "captcha"
+EVENTS = [EVENT_RETRY, EVENT_RESTART, EVENT_CAPTCHA]
+
+QUANTILES = [0.5, 0.95, 0.99]
+
+
+class RunMetrics:
+    """
+    Records where the time of each unit of work goes and appends one JSON line per unit to the trace.
+    A unit is one row, or in the serial domain pass one domain with all its rows.
+    Stages entered several times within a unit add up; events outside a unit are
+    carried over to the next one.
+    """
+
+    def __init__(self, trace_path=TRACE_PATH):
+        self.trace_path = trace_path
+        self.current = None
+        self.pending_events = {}
+
+    def start(self, kind, facility_ids, **fields):
+        self.current = {
+            'kind': kind,
+            'facility_ids': list(facility_ids),
+            'pid': os.getpid(),
+            'started_at': time.time(),
+            'stages': {},
+            'events': self.pending_events,
+            **fields,
+        }
+        self.pending_events = {}
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.current is not None:
+                stages = self.current['stages']
+                stages[name] = stages.get(name, 0.0) + time.perf_counter() - start
+
+    def event(self, name, count=1):
+        events = self.current['events'] if self.current is not None else self.pending_events
+        events[name] = events.get(name, 0) + count
+
+    def finish(self, status):
+        if self.current is None:
+            return
+        record = self.current
+        record['status'] = status
+        record['total'] = time.perf_counter() - self._started
+        self.current = None
+
+        # One write per line on an O_APPEND descriptor, so worker processes can share the trace
+        line = (json.dumps(record, default=str) + "\n").encode("utf-8")
+        fd = os.open(self.trace_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+
+_metrics = None
+
+
+def get_metrics():
+    """Return the process-wide RunMetrics"""
+    global _metrics
+    if _metrics is None:
+        _metrics = RunMetrics()
+    return _metrics
+
+
+def load_trace(path=TRACE_PATH):
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                # Torn last line of an interrupted run
+                continue
+    return records
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(records):
+    """
+    Returns {'units', 'stages': {stage: {count, sum, quantiles}}, 'events': {event: total}, 'statuses'}.
+    Stage statistics only cover the units that went through that stage.
+    """
+    durations = {}
+    events = {name: 0 for name in EVENTS}
+    statuses = {}
+    for record in records:
+        for name, seconds in record.get('stages', {}).items():
+            durations.setdefault(name, []).append(seconds)
+        durations.setdefault('total', []).append(record.get('total', 0.0))
+        for name, count in record.get('events', {}).items():
+            events[name] = events.get(name, 0) + count
+        statuses[record.get('status')] = statuses.get(record.get('status'), 0) + 1
+
+    stages = {}
+    for name in STAGES + ['total']:
+        values = sorted(durations.get(name, []))
+        stages[name] = {
+            'count': len(values),
+            'sum': sum(values),
+            'quantiles': {q: percentile(values, q) for q in QUANTILES},
+        }
+    return {'units': len(records), 'stages': stages, 'events': events, 'statuses': statuses}
+
+
+def format_report(summary):
+    lines = [f"{'stage':<16}{'count':>8}{'total s':>12}{'p50':>9}{'p95':>9}{'p99':>9}"]
+    for name, stats in summary['stages'].items():
+        quantiles = stats['quantiles']
+        lines.append(f"{name:<16}{stats['count']:>8}{stats['sum']:>12.1f}"
+                     f"{quantiles[0.5]:>9.2f}{quantiles[0.95]:>9.2f}{quantiles[0.99]:>9.2f}")
+    lines.append("events: " + ", ".join(f"{name}={count}" for name, count in summary['events'].items()))
+    lines.append("status: " + ", ".join(f"{status}={count}" for status, count in summary['statuses'].items()))
+    return "\n".join(lines)
+
+
+def write_prometheus(summary, path):
+    """Write the summary in the Prometheus text format (for node_exporter's textfile collector)"""
+    lines = [
+        "# HELP mrf_stage_seconds Time spent per unit of work in each pipeline stage",
+        "# TYPE mrf_stage_seconds summary",
+    ]
+    for name, stats in summary['stages'].items():
+        for q, value in stats['quantiles'].items():
+            lines.append(f'mrf_stage_seconds{{stage="{name}",quantile="{q}"}} {value:.6f}')
+        lines.append(f'mrf_stage_seconds_sum{{stage="{name}"}} {stats["sum"]:.6f}')
+        lines.append(f'mrf_stage_seconds_count{{stage="{name}"}} {stats["count"]}')
+
+    lines += ["# HELP mrf_events_total Retries, driver restarts and CAPTCHAs", "# TYPE mrf_events_total counter"]
+    for name, count in summary['events'].items():
+        lines.append(f'mrf_events_total{{event="{name}"}} {count}')
+
+    lines += ["# HELP mrf_units_total Units of work by final status", "# TYPE mrf_units_total counter"]
+    for status, count in summary['statuses'].items():
+        lines.append(f'mrf_units_total{{status="{status}"}} {count}')
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as fh:
+        fh.write("\n".join(lines) + "\n")
+    os.replace(temp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a run trace per pipeline stage")
+    parser.add_argument("trace", nargs="?", default=TRACE_PATH)
+    parser.add_argument("--prometheus", help="Also write the metrics in Prometheus text format to this file")
+    args = parser.parse_args()
+
+    summary = summarize(load_trace(args.trace))
+    print(format_report(summary))
+    if args.prometheus:
+        write_prometheus(summary, args.prometheus)
+
+
+if __name__ == "__main__":
+    main()
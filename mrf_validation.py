@@ -0,0 +1,193 @@
+import argparse
+import asyncio
+import re
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+import pandas as pd
+from http_utils import fetch_headers, fetch_prefix, get_session
+
+
+MRF_VALIDATION_RESULTS = "mrf_validation.csv"
+MRF_VALIDATION_COLUMNS = ['url', 'final_url', 'status_code', 'content_type', 'content_length',
+                          'last_modified', 'format', 'valid', 'checked_at']
+
+# Enough for magic numbers and the first line of a CSV; never more is read per URL
+SNIFF_BYTES = 4096
+
+FORMAT_JSON = "json"
+FORMAT_CSV = "csv"
+FORMAT_ZIP = "zip"
+FORMAT_GZIP = "gzip"
+FORMAT_XLSX = "xlsx"
+FORMAT_XLS = "xls"
+FORMAT_PDF = "pdf"
+FORMAT_HTML = "html"
+FORMAT_XML = "xml"
+FORMAT_TEXT = "txt"
+FORMAT_UNKNOWN = "unknown"
+
+MACHINE_READABLE_FORMATS = {FORMAT_JSON, FORMAT_CSV, FORMAT_ZIP, FORMAT_GZIP, FORMAT_XLSX}
+
+MAGIC_NUMBERS = [
+    (b"PK\x03\x04", FORMAT_ZIP),
+    (b"\x1f\x8b", FORMAT_GZIP),
+    (b"%PDF", FORMAT_PDF),
+    (b"\xd0\xcf\x11\xe0", FORMAT_XLS),
+]
+
+EXTENSION_FORMATS = {
+    'json': FORMAT_JSON, 'csv': FORMAT_CSV, 'zip': FORMAT_ZIP, 'gz': FORMAT_GZIP,
+    'xlsx': FORMAT_XLSX, 'xls': FORMAT_XLS, 'pdf': FORMAT_PDF, 'txt': FORMAT_TEXT,
+    'htm': FORMAT_HTML, 'html': FORMAT_HTML, 'aspx': FORMAT_HTML, 'xml': FORMAT_XML,
+}
+
+CONTENT_TYPE_FORMATS = {
+    'application/json': FORMAT_JSON, 'text/csv': FORMAT_CSV, 'application/zip': FORMAT_ZIP,
+    'application/gzip': FORMAT_GZIP, 'application/x-gzip': FORMAT_GZIP, 'application/pdf': FORMAT_PDF,
+    'text/html': FORMAT_HTML, 'application/xml': FORMAT_XML, 'text/xml': FORMAT_XML,
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': FORMAT_XLSX,
+    'application/vnd.ms-excel': FORMAT_XLS,
+}
+
+EXTENSION_PATTERN = re.compile(r"\.([a-z0-9]{2,5})$")
+CONTENT_RANGE_PATTERN = re.compile(r"bytes\s+\d+-\d+/(\d+)")
+
+
+def format_from_extension(url):
+    match = EXTENSION_PATTERN.search(urlparse(url).path.lower())
+    return EXTENSION_FORMATS.get(match.group(1)) if match else None
+
+
+def format_from_bytes(prefix):
+    """Detect the format from the first bytes of a file, or None if they are inconclusive"""
+    for magic, file_format in MAGIC_NUMBERS:
+        if prefix.startswith(magic):
+            return file_format
+    if not prefix or b"\x00" in prefix:
+        return None
+
+    text = prefix.decode("utf-8", errors="ignore").lstrip("\ufeff \t\r\n")
+    lowered = text[:512].lower()
+    if text.startswith(("{", "[")):
+        return FORMAT_JSON
+    if lowered.startswith("<?xml"):
+        return FORMAT_HTML if "<html" in lowered else FORMAT_XML
+    if lowered.startswith(("<!doctype html", "<html", "<head", "<!--")) or "<body" in lowered:
+        return FORMAT_HTML
+    first_line = text.split("\n", 1)[0]
+    if first_line.count(",") >= 2 or first_line.count("\t") >= 2 or first_line.count("|") >= 2:
+        return FORMAT_CSV
+    return None
+
+
+def detect_format(prefix, url, content_type=""):
+    """
+    Magic bytes decide; the extension only splits zip from xlsx (an xlsx is a zip)
+    and is used, like the Content-Type, when the bytes say nothing.
+    """
+    by_extension = format_from_extension(url)
+    by_bytes = format_from_bytes(prefix)
+    if by_bytes == FORMAT_ZIP and by_extension == FORMAT_XLSX:
+        return FORMAT_XLSX
+    if by_bytes:
+        return by_bytes
+    by_content_type = CONTENT_TYPE_FORMATS.get((content_type or "").split(";")[0].strip().lower())
+    return by_extension or by_content_type or FORMAT_UNKNOWN
+
+
+def total_length(status_code, headers):
+    """Full size of the file: from Content-Range for a 206, else Content-Length"""
+    match = CONTENT_RANGE_PATTERN.search(headers.get('Content-Range', ""))
+    if match:
+        return int(match.group(1))
+    if status_code != 206 and headers.get('Content-Length', "").isdigit():
+        return int(headers['Content-Length'])
+    return None
+
+
+def validate_mrf_url(url, timeout=15):
+    """
+    Check an MRF URL without downloading it: one ranged GET for the first SNIFF_BYTES
+    (headers plus magic bytes), and a HEAD when the server refuses that.
+    """
+    status_code, headers, prefix, final_url = fetch_prefix(url, SNIFF_BYTES, timeout)
+    if status_code is None or status_code in (405, 416, 501):
+        # Some servers reject Range; HEAD still gives status, type, size and date
+        status_code, headers, final_url = fetch_headers(url, timeout)
+        prefix = b""
+
+    content_type = headers.get('Content-Type', "")
+    file_format = detect_format(prefix, final_url or url, content_type)
+    return {
+        'url': url,
+        'final_url': final_url,
+        'status_code': status_code,
+        'content_type': content_type,
+        'content_length': total_length(status_code, headers),
+        'last_modified': headers.get('Last-Modified', ""),
+        'format': file_format,
+        'valid': status_code is not None and status_code < 400 and file_format in MACHINE_READABLE_FORMATS,
+        'checked_at': datetime.now(timezone.utc).isoformat(),
+    }
+
+
+async def validate_one(url, global_limit, host_limits, timeout):
+    async with global_limit, host_limits[urlparse(url).netloc]:
+        try:
+            return await asyncio.wait_for(asyncio.to_thread(validate_mrf_url, url, timeout), timeout * 2 + 5)
+        except asyncio.TimeoutError:
+            return {'url': url, 'status_code': None, 'format': FORMAT_UNKNOWN, 'valid': False,
+                    'checked_at': datetime.now(timezone.utc).isoformat()}
+
+
+async def validate_mrf_urls(urls, concurrency=20, per_host=2, timeout=15):
+    """Validate every URL with bounded global and per-host concurrency"""
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+    get_session(pool_size=concurrency)
+
+    global_limit = asyncio.Semaphore(concurrency)
+    host_limits = defaultdict(lambda: asyncio.Semaphore(per_host))
+
+    tasks = [validate_one(url, global_limit, host_limits, timeout) for url in urls]
+    results = []
+    for done, task in enumerate(asyncio.as_completed(tasks), start=1):
+        results.append(await task)
+        if done % 100 == 0 or done == len(tasks):
+            print(f"Validated {done}/{len(tasks)} MRF URLs")
+    return results
+
+
+def validate(urls, concurrency=20, per_host=2, timeout=15):
+    """Validate all unique http(s) URLs and return the results table"""
+    unique = sorted({url for url in urls if isinstance(url, str) and url.startswith(('http://', 'https://'))})
+    results = asyncio.run(validate_mrf_urls(unique, concurrency, per_host, timeout)) if unique else []
+    return pd.DataFrame(results, columns=MRF_VALIDATION_COLUMNS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check MRF file URLs without downloading the files")
+    parser.add_argument("input", help="CSV file with MRF URLs (e.g. output_links.csv)")
+    parser.add_argument("--column", default="File URL", help="Column holding the MRF URL")
+    parser.add_argument("--output", default=MRF_VALIDATION_RESULTS)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--per-host", type=int, default=2)
+    parser.add_argument("--timeout", type=float, default=15)
+    args = parser.parse_args()
+
+    start_time = time.time()
+    urls = pd.read_csv(args.input)[args.column].tolist()
+    df = validate(urls, args.concurrency, args.per_host, args.timeout)
+    df.sort_values('url').to_csv(args.output, index=False)
+
+    print(df['format'].value_counts().to_string())
+    print(f"{int(df['valid'].sum())} of {len(df)} URLs are reachable machine-readable files")
+    print(f"Results saved to {args.output}")
+    print(f"Execution Time: {time.time() - start_time:.2f} seconds")
+
+
+if __name__ == '__main__':
+    main()
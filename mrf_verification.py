@@ -0,0 +1,291 @@
+import argparse
+import asyncio
+import csv
+import json
+import math
+import re
+import time
+import zlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import pandas as pd
+from cms_parser import normalize
+from http_utils import fetch_prefix, get_session
+from mrf_validation import FORMAT_CSV, FORMAT_GZIP, FORMAT_JSON, detect_format
+
+
+MRF_VERIFICATION_RESULTS = "mrf_verification.csv"
+
+# The CMS header (hospital name, license, locations) sits at the very start of the file
+HEADER_BYTES = 256 * 1024
+
+# Where the charges start in a JSON MRF; nothing after this key is read
+JSON_BODY_KEYS = {"standard_charge_information", "standard_charges", "modifier_information"}
+
+VERIFY_MATCH = "match"
+VERIFY_MISMATCH = "mismatch"
+VERIFY_UNKNOWN = "unknown"
+
+# A sibling hospital of the same system ("Saint Mary ...") should not pass
+MIN_VERIFY_SCORE = 0.6
+
+WHITESPACE = re.compile(r"\s*")
+
+
+def parse_json_header(text):
+    """
+    Decode the top-level key/value pairs of a (truncated) JSON object one at a time,
+    stopping at the charges or at the first value cut off by the end of the prefix.
+    """
+    decoder = json.JSONDecoder()
+    fields = {}
+    pos = WHITESPACE.match(text, 0).end()
+    if not text.startswith("{", pos):
+        return fields
+    pos += 1
+
+    while True:
+        pos = WHITESPACE.match(text, pos).end()
+        if pos >= len(text) or text[pos] == "}":
+            break
+        try:
+            key, pos = decoder.raw_decode(text, pos)
+        except ValueError:
+            break
+        pos = WHITESPACE.match(text, pos).end()
+        if not text.startswith(":", pos) or key in JSON_BODY_KEYS:
+            break
+        pos = WHITESPACE.match(text, pos + 1).end()
+        try:
+            value, pos = decoder.raw_decode(text, pos)
+        except ValueError:
+            break
+        fields[key] = value
+        pos = WHITESPACE.match(text, pos).end()
+        if not text.startswith(",", pos):
+            break
+        pos += 1
+    return fields
+
+
+def parse_csv_header(text):
+    """CMS CSV files put the header labels in row 1 and their values in row 2"""
+    rows = list(csv.reader(text.splitlines()[:2]))
+    if len(rows) < 2:
+        return {}
+    fields = {}
+    for label, value in zip(rows[0], rows[1]):
+        label = label.strip().lower()
+        # "license_number | CO" carries the license state in the label
+        if label.startswith("license_number"):
+            _, _, license_state = label.partition("|")
+            fields["license_information"] = {"license_number": value.strip(), "state": license_state.strip().upper()}
+        elif label:
+            fields[label] = value.strip()
+    return fields
+
+
+def as_list(value):
+    """Header fields may be a string, a "|"-separated string or a list"""
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return [str(item).strip() for item in value if item]
+    return [part.strip() for part in str(value).split("|") if part.strip()]
+
+
+def normalize_header(fields):
+    license_information = fields.get("license_information") or {}
+    if isinstance(license_information, list):
+        license_information = license_information[0] if license_information else {}
+    if not isinstance(license_information, dict):
+        license_information = {}
+    return {
+        'hospital_name': str(fields.get("hospital_name") or ""),
+        'last_updated_on': str(fields.get("last_updated_on") or ""),
+        'license_number': str(license_information.get("license_number") or ""),
+        'license_state': str(license_information.get("state") or "").upper(),
+        # v1.1 uses hospital_location, v2 location_name
+        'locations': as_list(fields.get("location_name") or fields.get("hospital_location")),
+        'addresses': as_list(fields.get("hospital_address")),
+    }
+
+
+def read_header(url, timeout=15):
+    """
+    Stream the start of an MRF and extract its CMS header fields. The read stops after
+    timeout seconds, so a server trickling bytes cannot hold the worker thread.
+    Returns (status_code, format, header) where header is None if the file had none we could read.
+    """
+    def reached_charges(prefix):
+        return any(key.encode() in prefix for key in JSON_BODY_KEYS)
+
+    status_code, headers, prefix, final_url = fetch_prefix(url, HEADER_BYTES, timeout, stop=reached_charges,
+                                                           max_seconds=timeout)
+    file_format = detect_format(prefix, final_url or url, headers.get('Content-Type', ""))
+
+    if file_format == FORMAT_GZIP:
+        # Inflate no more than HEADER_BYTES of a gzipped file
+        try:
+            prefix = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(prefix, HEADER_BYTES)
+        except zlib.error:
+            return status_code, file_format, None
+        file_format = detect_format(prefix, "", "")
+
+    text = prefix.decode("utf-8", errors="ignore").lstrip("\ufeff")
+    if file_format == FORMAT_JSON:
+        fields = parse_json_header(text)
+    elif file_format == FORMAT_CSV:
+        fields = parse_csv_header(text)
+    else:
+        return status_code, file_format, None
+    return status_code, file_format, normalize_header(fields) if fields else None
+
+
+def name_similarity(facility_tokens, name):
+    """
+    Cosine over binary token sets. Unlike LocationMatcher, tokens missing from the header
+    name count against the match, so "Saint Mary Medical Center" does not pass for
+    "Saint Mary Regional Hospital".
+    """
+    name_tokens = normalize(name)
+    if not facility_tokens or not name_tokens:
+        return 0.0
+    return len(facility_tokens & name_tokens) / math.sqrt(len(facility_tokens) * len(name_tokens))
+
+
+def verify_header(header, facility_name, city=None, state=None, min_score=MIN_VERIFY_SCORE):
+    """
+    Compare a file header with a facility row.
+    Returns (verdict, score): the name has to match the hospital name or one of the locations,
+    and a license state or address that names another state or city rules the file out.
+    """
+    if not header:
+        return VERIFY_UNKNOWN, 0.0
+    names = [name for name in [header['hospital_name']] + header['locations'] if name]
+    if not names:
+        return VERIFY_UNKNOWN, 0.0
+
+    if isinstance(state, str) and state and header['license_state'] and header['license_state'] != state.upper():
+        return VERIFY_MISMATCH, 0.0
+
+    if isinstance(city, str) and city and header['addresses']:
+        city_tokens = normalize(city)
+        places = header['addresses'] + names
+        if not any(city_tokens <= normalize(place) for place in places):
+            return VERIFY_MISMATCH, 0.0
+
+    facility_tokens = normalize(str(facility_name))
+    if isinstance(city, str) and normalize(city) < facility_tokens:
+        # Search queries carry the city after the name
+        facility_tokens -= normalize(city)
+    best = max(name_similarity(facility_tokens, name) for name in names)
+    return (VERIFY_MATCH if best >= min_score else VERIFY_MISMATCH), best
+
+
+def verification_result(url, status_code=None, file_format=None, header=None, verdict=VERIFY_UNKNOWN, score=0.0):
+    """One row of the results table; the header columns are None when no header was read"""
+    header = header or {}
+    return {
+        'url': url,
+        'status_code': status_code,
+        'format': file_format,
+        'hospital_name': header.get('hospital_name'),
+        'last_updated_on': header.get('last_updated_on'),
+        'license_number': header.get('license_number'),
+        'license_state': header.get('license_state'),
+        'locations': "|".join(header['locations']) if header else None,
+        'verdict': verdict,
+        'score': score,
+    }
+
+
+def verify_mrf_file(url, facility_name, city=None, state=None, timeout=15):
+    status_code, file_format, header = read_header(url, timeout)
+    verdict, score = verify_header(header, facility_name, city, state)
+    return verification_result(url, status_code, file_format, header, verdict, score)
+
+
+async def verify_one(check, global_limit, host_limits, timeout):
+    url = check['url']
+    async with global_limit, host_limits[urlparse(url).netloc]:
+        # read_header stops reading on its own; this only catches a thread stuck elsewhere
+        try:
+            return await asyncio.wait_for(
+                asyncio.to_thread(verify_mrf_file, url, check['facility_name'], check.get('city'),
+                                  check.get('state'), timeout),
+                timeout * 2 + 5,
+            )
+        except asyncio.TimeoutError:
+            print(f"MRF verification timed out for {url}")
+            return verification_result(url)
+
+
+async def verify_mrf_files(checks, concurrency=20, per_host=2, timeout=15):
+    """
+    checks: list of dicts with url, facility_name and optionally city and state.
+    Returns one result per check, in the same order.
+    """
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+    get_session(pool_size=concurrency)
+
+    global_limit = asyncio.Semaphore(concurrency)
+    host_limits = defaultdict(lambda: asyncio.Semaphore(per_host))
+    return await asyncio.gather(*(verify_one(check, global_limit, host_limits, timeout) for check in checks))
+
+
+def rank_by_verification(candidates, facility_name, city=None, state=None, top=3, timeout=15):
+    """
+    Verify the top MRF candidates against the facility and reorder them: confirmed files first,
+    then files whose header could not be read, then files of other facilities.
+    """
+    checked = candidates[:top]
+    checks = [{'url': candidate['url'], 'facility_name': facility_name, 'city': city, 'state': state}
+              for candidate in checked]
+    results = asyncio.run(verify_mrf_files(checks, concurrency=len(checks), timeout=timeout))
+
+    order = {VERIFY_MATCH: 0, VERIFY_UNKNOWN: 1, VERIFY_MISMATCH: 2}
+    ranked = sorted(zip(checked, results), key=lambda pair: order[pair[1]['verdict']])
+    for candidate, result in ranked:
+        candidate['verdict'] = result['verdict']
+        print(f"MRF candidate {candidate['url']}: {result['verdict']} ({result['hospital_name'] or ''})")
+    return [candidate for candidate, _ in ranked] + candidates[top:]
+
+
+def verify(df, concurrency=20, per_host=2, timeout=15):
+    """Verify the File URL of every row against its facility. Returns a results table indexed like df"""
+    checks, indices = [], []
+    for i, row in df.iterrows():
+        url = row.get('File URL')
+        if isinstance(url, str) and url.startswith(('http://', 'https://')):
+            checks.append({'url': url, 'facility_name': row['Facility Name'],
+                           'city': row.get('City/Town'), 'state': row.get('State')})
+            indices.append(i)
+    results = asyncio.run(verify_mrf_files(checks, concurrency, per_host, timeout)) if checks else []
+    return pd.DataFrame(results, index=indices, columns=list(verification_result("")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that found MRF files belong to their facility")
+    parser.add_argument("input", help="CSV file with facilities and MRF URLs (e.g. output_links.csv)")
+    parser.add_argument("--output", default=MRF_VERIFICATION_RESULTS)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--per-host", type=int, default=2)
+    parser.add_argument("--timeout", type=float, default=15)
+    args = parser.parse_args()
+
+    start_time = time.time()
+    df = pd.read_csv(args.input)
+    results = verify(df, args.concurrency, args.per_host, args.timeout)
+    df.join(results.add_prefix("mrf_"), how="inner").to_csv(args.output, index=False)
+
+    if len(results):
+        print(results['verdict'].value_counts().to_string())
+    print(f"Results saved to {args.output}")
+    print(f"Execution Time: {time.time() - start_time:.2f} seconds")
+
+
+if __name__ == '__main__':
+    main()
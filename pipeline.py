@@ -0,0 +1,189 @@
+from urllib.parse import urljoin, urlparse
+from get_source_and_mrf_cms_txt import fetch_cms_lines
+from cms_parser import iter_cms_records
+from matching import LocationMatcher
+from metrics import STAGE_CMS_PARSE, STAGE_CMS_PROBE, STAGE_MANUAL, STAGE_SEARCH, get_metrics
+
+
+DRIVER_ERROR_KEYWORDS = ['timeout', 'connection', 'webdriver', 'chrome']
+
+
+def is_driver_error(error):
+    """Return True if the exception looks like the browser/driver died"""
+    return any(keyword in str(error).lower() for keyword in DRIVER_ERROR_KEYWORDS)
+
+
+class ErrorBudget:
+    """
+    Decides when a run should give up: after max_consecutive failed rows in a row, or when more
+    than max_error_rate of the rows have failed once at least min_rows have been processed.
+    Driver restarts do not count against it, only rows that ended in an error.
+    """
+
+    def __init__(self, max_error_rate=0.5, min_rows=20, max_consecutive=25):
+        self.max_error_rate = max_error_rate
+        self.min_rows = min_rows
+        self.max_consecutive = max_consecutive
+        self.rows = 0
+        self.errors = 0
+        self.consecutive = 0
+
+    def record(self, ok):
+        self.rows += 1
+        if ok:
+            self.consecutive = 0
+        else:
+            self.errors += 1
+            self.consecutive += 1
+
+    def exhausted(self):
+        """Returns the reason to abort, or None while the budget holds"""
+        if self.max_consecutive and self.consecutive >= self.max_consecutive:
+            return f"{self.consecutive} rows failed in a row"
+        if self.rows >= self.min_rows and self.errors / self.rows > self.max_error_rate:
+            return f"{self.errors} of {self.rows} rows failed"
+        return None
+
+
+def empty_result():
+    return {
+        'Hospital Link': '',
+        'has_cms_txt': False,
+        'Source URL': '',
+        'File URL': '',
+    }
+
+
+def facility_id_for(row, index):
+    """Stable key for a row: its Facility ID, or the row index when the input has none"""
+    facility_id = row.get('Facility ID')
+    if facility_id is None or facility_id != facility_id:  # missing or NaN
+        return str(index)
+    if isinstance(facility_id, float) and facility_id.is_integer():
+        facility_id = int(facility_id)
+    return str(facility_id)
+
+
+def search_query_for(row):
+    return f"{row['Facility Name']} {row['City/Town']}"
+
+
+def resolve_root_url(selenium, row):
+    """Search for the facility website and return its scheme://netloc, or None"""
+    with get_metrics().stage(STAGE_SEARCH):
+        result_url = selenium.get_url(search_query_for(row))
+    if not result_url:
+        return None
+    parsed = urlparse(result_url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+def load_domain(selenium, root_url, probe_results=None, domain_cache=None):
+    """
+    Fetch and parse a domain's cms-hpt.txt once.
+    Returns a LocationMatcher over its records, or False if the domain has no CMS file.
+    Results are memoized in domain_cache when one is given.
+    """
+    cached = (domain_cache or {}).get(root_url, {})
+    if 'records' in cached:
+        return cached['records']
+
+    cms_url = urljoin(root_url, "cms-hpt.txt")
+    probe_state = (probe_results or {}).get(root_url)
+    metrics = get_metrics()
+    with metrics.stage(STAGE_CMS_PROBE):
+        lines = fetch_cms_lines(selenium, cms_url, probe_state)
+    with metrics.stage(STAGE_CMS_PARSE):
+        records = LocationMatcher(iter_cms_records(lines)) if lines is not False else False
+
+    if domain_cache is not None:
+        domain_cache.setdefault(root_url, {})['records'] = records
+    return records
+
+
+def manual_search(selenium, root_url, search_query, domain_cache=None, row=None):
+    """Run get_source_mrf_manually once per domain, memoized in domain_cache"""
+    cached = (domain_cache or {}).get(root_url, {})
+    if 'manual' in cached:
+        return cached['manual']
+
+    with get_metrics().stage(STAGE_MANUAL):
+        source, mrf = selenium.get_source_mrf_manually(root_url, search_query, row)
+    if domain_cache is not None:
+        domain_cache.setdefault(root_url, {})['manual'] = (source, mrf)
+    return source, mrf
+
+
+def process_group(selenium, root_url, rows, probe_results=None, domain_cache=None):
+    """
+    Resolve every facility row that shares root_url against that domain's cms-hpt.txt.
+    rows is a list of (index, row) pairs. Returns {index: result}.
+    """
+    results = {}
+
+    if not root_url:
+        for index, _ in rows:
+            result = empty_result()
+            result['Hospital Link'] = "Link Not Found"
+            results[index] = result
+        print("No valid link found.")
+        return results
+
+    cms_url = urljoin(root_url, "cms-hpt.txt")
+    records = load_domain(selenium, root_url, probe_results, domain_cache)
+
+    if records is False:  # CMS file doesn't exist
+        # The manual search only depends on the homepage, run it once for the whole group
+        source, mrf = manual_search(selenium, root_url, search_query_for(rows[0][1]), domain_cache, rows[0][1])
+        for index, _ in rows:
+            result = empty_result()
+            result['Hospital Link'] = root_url
+            result['Source URL'] = source
+            result['File URL'] = mrf
+            results[index] = result
+        return results
+
+    # One matcher per cms-hpt.txt scores every facility of the group; each name only touches the
+    # locations that share one of its words
+    with get_metrics().stage(STAGE_CMS_PARSE):
+        matches = records.match(
+            [row['Facility Name'] for _, row in rows],
+            cities=[row.get('City/Town') for _, row in rows],
+            states=[row.get('State') for _, row in rows],
+        )
+
+    for (index, _), match in zip(rows, matches):
+        result = empty_result()
+        result['Hospital Link'] = cms_url
+        result['has_cms_txt'] = True
+        if match:  # CMS file exists and has matches
+            score, record = match
+            print(f"Found CMS: {cms_url} ({record.location_name}, score {score:.2f})")
+            result['Source URL'], result['File URL'] = record.links()
+        else:  # CMS file exists but no matches
+            print(f"Found CMS but no matching records: {cms_url}")
+        results[index] = result
+
+    return results
+
+
+def group_by_root_url(root_urls):
+    """
+    root_urls: {index: root_url or None}.
+    Returns {root_url: [index, ...]} keeping the first-seen order of domains and rows.
+    """
+    groups = {}
+    for index, root_url in root_urls.items():
+        groups.setdefault(root_url, []).append(index)
+    return groups
+
+
+def process_row(selenium, row, probe_results=None, domain_cache=None):
+    """
+    Resolve a single facility row to its hospital link, source page and MRF file.
+    probe_results maps root URLs to cms-hpt.txt states from cms_discovery.
+    domain_cache lets rows that share a domain reuse its parsed cms-hpt.txt and manual search.
+    Returns a dict with the output columns for that row.
+    """
+    root_url = resolve_root_url(selenium, row)
+    return process_group(selenium, root_url, [(None, row)], probe_results, domain_cache)[None]
@@ -0,0 +1,188 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+from urllib.parse import urlparse
+
+
+# Requests per second and burst size per host suffix. Bing is paced strictly
+# (about one search every 6-7 s, like the old random 4-9 s sleep); hospital
+# sites are usually visited once or twice per run and get a small burst.
+# Bing's bucket is shared by every process on the machine (--workers, --queue), so
+# running several workers does not multiply the search rate.
+DEFAULT_POLICIES = {
+    "bing.com": {"rate": 1 / 6.5, "capacity": 1, "jitter": 2.5, "shared": True},
+}
+DEFAULT_POLICY = {"rate": 1.0, "capacity": 3, "jitter": 0}
+
+MAX_BACKOFF = 16  # slow a host down to at most 1/16th of its normal rate
+
+SHARED_STATE_PATH = os.path.join("cache", "rate_limits.sqlite3")
+
+
+def host_of(url_or_host):
+    if "://" in url_or_host:
+        return urlparse(url_or_host).netloc.lower()
+    return url_or_host.lower()
+
+
+class TokenBucket:
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self, rate, capacity, jitter=0):
+        self.rate = rate
+        self.capacity = capacity
+        self.jitter = jitter
+        self.tokens = capacity
+        self.updated = self.clock()
+        self.backoff = 1.0
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        elapsed = now - self.updated
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate / self.backoff)
+        self.updated = now
+
+    def reserve(self):
+        """Take a token and return how long the caller has to wait before using it"""
+        now = self.clock()
+        self._refill(now)
+        self.tokens -= 1
+        wait = 0.0
+        if self.tokens < 0:
+            wait = -self.tokens * self.backoff / self.rate
+        wait = max(wait, self.blocked_until - now)
+        if wait > 0 and self.jitter:
+            wait += random.uniform(0, self.jitter)
+        return wait
+
+    def penalize(self, cooldown):
+        """Halve the rate and pause the bucket; returns the new backoff factor"""
+        self.backoff = min(self.backoff * 2, MAX_BACKOFF)
+        self.tokens = min(self.tokens, 0)
+        self.blocked_until = self.clock() + cooldown * self.backoff / 2
+        return self.backoff
+
+    def reward(self):
+        self.backoff = max(1.0, self.backoff * 0.8)
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    Token bucket whose state lives in a SQLite file, so all processes on one machine draw from
+    the same bucket. Every operation loads, updates and stores the state under the database's
+    write lock. Wall-clock time is used because monotonic clocks are not comparable across processes.
+    """
+
+    clock = staticmethod(time.time)
+
+    def __init__(self, key, rate, capacity, jitter=0, path=SHARED_STATE_PATH):
+        super().__init__(rate, capacity, jitter)
+        self.key = key
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL,
+                backoff REAL NOT NULL,
+                blocked_until REAL NOT NULL
+            )"""
+        )
+
+    def _shared(self, update):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            state = self.conn.execute(
+                "SELECT tokens, updated, backoff, blocked_until FROM buckets WHERE key = ?", (self.key,)
+            ).fetchone()
+            if state:
+                self.tokens, self.updated, self.backoff, self.blocked_until = state
+            value = update()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated, backoff, blocked_until) VALUES (?, ?, ?, ?, ?)",
+                (self.key, self.tokens, self.updated, self.backoff, self.blocked_until),
+            )
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+        return value
+
+    def reserve(self):
+        return self._shared(super().reserve)
+
+    def penalize(self, cooldown):
+        return self._shared(lambda: TokenBucket.penalize(self, cooldown))
+
+    def reward(self):
+        return self._shared(super().reward)
+
+
+class RateLimiter:
+    """
+    Token bucket per host. wait() blocks until the host may be contacted again.
+    penalize() is called when a host pushes back (CAPTCHA, block page) and halves
+    its rate each time; reward() slowly restores it after successful requests.
+    Policies marked "shared" keep their bucket in shared_path for all processes.
+    """
+
+    def __init__(self, policies=None, default_policy=None, shared_path=SHARED_STATE_PATH):
+        self.policies = policies if policies is not None else DEFAULT_POLICIES
+        self.default_policy = default_policy or DEFAULT_POLICY
+        self.shared_path = shared_path
+        self.buckets = {}
+        self._lock = threading.Lock()
+
+    def _policy_for(self, host):
+        for suffix, policy in self.policies.items():
+            if host == suffix or host.endswith("." + suffix):
+                return suffix, policy
+        return host, self.default_policy
+
+    def _bucket(self, host):
+        key, policy = self._policy_for(host)
+        if key not in self.buckets:
+            if policy.get("shared") and self.shared_path:
+                self.buckets[key] = SharedTokenBucket(key, policy["rate"], policy["capacity"],
+                                                      policy.get("jitter", 0), self.shared_path)
+            else:
+                self.buckets[key] = TokenBucket(policy["rate"], policy["capacity"], policy.get("jitter", 0))
+        return self.buckets[key]
+
+    def wait(self, url_or_host):
+        host = host_of(url_or_host)
+        if not host:
+            return 0.0
+        with self._lock:
+            delay = self._bucket(host).reserve()
+        if delay > 0:
+            print(f"Rate limit: waiting {delay:.1f}s before contacting {host}")
+            time.sleep(delay)
+        return delay
+
+    def penalize(self, url_or_host, cooldown=60):
+        """Back off a host after a CAPTCHA or block and pause it for cooldown seconds"""
+        host = host_of(url_or_host)
+        with self._lock:
+            backoff = self._bucket(host).penalize(cooldown)
+            print(f"Rate limit: backing off {host} (x{backoff:g})")
+
+    def reward(self, url_or_host):
+        host = host_of(url_or_host)
+        with self._lock:
+            self._bucket(host).reward()
+
+
+_limiter = None
+
+
+def get_rate_limiter():
+    """Return the process-wide RateLimiter"""
+    global _limiter
+    if _limiter is None:
+        _limiter = RateLimiter()
+    return _limiter
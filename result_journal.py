@@ -0,0 +1,77 @@
+import json
+import os
+from datetime import datetime, timezone
+
+
+JOURNAL_PATH = "output_links_journal.jsonl"
+
+STAGE_RESOLVED = "resolved"
+STAGE_DONE = "done"
+
+
+class ResultJournal:
+    """
+    Append-only JSONL journal of per-row progress.
+    Each line is written and fsynced as soon as a row finishes, so a crash loses
+    at most the row in flight and --resume can pick up where the run stopped.
+    """
+
+    def __init__(self, path=JOURNAL_PATH, resume=False):
+        self.path = path
+        if not resume and os.path.exists(path):
+            os.remove(path)
+        self.file = open(path, "a", encoding="utf-8")
+
+        # Terminate a line torn by a crash so the next entry starts cleanly
+        if self.file.tell() > 0:
+            with open(path, "rb") as existing:
+                existing.seek(-1, os.SEEK_END)
+                if existing.read(1) != b"\n":
+                    self.file.write("\n")
+
+    def _append(self, entry):
+        entry['at'] = datetime.now(timezone.utc).isoformat()
+        self.file.write(json.dumps(entry, default=str) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def record_resolved(self, facility_id, root_url):
+        """Record the website root found for a facility (None if the search found nothing)"""
+        self._append({'id': str(facility_id), 'stage': STAGE_RESOLVED, 'root_url': root_url})
+
+    def record_result(self, facility_id, result):
+        self._append({'id': str(facility_id), 'stage': STAGE_DONE, 'result': result})
+
+    def load(self):
+        """
+        Returns (resolved, results): {facility_id: root_url} and {facility_id: result}.
+        Later entries win; a torn last line from a crash is ignored.
+        """
+        return load_journal(self.path)
+
+    def close(self):
+        self.file.close()
+
+
+def load_journal(path=JOURNAL_PATH):
+    resolved = {}
+    results = {}
+    if not os.path.exists(path):
+        return resolved, results
+
+    with open(path, encoding="utf-8") as journal:
+        for line in journal:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if entry.get('stage') == STAGE_RESOLVED:
+                resolved[entry['id']] = entry.get('root_url')
+            elif entry.get('stage') == STAGE_DONE:
+                results[entry['id']] = entry['result']
+    return resolved, results
+
+
+def is_finished(result):
+    """Rows that ended in an error are retried on resume"""
+    return not str(result.get('Hospital Link', '')).startswith("Error:")
@@ -0,0 +1,79 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+
+
+SEARCH_CACHE_PATH = os.path.join("cache", "search_cache.sqlite3")
+DEFAULT_MAX_AGE_DAYS = 30
+
+# How a search result was resolved
+SEARCH_SOURCE_WEBSITE = "website_button"
+SEARCH_SOURCE_ORGANIC = "organic"
+SEARCH_NOT_FOUND = "not_found"
+
+
+def normalize_query(search_query):
+    query = re.sub(r"[^\w\s]", " ", str(search_query).lower())
+    return " ".join(query.split())
+
+
+class SearchCache:
+    """
+    Persistent map from normalized search query to the website URL it resolved to.
+    Searches that completed without finding a site are stored as SEARCH_NOT_FOUND so
+    they can be refreshed separately from successful ones.
+    """
+
+    def __init__(self, path=SEARCH_CACHE_PATH, max_age_days=DEFAULT_MAX_AGE_DAYS, refresh_failed=False):
+        self.path = path
+        self.max_age = max_age_days * 24 * 3600
+        self.refresh_failed = refresh_failed
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS searches (
+                query TEXT PRIMARY KEY,
+                url TEXT,
+                source TEXT NOT NULL,
+                resolved_at REAL NOT NULL
+            )"""
+        )
+        self.conn.commit()
+
+    def lookup(self, search_query):
+        """
+        Returns (hit, url). hit is False when the query has to be searched again:
+        never seen, expired, or a failed search while refresh_failed is set.
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT url, source, resolved_at FROM searches WHERE query = ?",
+                (normalize_query(search_query),),
+            ).fetchone()
+        if row is None:
+            return False, None
+
+        url, source, resolved_at = row
+        if time.time() - resolved_at >= self.max_age:
+            return False, None
+        if source == SEARCH_NOT_FOUND and self.refresh_failed:
+            return False, None
+        return True, url
+
+    def store(self, search_query, url, source):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO searches (query, url, source, resolved_at) VALUES (?, ?, ?, ?)",
+                (normalize_query(search_query), url, source, time.time()),
+            )
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
@@ -1,21 +1,78 @@
 # selenium_utils.py
-import base64
 import json
-import re
 import time
 import traceback
 import random
 import os
-from urllib.parse import parse_qs, urljoin, urlparse
+import threading
+from urllib.parse import urljoin
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from selenium.common.exceptions import NoSuchElementException, TimeoutException, WebDriverException
 from selenium.webdriver.chrome.service import Service
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 import undetected_chromedriver as uc
+from http_cache import get_cache
+from search_cache import SEARCH_NOT_FOUND, SEARCH_SOURCE_ORGANIC, SEARCH_SOURCE_WEBSITE, SearchCache
+from rate_limiter import get_rate_limiter
+from metrics import EVENT_CAPTCHA, EVENT_RESTART, EVENT_RETRY, get_metrics
+from mrf_verification import rank_by_verification
+from site_crawler import crawl_price_page
+from sitemap_discovery import discover_from_sitemaps
+from driver_cache import get_patched_driver, new_profile_dir, remove_profile_dir, save_profile_template
+from link_scoring import score_links
+from serp_parser import (RESULT_WEBSITE, bing_search_url, extract_url_from_bing_redirect, parse_serp,
+                         ranked_results)
+from http_utils import BLOCKED_STATUS_CODES, check_url, get_session, is_bot_challenge
+
+# Conditions accepted by SeleniumHandler.navigate / wait_until
+WAIT_DOM_READY = "dom_ready"          # DOMContentLoaded has fired
+WAIT_LOAD_COMPLETE = "load_complete"  # window load has fired
+WAIT_NETWORK_IDLE = "network_idle"    # load fired and no new resources for a short quiet period
+
+# Document state and number of loaded resources, polled for network idle detection
+NETWORK_IDLE_SCRIPT = """
+return [document.readyState, performance.getEntriesByType('resource').length];
+"""
+
+CHROME_VERSION_MAIN = 139
+
+# How get_url queries Bing
+SEARCH_MODE_TYPE = "type"      # load bing.com and type the query like a person
+SEARCH_MODE_DIRECT = "direct"  # open the results URL in the browser and parse its HTML
+SEARCH_MODE_HTTP = "http"      # fetch the results page over HTTP, browser only as a fallback
+SEARCH_MODES = [SEARCH_MODE_TYPE, SEARCH_MODE_DIRECT, SEARCH_MODE_HTTP]
+
+# Lean profile: resources we never read (we only need link hrefs and text)
+LEAN_BLOCKED_URLS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico", "*.bmp",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.mp3", "*.m4a", "*.ogg", "*.mov",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*",
+    "*googlesyndication.com*", "*facebook.net*", "*connect.facebook.com*",
+    "*hotjar.com*", "*clarity.ms*", "*nr-data.net*", "*newrelic.com*",
+    "*segment.com*", "*optimizely.com*", "*quantserve.com*", "*scorecardresearch.com*",
+    "*adsrvr.org*", "*linkedin.com/px*", "*snap.licdn.com*", "*tiktok.com/i18n/pixel*",
+    "*siteimproveanalytics.com*", "*crazyegg.com*", "*fullstory.com*",
+]
+
+# Chrome content settings: 2 = block
+LEAN_CONTENT_SETTINGS = {
+    "profile.managed_default_content_settings.images": 2,
+    "profile.managed_default_content_settings.media_stream": 2,
+    "profile.managed_default_content_settings.notifications": 2,
+    "profile.managed_default_content_settings.geolocation": 2,
+}
+
+# Driver recycling: restart Chrome only when it has grown too large or keeps failing
+MAX_BROWSER_RSS_MB = 1500
+MAX_WINDOW_HANDLES = 4
+MAX_CONSECUTIVE_ERRORS = 3
+# Without psutil the memory of Chrome cannot be measured; recycle after this many page loads instead
+MAX_NAVIGATIONS_WITHOUT_PSUTIL = 150
 
 try:
     from webdriver_manager.chrome import ChromeDriverManager
@@ -23,13 +80,56 @@ try:
 except ImportError:
     WEBDRIVER_MANAGER_AVAILABLE = False
 
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
 
 class SeleniumHandler:
-    def __init__(self, headless=True):
+    def __init__(self, headless=True, use_search_cache=True, search_cache_days=30, refresh_failed_searches=False,
+                 lean=False, search_mode=SEARCH_MODE_TYPE, warm_profile=True, keep_spare=False,
+                 max_rss_mb=MAX_BROWSER_RSS_MB, max_window_handles=MAX_WINDOW_HANDLES,
+                 max_consecutive_errors=MAX_CONSECUTIVE_ERRORS, verify_mrf=False, http_crawl=True,
+                 sitemap_discovery=True):
         self.headless = headless
+        self.lean = lean
+        self.search_mode = search_mode
+        self.verify_mrf = verify_mrf
+        self.http_crawl = http_crawl
+        self.sitemap_discovery = sitemap_discovery
+        self.rate_limiter = get_rate_limiter()
+        self.search_cache = None
+        if use_search_cache:
+            self.search_cache = SearchCache(max_age_days=search_cache_days,
+                                            refresh_failed=refresh_failed_searches)
+
+        # Patched chromedriver is cached on disk instead of downloaded and patched on every start
+        self.driver_path = get_patched_driver(CHROME_VERSION_MAIN)
+
+        # Two profile directories so a spare browser can start while the other one is in use
+        self.warm_profile = warm_profile
+        self.profile_dirs = [None, None]
+        if warm_profile:
+            name = f"{os.getpid()}-{id(self):x}"
+            self.profile_dirs = [new_profile_dir(f"{name}-a"), new_profile_dir(f"{name}-b")]
+        self.active_profile = 0
+
+        self.keep_spare = keep_spare
+        self._spare = None
+        self._spare_thread = None
+        self._closed = False
+
+        self.max_rss_mb = max_rss_mb
+        self.max_window_handles = max_window_handles
+        self.max_consecutive_errors = max_consecutive_errors
+        self.restart_count = 0
+
         self._init_driver()
+        self._start_spare()
 
-    def _init_driver(self):
+    def _chrome_options(self):
         chrome_options = Options()
         chrome_options.add_argument("--window-size=1920,1080")
         chrome_options.add_argument("--disable-blink-features=AutomationControlled")
@@ -52,33 +152,126 @@ class SeleniumHandler:
         if self.headless:
             chrome_options.add_argument("--headless=new")
 
+        # Network events in the performance log give us real status codes for page loads
+        chrome_options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        chrome_options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
+
+        if self.lean:
+            chrome_options.add_argument("--blink-settings=imagesEnabled=false")
+            chrome_options.add_argument("--autoplay-policy=user-gesture-required")
+            chrome_options.add_experimental_option("prefs", LEAN_CONTENT_SETTINGS)
+
+        return chrome_options
+
+    def _create_driver(self, profile_dir=None):
+        """Start a Chrome instance; options objects cannot be reused so each start builds its own"""
         try:
             # Try with automatic driver management first
-            self.driver = uc.Chrome(options=chrome_options,version_main=139, use_subprocess=True)
+            driver = uc.Chrome(options=self._chrome_options(), version_main=CHROME_VERSION_MAIN,
+                               use_subprocess=True, driver_executable_path=self.driver_path,
+                               user_data_dir=profile_dir)
             # Set timeouts
-            self.driver.set_page_load_timeout(60)  # 60 seconds page load timeout
-            self.driver.implicitly_wait(10)  # 10 seconds implicit wait
+            driver.set_page_load_timeout(60)  # 60 seconds page load timeout
+            driver.implicitly_wait(10)  # 10 seconds implicit wait
         except Exception as e:
             print(f"Failed to initialize with undetected_chromedriver: {e}")
             print("Falling back to regular ChromeDriver...")
             try:
                 # Fallback to regular ChromeDriver with automatic driver management
                 if WEBDRIVER_MANAGER_AVAILABLE:
-                    self.driver = webdriver.Chrome(options=chrome_options)
+                    driver = webdriver.Chrome(options=self._chrome_options())
                 else:
                     # Last fallback - try system ChromeDriver
                     print("webdriver_manager not available. Trying system ChromeDriver...")
-                    self.driver = webdriver.Chrome(options=chrome_options)
+                    driver = webdriver.Chrome(options=self._chrome_options())
                 
                 # Set timeouts for fallback driver too
-                self.driver.set_page_load_timeout(60)
-                self.driver.implicitly_wait(10)
+                driver.set_page_load_timeout(60)
+                driver.implicitly_wait(10)
             except Exception as e2:
                 print(f"Failed to initialize with fallback methods: {e2}")
                 print("Please install webdriver_manager: pip install webdriver-manager")
                 print("Or update your Chrome browser and ChromeDriver to compatible versions")
                 raise
 
+        if self.lean:
+            self._apply_lean_profile(driver)
+        return driver
+
+    def _init_driver(self):
+        self._set_driver(self._create_driver(self.profile_dirs[self.active_profile]))
+
+    def _set_driver(self, driver):
+        self.driver = driver
+        self.last_response = None
+        self.navigations = 0
+        self.consecutive_errors = 0
+
+    def _apply_lean_profile(self, driver):
+        """Block images, fonts, media and tracker hosts for every request through CDP"""
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": LEAN_BLOCKED_URLS})
+        except Exception as e:
+            print(f"Could not apply lean profile URL blocking: {e}")
+
+    def _start_spare(self):
+        """Boot a spare browser in the background in the profile that is not in use"""
+        if not self.keep_spare or self._spare_thread is not None:
+            # A spare that is still booting (slower than _take_spare waited) becomes the next
+            # spare; a second one would start in the same profile directory
+            return
+        spare_profile = self.profile_dirs[1 - self.active_profile]
+
+        def start():
+            try:
+                spare = self._create_driver(spare_profile)
+            except Exception as e:
+                print(f"Could not start spare browser: {e}")
+                spare = None
+            if spare is not None and self._closed:
+                # Finished booting after close() stopped waiting for it
+                try:
+                    spare.quit()
+                except:
+                    pass
+                spare = None
+            self._spare = spare
+
+        self._spare_thread = threading.Thread(target=start, daemon=True)
+        self._spare_thread.start()
+
+    def _take_spare(self, timeout=60):
+        """Return the warm spare driver if one is ready (waiting up to timeout for it), else None"""
+        if self._spare_thread is None:
+            return None
+        self._spare_thread.join(timeout)
+        if self._spare_thread.is_alive():
+            return None
+        self._spare_thread = None
+        spare, self._spare = self._spare, None
+        return spare
+
+    def _replace_driver(self):
+        """Quit the current browser and swap in the spare, or cold start a new one"""
+        try:
+            self.driver.quit()
+        except:
+            pass
+
+        self.restart_count += 1
+        get_metrics().event(EVENT_RESTART)
+        spare = self._take_spare()
+        if spare is not None:
+            self._set_driver(spare)
+            self.active_profile = 1 - self.active_profile
+            self._start_spare()
+            return
+
+        time.sleep(2)
+        self._init_driver()
+        self._start_spare()
+
     def ensure_driver(self):
         """Ensure the driver is running and responsive"""
         try:
@@ -88,16 +281,14 @@ class SeleniumHandler:
             self.driver.execute_script("return document.readyState")
         except Exception as e:
             print(f"Driver not responsive: {e}. Restarting...")
-            try:
-                self.driver.quit()
-            except:
-                pass
-            self._init_driver()
+            self._replace_driver()
 
     def safe_get(self, url, timeout=60):
         """Safely navigate to a URL with timeout handling"""
         try:
+            self.rate_limiter.wait(url)
             self.driver.set_page_load_timeout(timeout)
+            self.navigations += 1
             self.driver.get(url)
             return True
         except Exception as e:
@@ -109,25 +300,161 @@ class SeleniumHandler:
                 pass
             return False
 
+    def _browser_processes(self):
+        """chromedriver, Chrome and all their child processes (renderers, GPU, utility)"""
+        roots = []
+        service = getattr(self.driver, "service", None)
+        if service is not None and getattr(service, "process", None) is not None:
+            roots.append(service.process.pid)
+        # undetected_chromedriver starts Chrome itself, outside the chromedriver tree
+        if getattr(self.driver, "browser_pid", None):
+            roots.append(self.driver.browser_pid)
+
+        processes = {}
+        for pid in roots:
+            try:
+                root = psutil.Process(pid)
+                for process in [root] + root.children(recursive=True):
+                    processes[process.pid] = process
+            except psutil.Error:
+                continue
+        return list(processes.values())
+
+    def browser_rss_mb(self):
+        """Resident memory of the whole browser process tree in MB, or None if it cannot be measured"""
+        if not PSUTIL_AVAILABLE:
+            return None
+        total = 0
+        for process in self._browser_processes():
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                # Renderers come and go between listing and measuring
+                continue
+        return total / (1024 * 1024)
+
+    def record_success(self):
+        self.consecutive_errors = 0
+
+    def record_error(self):
+        self.consecutive_errors += 1
+
+    def recycle_reason(self):
+        """Why the driver should be restarted now, or None if it is healthy"""
+        if self.consecutive_errors >= self.max_consecutive_errors:
+            return f"{self.consecutive_errors} errors in a row"
+
+        try:
+            handles = len(self.driver.window_handles)
+        except Exception as e:
+            return f"driver not responsive ({e})"
+        if self.max_window_handles and handles > self.max_window_handles:
+            return f"{handles} open windows"
+
+        rss = self.browser_rss_mb()
+        if rss is None:
+            if self.navigations >= MAX_NAVIGATIONS_WITHOUT_PSUTIL:
+                return f"{self.navigations} page loads (install psutil to recycle by memory instead)"
+        elif self.max_rss_mb and rss > self.max_rss_mb:
+            return f"browser using {rss:.0f} MB"
+        return None
+
+    def recycle_if_needed(self):
+        """Restart the driver if it has outgrown its memory or handle limits or keeps failing"""
+        reason = self.recycle_reason()
+        if reason is None:
+            return False
+        print(f"Recycling driver after {self.navigations} page loads: {reason}")
+        self.restart_driver()
+        return True
+
     def restart_driver(self):
         """Restart the driver completely"""
         print("Restarting WebDriver...")
-        try:
-            self.driver.quit()
-        except:
-            pass
-        time.sleep(2)
-        self._init_driver()
+        self._replace_driver()
         print("WebDriver restarted successfully")
 
     def close(self):
-        self.driver.quit()
+        self._closed = True
+        spare = self._take_spare()
+        for driver in (self.driver, spare):
+            try:
+                if driver is not None:
+                    driver.quit()
+            except:
+                pass
+
+        # The first cleanly closed profile seeds the profiles of later runs
+        if self.warm_profile:
+            save_profile_template(self.profile_dirs[self.active_profile])
+            for profile_dir in self.profile_dirs:
+                remove_profile_dir(profile_dir)
 
     def wait_for_page_load(self, timeout=15):
         WebDriverWait(self.driver, timeout).until(
             lambda d: d.execute_script("return document.readyState") == "complete"
         )
 
+    def wait_until(self, condition=WAIT_DOM_READY, selector=None, timeout=15, idle_time=0.5):
+        """
+        Block until condition is met or timeout expires. Returns True if the condition was met.
+        condition is one of the WAIT_* values; when selector is given the wait ends as soon as
+        an element matching that CSS selector is present, whatever the document state.
+        """
+        if selector:
+            check = lambda d: d.find_elements(By.CSS_SELECTOR, selector)
+        elif condition == WAIT_LOAD_COMPLETE:
+            check = lambda d: d.execute_script("return document.readyState") == "complete"
+        elif condition == WAIT_NETWORK_IDLE:
+            state = {'count': -1, 'since': time.monotonic()}
+
+            def check(d):
+                ready_state, count = d.execute_script(NETWORK_IDLE_SCRIPT)
+                now = time.monotonic()
+                if count != state['count']:
+                    state['count'], state['since'] = count, now
+                    return False
+                return ready_state == "complete" and now - state['since'] >= idle_time
+        else:
+            check = lambda d: d.execute_script("return document.readyState") in ("interactive", "complete")
+
+        # Poll without the implicit wait, otherwise every missed find_elements costs 10 s
+        self.driver.implicitly_wait(0)
+        try:
+            WebDriverWait(self.driver, timeout, poll_frequency=0.1).until(check)
+            return True
+        except TimeoutException:
+            return False
+        finally:
+            self.driver.implicitly_wait(10)
+
+    def navigate(self, url, condition=WAIT_DOM_READY, selector=None, timeout=15):
+        """
+        Load url and return as soon as the wait condition is met, bounded by timeout.
+        Returns False if the navigation itself failed (DNS, refused connection, TLS: Chrome's
+        net::ERR_* errors); a condition that times out still returns True so callers can work
+        with whatever has loaded. Errors of the driver itself are raised.
+        """
+        self.rate_limiter.wait(url)
+        self.navigations += 1
+        try:
+            self.driver.get(url)
+        except TimeoutException:
+            # Page-load timeout: stop loading and use what is there
+            try:
+                self.driver.execute_script("window.stop();")
+            except:
+                pass
+        except WebDriverException as e:
+            # The message also names chrome, which would otherwise pass for a dead driver
+            if "net::err_" not in str(e).lower():
+                raise
+            print(f"Could not load {url}: {str(e).splitlines()[0]}")
+            return False
+        if not self.wait_until(condition, selector, timeout):
+            print(f"Wait for {selector or condition} timed out on {url}")
+        return True
+
     def human_type(self, element, text, max_retries=3):
         """Type text with human-like delays and retry logic for stale elements"""
         for attempt in range(max_retries):
@@ -181,61 +508,162 @@ class SeleniumHandler:
 
         return False
 
+    def _drain_performance_log(self):
+        try:
+            return self.driver.get_log("performance")
+        except Exception:
+            return []
+
+    def _document_response(self, entries):
+        """Find the main document's Network.responseReceived event in performance log entries"""
+        for entry in entries:
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError, TypeError):
+                continue
+            if message.get("method") != "Network.responseReceived":
+                continue
+            params = message.get("params", {})
+            # Navigations have requestId == loaderId; the main frame's comes first
+            if params.get("type") == "Document" and params.get("requestId") == params.get("loaderId"):
+                return params.get("response", {})
+        return None
+
+    def fetch_page(self, url, condition=WAIT_DOM_READY, timeout=15):
+        """
+        Load url once and capture what the server actually returned.
+        Returns a dict with status (None if it could not be read from the performance log),
+        url (final URL after redirects), content_type and body (the rendered page source).
+        The browser stays on the page, so callers can keep working with it.
+        """
+        self._drain_performance_log()
+        if not self.navigate(url, condition, timeout=timeout):
+            self.last_response = {'status': None, 'url': url, 'content_type': "", 'body': "",
+                                  'error': "navigation failed"}
+            return self.last_response
+
+        response = self._document_response(self._drain_performance_log()) or {}
+        headers = {key.lower(): value for key, value in response.get("headers", {}).items()}
+        self.last_response = {
+            'status': response.get("status"),
+            'url': self.driver.current_url,
+            'content_type': response.get("mimeType") or headers.get("content-type", ""),
+            'body': self.driver.page_source,
+        }
+        return self.last_response
+
     def url_exists_selenium(self, url, timeout=10):
-        """Check if URL exists using Selenium instead of requests"""
+        """
+        Check if URL exists using Selenium instead of requests.
+        Uses the real HTTP status of a single page load; the loaded page is kept in
+        self.last_response so callers do not need to load it again.
+        """
         if not url or not url.startswith(('http://', 'https://')):
             return False
             
-        current_url = self.driver.current_url
         try:
-            self.driver.get(url)
-            time.sleep(2)  # Give page time to load
-            
-            # Check if page loaded successfully
-            page_title = self.driver.title.lower()
-            page_source = self.driver.page_source.lower()
-            
-            # Common indicators of failed page loads
-            error_indicators = [
-                'not found', 'page not found', 'error 404',
-                'forbidden', 'access denied',
-                'server error', 'internal server error',
-                'this page doesn\'t exist', 'page doesn\'t exist',
-                'site can\'t be reached', 'connection timed out'
-            ]
-            
-            # Check if any error indicators are present
-            for indicator in error_indicators:
-                if indicator in page_title or indicator in page_source:
-                    return False
-            
-            # If we get here and have some content, consider it valid
-            return True
-            
+            response = self.fetch_page(url, WAIT_DOM_READY, timeout=timeout)
+            return page_exists(response, self.driver.title)
         except Exception as e:
             print(f"Error checking URL {url}: {e}")
             return False
-        finally:
-            # Try to go back to previous page if possible
-            try:
-                if current_url and current_url != url:
-                    self.driver.get(current_url)
-            except:
-                pass
 
     def get_page_content_selenium(self, url, timeout=10):
         """Get page content using Selenium instead of requests"""
         try:
-            self.driver.get(url)
-            time.sleep(2)
-            self.wait_for_page_load(timeout)
+            if not self.navigate(url, WAIT_LOAD_COMPLETE, timeout=timeout):
+                return None
             return self.driver.page_source
         except Exception as e:
             print(f"Error fetching content from {url}: {e}")
             return None
 
     def get_url(self, search_query, max_retries=3):
+        """Resolve a facility search query to its website, using the search cache first"""
+        if self.search_cache:
+            hit, url = self.search_cache.lookup(search_query)
+            if hit:
+                print(f"Using cached search result: {url}")
+                return url
+
+        url, source = self._search_url(search_query, max_retries)
+
+        # Blocked or errored searches return no source and are not cached
+        if self.search_cache and source:
+            self.search_cache.store(search_query, url, source)
+        return url
+
+    def _search_url(self, search_query, max_retries=3):
+        """Search Bing for the query. Returns (url, source) where source is one of the SEARCH_* values"""
+        if self.search_mode in (SEARCH_MODE_DIRECT, SEARCH_MODE_HTTP):
+            url, source = self._search_url_direct(search_query)
+            if source:
+                return url, source
+            print("Direct search gave no usable results page, falling back to typed search")
+        return self._search_url_typed(search_query, max_retries)
+
+    def _fetch_serp_http(self, serp_url):
+        """Fetch a Bing results page over HTTP. Returns its HTML, or None if blocked or unusable"""
+        self.rate_limiter.wait(serp_url)
+        try:
+            response = get_session().get(serp_url, timeout=15)
+        except Exception as e:
+            print(f"HTTP search failed: {e}")
+            return None
+
+        if response.status_code != 200 or is_bot_challenge(response.status_code, response.text):
+            print(f"HTTP search blocked ({response.status_code})")
+            return None
+        if "b_results" not in response.text:
+            return None
+        return response.text
+
+    def _search_url_direct(self, search_query):
+        """
+        Go straight to the results URL and read the Website button / top card / organic
+        results from the HTML. Returns (None, None) when the page could not be used.
+        """
+        serp_url = bing_search_url(search_query)
+        html = self._fetch_serp_http(serp_url) if self.search_mode == SEARCH_MODE_HTTP else None
+
+        if html is None:
+            try:
+                self.ensure_driver()
+                if not self.navigate(serp_url, selector="#b_results", timeout=15):
+                    return None, None
+            except Exception as e:
+                print(f"Error loading results page: {e}")
+                return None, None
+            if "captcha" in self.driver.current_url or "rv/sr" in self.driver.current_url:
+                self.rate_limiter.penalize("bing.com")
+                get_metrics().event(EVENT_CAPTCHA)
+                print("[BLOCKED] CAPTCHA triggered.")
+                return None, None
+            html = self.driver.page_source
+
+        results = ranked_results(parse_serp(html))
+        if not results:
+            return None, None
+        self.rate_limiter.reward("bing.com")
+
+        for url, kind in results[:4]:
+            if self._site_ok(url):
+                source = SEARCH_SOURCE_WEBSITE if kind == RESULT_WEBSITE else SEARCH_SOURCE_ORGANIC
+                return url, source
+        return None, SEARCH_NOT_FOUND
+
+    def _site_ok(self, url):
+        """Check a result URL over HTTP, using the browser only if the site blocks plain requests"""
+        status, _ = check_url(url)
+        if status is not None and status not in BLOCKED_STATUS_CODES:
+            return status < 400
+        return self.url_exists_selenium(url)
+
+    def _search_url_typed(self, search_query, max_retries=3):
+        """Load bing.com, type the query and click through to the result"""
         for attempt in range(max_retries):
+            if attempt:
+                get_metrics().event(EVENT_RETRY)
             try:
                 self.ensure_driver()
                 
@@ -245,18 +673,20 @@ class SeleniumHandler:
                     if attempt < max_retries - 1:
                         self.restart_driver()
                         continue
-                    return None
+                    return None, None
 
                 self.wait_for_page_load(timeout=10)
 
                 if self.is_captcha_present():
+                    self.rate_limiter.penalize("bing.com")
+                    get_metrics().event(EVENT_CAPTCHA)
                     print("CAPTCHA detected, taking screenshot...")
                     try:
                         os.makedirs("screenshots", exist_ok=True)
                         self.driver.save_screenshot("screenshots/captcha_detected.png")
                     except:
                         pass
-                    return None
+                    return None, None
 
                 self.scroll_randomly()
 
@@ -276,13 +706,13 @@ class SeleniumHandler:
                             print("Could not find search box after multiple attempts")
                             if attempt < max_retries - 1:
                                 self.restart_driver()
-                            return None
+                            return None, None
 
                 if not search_box:
                     if attempt < max_retries - 1:
                         self.restart_driver()
                         continue
-                    return None
+                    return None, None
 
                 # Clear any existing text and type the search query
                 success = self.human_type(search_box, search_query)
@@ -292,14 +722,24 @@ class SeleniumHandler:
                         self.restart_driver()
                         continue
                     else:
-                        return None
+                        return None, None
 
                 search_box.send_keys(Keys.RETURN)
-                time.sleep(random.uniform(2, 4))
+                # Results list, or the CAPTCHA/block redirect, whichever comes first
+                try:
+                    WebDriverWait(self.driver, 10, poll_frequency=0.2).until(
+                        lambda d: "captcha" in d.current_url or "rv/sr" in d.current_url
+                        or d.find_elements(By.CSS_SELECTOR, "#b_results")
+                    )
+                except TimeoutException:
+                    print("Search results did not appear within 10 seconds")
 
                 if "captcha" in self.driver.current_url or "rv/sr" in self.driver.current_url:
+                    self.rate_limiter.penalize("bing.com")
+                    get_metrics().event(EVENT_CAPTCHA)
                     print("[BLOCKED] CAPTCHA triggered.")
-                    return None
+                    return None, None
+                self.rate_limiter.reward("bing.com")
 
                 original_window = self.driver.current_window_handle
                 original_tabs = set(self.driver.window_handles)
@@ -328,7 +768,7 @@ class SeleniumHandler:
                     if "Page Not Found" not in self.driver.page_source:
                         self.driver.close()
                         self.driver.switch_to.window(original_window)
-                        return website_url
+                        return website_url, SEARCH_SOURCE_WEBSITE
                     else:
                         self.driver.close()
                         self.driver.switch_to.window(original_window)
@@ -352,11 +792,11 @@ class SeleniumHandler:
                     
                     # Use Selenium to check if URL exists instead of requests
                     if self.url_exists_selenium(link):
-                        return link
+                        return link, SEARCH_SOURCE_ORGANIC
                 except Exception:
                     pass
 
-                return None
+                return None, SEARCH_NOT_FOUND
 
             except Exception as e:
                 print(f"Attempt {attempt + 1} failed with error: {e}")
@@ -370,16 +810,55 @@ class SeleniumHandler:
                 else:
                     print("All retry attempts failed")
                     traceback.print_exc()
-                    return None
+                    return None, None
         
-        return None
+        return None, None
         
-    def get_source_mrf_manually(self, url, search_query):
+    def get_source_mrf_manually(self, url, search_query, row=None):
+        """
+        Find the price transparency page and MRF of a site without cms-hpt.txt.
+        row (the facility's input row) lets MRF verification compare the name, city and state
+        separately; without it the search query is used as the name.
+        """
+        cached = get_cache().get_manual_result(url)
+        if cached:
+            print(f"Using cached source/MRF for {url}")
+            return cached
+
+        source_url, mrf_url = self._find_source_mrf(url, search_query, row)
+        if mrf_url and mrf_url != "MRF Link Not Found":
+            get_cache().put_manual_result(url, source_url, mrf_url)
+        return source_url, mrf_url
+
+    def _find_source_mrf(self, url, search_query, row=None):
+        # Sitemaps first, then a plain HTTP crawl; Chrome only when both find nothing
+        source_url, candidates = discover_from_sitemaps(url) if self.sitemap_discovery else (None, [])
+        if not candidates and self.http_crawl:
+            source_url, candidates = crawl_price_page(url)
+        if not candidates:
+            source_url, candidates = self.get_source_mrf_candidates(url, search_query)
+        if source_url == "Price Transparency Not Found":
+            return source_url, None
+        if candidates:
+            # Keyword scores cannot tell sibling hospitals apart; the file header can
+            if self.verify_mrf and row is not None:
+                candidates = rank_by_verification(candidates, row['Facility Name'], row.get('City/Town'),
+                                                  row.get('State'))
+            elif self.verify_mrf:
+                candidates = rank_by_verification(candidates, search_query)
+            return source_url, candidates[0]['url']
+        print("MRF link not found - no matches above score 0")
+        return source_url, "MRF Link Not Found"
+
+    def get_source_mrf_candidates(self, url, search_query):
+        """
+        Open the homepage, follow its price transparency link and rank every link on that page
+        as a possible MRF file. Returns (source_url, candidates) with candidates sorted best first.
+        """
         try:
             self.ensure_driver()
-            self.driver.get(url)
-            time.sleep(5)
-            self.wait_for_page_load() 
+            if not self.navigate(url, WAIT_NETWORK_IDLE, timeout=15):
+                return "Price Transparency Not Found", []
             
             price_transparency_link = WebDriverWait(self.driver, 10).until(
                 EC.presence_of_element_located((
@@ -396,68 +875,63 @@ class SeleniumHandler:
             self.driver.execute_script("arguments[0].scrollIntoView(true);", price_transparency_link)
             self.driver.execute_script("arguments[0].click();", price_transparency_link)
             self.wait_for_page_load()
-            
-            search_words = normalize_to_keywords("standardcharges price transparency mrf standard charges chargemaster charge master .zip .xlsx .pdf .csv .json")
-            
-            try:
-                WebDriverWait(self.driver, 10).until(EC.presence_of_all_elements_located((By.TAG_NAME, "a")))
-                all_links = self.driver.find_elements(By.TAG_NAME, "a")
-
-                best_match = None
-                best_score = 0
-
-                for link in all_links:
-                    href = link.get_attribute("href")
-                    if href:
-                        href_words = tokenize_href(href)
-                        match_score = len(search_words.intersection(href_words))
-
-                        if match_score > best_score:
-                            best_score = match_score
-                            best_match = urljoin(self.driver.current_url, href)
-
-                print(f"Final best score: {best_score}")
-                
-                # This was the missing part - return the result!
-                if best_match and best_score > 0:
-                    return source_url, best_match
-                else:
-                    print("MRF link not found - no matches above score 0")
-                    return source_url, "MRF Link Not Found"
-                    
-            except Exception as e:
-                print('Error finding MRF links:', e)
-                return source_url, "MRF Link Not Found"
-                
         except Exception as e:
             print("Price Transparency Not Found:", e)
-            return "Price Transparency Not Found", None
-
-
-def normalize_to_keywords(text):
-    text = re.sub(r"[^\w\s]", " ", text.lower())  # replace punctuation with space
-    return set(text.split())
-
-
-def tokenize_href(href):
-    # Replace separators with space and normalize
-    tokens = re.sub(r"[\/_\-\.?=&]", " ", href)  # split on URL separators
-    return normalize_to_keywords(tokens)
-
-
-def extract_url_from_bing_redirect(url):
-    try:
-        parsed = urlparse(url)
-        params = parse_qs(parsed.query)
-        if 'u' in params:
-            encoded_url = params['u'][0]
-            if encoded_url.startswith('a1'):
-                encoded_url = encoded_url[2:]
-            decoded_bytes = base64.b64decode(encoded_url + '==')
-            return decoded_bytes.decode('utf-8')
-        return None
-    except Exception as e:
-        print(f"Error extracting URL: {e}")
-        return None
+            return "Price Transparency Not Found", []
 
+        try:
+            candidates = score_links(self.extract_links())
+            print(f"Final best score: {candidates[0]['score'] if candidates else 0}")
+            return source_url, candidates
+        except Exception as e:
+            print('Error finding MRF links:', e)
+            return source_url, []
+
+    def extract_links(self):
+        """Collect href, text, aria-label and visibility of every anchor in one round-trip"""
+        self.wait_until(selector="a[href]", timeout=10)
+        links = self.driver.execute_script(EXTRACT_LINKS_SCRIPT) or []
+        base_url = self.driver.current_url
+        return [
+            {'href': urljoin(base_url, href), 'text': text, 'aria_label': aria_label, 'visible': visible}
+            for href, text, aria_label, visible in links
+        ]
+
+
+EXTRACT_LINKS_SCRIPT = """
+return Array.from(document.querySelectorAll('a[href]'), function (a) {
+    var rect = a.getBoundingClientRect();
+    var style = window.getComputedStyle(a);
+    var visible = rect.width > 0 && rect.height > 0 &&
+        style.visibility !== 'hidden' && style.display !== 'none';
+    var text = (a.innerText || a.textContent || '').trim().slice(0, 200);
+    return [a.getAttribute('href'), text, a.getAttribute('aria-label') || '', visible];
+});
+"""
+
+# Used only when the status code could not be captured
+ERROR_INDICATORS = [
+    'not found', 'page not found', 'error 404',
+    'forbidden', 'access denied',
+    'server error', 'internal server error',
+    'this page doesn\'t exist', 'page doesn\'t exist',
+    'site can\'t be reached', 'connection timed out'
+]
+
+SOFT_404_TITLES = ['page not found', '404', 'not found']
+
+
+def page_exists(response, title=""):
+    """Decide whether a fetch_page response is a real page"""
+    if response.get('error'):
+        return False
+    title = (title or "").lower()
+    status = response.get('status')
+    if status is not None:
+        if status >= 400:
+            return False
+        # Soft 404s answer 200 but say so in the title
+        return not any(indicator in title for indicator in SOFT_404_TITLES)
 
+    page_source = (response.get('body') or "").lower()
+    return not any(indicator in title or indicator in page_source for indicator in ERROR_INDICATORS)
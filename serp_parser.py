@@ -0,0 +1,122 @@
+import base64
+from html.parser import HTMLParser
+from urllib.parse import parse_qs, urlencode, urlparse
+
+
+BING_SEARCH_URL = "https://www.bing.com/search"
+
+# Result kinds, in the order get_url prefers them
+RESULT_WEBSITE = "website"
+RESULT_TOP_CARD = "top_card"
+RESULT_ORGANIC = "organic"
+
+WEBSITE_LABELS = {"website", "website website"}
+
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+
+def bing_search_url(search_query):
+    return f"{BING_SEARCH_URL}?{urlencode({'q': search_query})}"
+
+
+def extract_url_from_bing_redirect(url):
+    try:
+        parsed = urlparse(url)
+        params = parse_qs(parsed.query)
+        if 'u' in params:
+            encoded_url = params['u'][0]
+            if encoded_url.startswith('a1'):
+                encoded_url = encoded_url[2:]
+            # Bing uses the URL-safe alphabet ("-" and "_") without padding
+            decoded_bytes = base64.urlsafe_b64decode(encoded_url + '=' * (-len(encoded_url) % 4))
+            return decoded_bytes.decode('utf-8')
+        return None
+    except Exception as e:
+        print(f"Error extracting URL: {e}")
+        return None
+
+
+class SerpParser(HTMLParser):
+    """
+    Collects result links from a Bing results page without a browser:
+    the "Website" button, the top card (div.b_tpcn a) and organic results (li.b_algo h2 a).
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []
+        self.results = {RESULT_WEBSITE: [], RESULT_TOP_CARD: [], RESULT_ORGANIC: []}
+        self._anchor = None
+
+    def _inside(self, tag, css_class=None):
+        for open_tag, classes in self.stack:
+            if open_tag == tag and (css_class is None or css_class in classes):
+                return True
+        return False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = set((attrs.get("class") or "").split())
+
+        if tag == "a" and attrs.get("href"):
+            href = attrs["href"]
+            aria_label = " ".join((attrs.get("aria-label") or "").lower().split())
+            if aria_label in WEBSITE_LABELS:
+                self.results[RESULT_WEBSITE].append(href)
+            elif self._inside("div", "b_tpcn"):
+                self.results[RESULT_TOP_CARD].append(href)
+            elif self._inside("li", "b_algo") and self._inside("h2"):
+                self.results[RESULT_ORGANIC].append(href)
+            # Anchor text is checked on close for buttons labelled only by their text
+            self._anchor = {'href': href, 'text': []}
+
+        if tag not in VOID_TAGS:
+            self.stack.append((tag, classes))
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_data(self, data):
+        if self._anchor is not None:
+            self._anchor['text'].append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "a" and self._anchor is not None:
+            text = " ".join("".join(self._anchor['text']).split()).lower()
+            href = self._anchor['href']
+            if text == "website" and href not in self.results[RESULT_WEBSITE]:
+                self.results[RESULT_WEBSITE].append(href)
+            self._anchor = None
+
+        # Pop back to the matching open tag, tolerating unclosed children
+        for position in range(len(self.stack) - 1, -1, -1):
+            if self.stack[position][0] == tag:
+                del self.stack[position:]
+                break
+
+
+def parse_serp(html):
+    """Returns {kind: [url, ...]} for the website button, top card and organic results"""
+    parser = SerpParser()
+    parser.feed(html or "")
+    parser.close()
+
+    results = {}
+    for kind, hrefs in parser.results.items():
+        urls = []
+        for href in hrefs:
+            if href.startswith("/"):
+                href = f"https://www.bing.com{href}"
+            if href.startswith("https://www.bing.com"):
+                href = extract_url_from_bing_redirect(href)
+            if href and href.startswith(("http://", "https://")) and href not in urls:
+                urls.append(href)
+        results[kind] = urls
+    return results
+
+
+def ranked_results(parsed):
+    """Flatten parse_serp output into (url, kind) pairs in preference order"""
+    return [(url, kind) for kind in (RESULT_WEBSITE, RESULT_TOP_CARD, RESULT_ORGANIC) for url in parsed.get(kind, [])]
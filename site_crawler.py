@@ -0,0 +1,152 @@
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from urllib.parse import urldefrag, urljoin, urlparse
+from http_utils import fetch_prefix
+from link_scoring import (EXTENSION_PATTERN, EXTENSION_WEIGHTS, MRF_KEYWORDS, SKIP_SCHEMES, normalize_to_keywords,
+                          score_links, tokenize_href)
+
+
+MAX_PAGES = 25
+MAX_DEPTH = 2
+CONCURRENCY = 4
+# Hospital homepages are large, but links never need more than this
+MAX_PAGE_BYTES = 2 * 1024 * 1024
+
+# How likely a link is to lead to the price transparency page. Navigation words keep
+# menus like "Patients & Visitors" or "Billing" ahead of news and careers pages.
+PRICE_PAGE_WEIGHTS = {
+    'price': 3.0, 'pricing': 3.0, 'transparency': 3.0, 'chargemaster': 3.0, 'standardcharges': 3.0,
+    'charges': 2.0, 'standard': 1.0, 'mrf': 2.0, 'cost': 1.5, 'costs': 1.5, 'estimate': 1.5,
+    'estimates': 1.5, 'billing': 1.5, 'financial': 1.0, 'payment': 1.0, 'insurance': 0.5,
+    'patients': 0.5, 'patient': 0.5, 'visitors': 0.5, 'resources': 0.25, 'about': 0.25,
+}
+
+# A machine-readable file with an MRF keyword ends the crawl early
+STRONG_CANDIDATE_SCORE = 4.0
+
+# Never fetched as pages; files that could be an MRF are scored as candidates instead
+SKIP_EXTENSIONS = set(EXTENSION_WEIGHTS) | {
+    'jpg', 'jpeg', 'png', 'gif', 'svg', 'webp', 'ico', 'css', 'js', 'mp3', 'mp4', 'mov',
+    'doc', 'docx', 'ppt', 'pptx', 'woff', 'woff2', 'xml', 'gz',
+}
+
+
+class LinkParser(HTMLParser):
+    """Collects the anchors of a page with their text and aria-label, in the shape extract_links returns"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []
+        self._anchor = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "a" and attrs.get("href"):
+            self._anchor = {'href': attrs["href"], 'text': [], 'aria_label': attrs.get("aria-label") or ""}
+
+    def handle_data(self, data):
+        if self._anchor is not None:
+            self._anchor['text'].append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "a" and self._anchor is not None:
+            self._anchor['text'] = " ".join("".join(self._anchor['text']).split())[:200]
+            # Without rendering there is no layout; treat every anchor as visible
+            self._anchor['visible'] = True
+            self.links.append(self._anchor)
+            self._anchor = None
+
+
+def site_of(url):
+    """Host without "www." so www.example.org and example.org count as one site"""
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def same_site(url, site):
+    host = site_of(url)
+    return host == site or host.endswith("." + site)
+
+
+def link_priority(link):
+    tokens = tokenize_href(urlparse(link['href']).path) | normalize_to_keywords(f"{link['text']} {link['aria_label']}")
+    return sum(PRICE_PAGE_WEIGHTS.get(token, 0) for token in tokens)
+
+
+def is_page_link(url):
+    extension = EXTENSION_PATTERN.search(urlparse(url).path.lower())
+    return not extension or extension.group(1) not in SKIP_EXTENSIONS
+
+
+def is_file_candidate(candidate):
+    """A linked file (not a page, which is crawled instead) named like an MRF"""
+    keywords = tokenize_href(candidate['url']) | normalize_to_keywords(candidate['text'])
+    return not is_page_link(candidate['url']) and bool(MRF_KEYWORDS & keywords)
+
+
+def fetch_links(url, timeout):
+    """Returns (final_url, links) for an HTML page, or (url, None) if it is not one"""
+    status_code, headers, body, final_url = fetch_prefix(url, MAX_PAGE_BYTES, timeout)
+    if status_code is None or status_code >= 400:
+        return url, None
+    if "html" not in headers.get('Content-Type', "text/html").lower():
+        return final_url, None
+    parser = LinkParser()
+    try:
+        parser.feed(body.decode("utf-8", errors="ignore"))
+        parser.close()
+    except Exception as e:
+        print(f"Could not parse {url}: {e}")
+    return final_url, parser.links
+
+
+def crawl_price_page(root_url, max_pages=MAX_PAGES, max_depth=MAX_DEPTH, concurrency=CONCURRENCY, timeout=10):
+    """
+    Best-first crawl of a hospital site over plain HTTP, looking for the page that links its MRF.
+    Pages are visited in order of how strongly the link to them points at price transparency,
+    up to max_depth clicks from the homepage and max_pages pages per site.
+    Returns (source_url, candidates) like SeleniumHandler.get_source_mrf_candidates,
+    or (None, []) when nothing was found.
+    """
+    site = site_of(root_url)
+    queue = [(0.0, 0, root_url, 0)]
+    seen = {urldefrag(root_url)[0]}
+    order = 1
+    visited = 0
+    best_source, best_candidates = None, []
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while queue and visited < max_pages:
+            batch = [heapq.heappop(queue) for _ in range(min(concurrency, len(queue), max_pages - visited))]
+            visited += len(batch)
+            pages = executor.map(lambda item: fetch_links(item[2], timeout), batch)
+
+            for (_, _, url, depth), (final_url, links) in zip(batch, pages):
+                # A redirect target is the page itself; never queue it again under its real URL
+                seen.add(urldefrag(final_url)[0])
+                if not links:
+                    continue
+                links = [dict(link, href=urldefrag(urljoin(final_url, link['href']))[0]) for link in links
+                         if not link['href'].lower().startswith(SKIP_SCHEMES)]
+
+                candidates = [candidate for candidate in score_links(links) if is_file_candidate(candidate)]
+                if candidates and (not best_candidates or candidates[0]['score'] > best_candidates[0]['score']):
+                    best_source, best_candidates = final_url, candidates
+
+                if depth >= max_depth:
+                    continue
+                for link in links:
+                    href = link['href']
+                    if href in seen or not same_site(href, site) or not is_page_link(href):
+                        continue
+                    seen.add(href)
+                    heapq.heappush(queue, (-link_priority(link), order, href, depth + 1))
+                    order += 1
+
+            if best_candidates and best_candidates[0]['score'] >= STRONG_CANDIDATE_SCORE:
+                break
+
+    print(f"Crawled {visited} pages of {site}: "
+          f"{'found ' + best_candidates[0]['url'] if best_candidates else 'no MRF candidates'}")
+    return best_source, best_candidates
@@ -0,0 +1,146 @@
+import gzip
+import heapq
+import xml.etree.ElementTree as ET
+from urllib.parse import urljoin, urlparse
+import requests
+from http_utils import fetch_prefix, get_session
+from link_scoring import score_links
+from rate_limiter import get_rate_limiter
+from site_crawler import fetch_links, is_file_candidate, link_priority, same_site, site_of
+
+
+DEFAULT_SITEMAPS = ["sitemap.xml", "sitemap_index.xml"]
+MAX_SITEMAPS = 10
+# Sitemaps can be hundreds of MB; stop reading one after this many (decompressed) bytes
+MAX_SITEMAP_BYTES = 50 * 1024 * 1024
+ROBOTS_BYTES = 512 * 1024
+# Only the best few page URLs are kept while streaming
+TOP_PAGES = 5
+
+
+class LimitedReader:
+    """File-like wrapper that reports end of file after max_bytes"""
+
+    def __init__(self, stream, max_bytes):
+        self.stream = stream
+        self.remaining = max_bytes
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b""
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.stream.read(size)
+        self.remaining -= len(data)
+        return data
+
+
+def sitemaps_from_robots(root_url, timeout=10):
+    """Sitemap: lines of robots.txt, or the usual sitemap locations when it names none"""
+    status_code, _, body, _ = fetch_prefix(urljoin(root_url, "robots.txt"), ROBOTS_BYTES, timeout)
+    sitemaps = []
+    if status_code is not None and status_code < 400:
+        for line in body.decode("utf-8", errors="ignore").splitlines():
+            key, _, value = line.partition(":")
+            if key.strip().lower() == "sitemap" and value.strip():
+                sitemaps.append(urljoin(root_url, value.strip()))
+    return sitemaps or [urljoin(root_url, name) for name in DEFAULT_SITEMAPS]
+
+
+def iter_sitemap(url, timeout=15):
+    """
+    Stream (kind, loc) pairs out of a sitemap, where kind is "sitemap" for entries of a
+    sitemap index and "url" for pages. Gzipped sitemaps are inflated on the fly and
+    parsed elements are discarded as soon as they are read, so memory does not grow with the file.
+    """
+    get_rate_limiter().wait(url)
+    try:
+        response = get_session().get(url, timeout=timeout, stream=True)
+    except requests.RequestException as e:
+        print(f"Sitemap fetch failed for {url}: {e}")
+        return
+    with response:
+        if response.status_code >= 400:
+            return
+        response.raw.decode_content = True
+        stream = response.raw
+        content_type = response.headers.get('Content-Type', "").lower()
+        if urlparse(url).path.lower().endswith(".gz") or "gzip" in content_type:
+            stream = gzip.GzipFile(fileobj=stream)
+        stream = LimitedReader(stream, MAX_SITEMAP_BYTES)
+
+        root = None
+        try:
+            for event, element in ET.iterparse(stream, events=("start", "end")):
+                if root is None:
+                    root = element
+                    continue
+                if event != "end":
+                    continue
+                tag = element.tag.rsplit("}", 1)[-1]
+                if tag in ("sitemap", "url"):
+                    loc = next((child.text for child in element if child.tag.rsplit("}", 1)[-1] == "loc"), None)
+                    if loc:
+                        yield ("sitemap" if tag == "sitemap" else "url"), loc.strip()
+                    root.clear()
+        except (ET.ParseError, OSError, EOFError) as e:
+            # Truncated at MAX_SITEMAP_BYTES, an HTML error page or a broken gzip stream
+            if root is None:
+                print(f"Not a sitemap: {url} ({e})")
+
+
+def discover_from_sitemaps(root_url, timeout=15):
+    """
+    Look for the MRF, or the price transparency page that links it, in the site's sitemaps.
+    Returns (source_url, candidates) like crawl_price_page, or (None, []) when the sitemaps
+    list neither.
+    """
+    site = site_of(root_url)
+    queue = sitemaps_from_robots(root_url, timeout)
+    seen = set(queue)
+    fetched = 0
+    files = []
+    pages = []  # min-heap of (priority, url), at most TOP_PAGES long
+
+    while queue and fetched < MAX_SITEMAPS:
+        sitemap_url = queue.pop(0)
+        fetched += 1
+        for kind, loc in iter_sitemap(sitemap_url, timeout):
+            if kind == "sitemap":
+                if loc not in seen and same_site(loc, site):
+                    seen.add(loc)
+                    queue.append(loc)
+                continue
+            if not same_site(loc, site):
+                continue
+            link = {'href': loc, 'text': "", 'aria_label': "", 'visible': False}
+            candidate = {'url': loc, 'text': ""}
+            if is_file_candidate(candidate):
+                files.append(link)
+                continue
+            priority = link_priority(link)
+            if priority > 0:
+                heapq.heappush(pages, (priority, loc))
+                if len(pages) > TOP_PAGES:
+                    heapq.heappop(pages)
+
+    # The sitemap lists the file itself
+    candidates = [candidate for candidate in score_links(files) if is_file_candidate(candidate)]
+    best_pages = [url for _, url in sorted(pages, reverse=True)]
+    if candidates:
+        source_url = best_pages[0] if best_pages else root_url
+        print(f"Sitemap lists MRF candidate {candidates[0]['url']}")
+        return source_url, candidates
+
+    # Otherwise read the links of the best pricing pages it lists
+    for page_url in best_pages:
+        final_url, links = fetch_links(page_url, timeout)
+        if not links:
+            continue
+        links = [dict(link, href=urljoin(final_url, link['href'])) for link in links]
+        candidates = [candidate for candidate in score_links(links) if is_file_candidate(candidate)]
+        if candidates:
+            print(f"Sitemap page {final_url} links MRF candidate {candidates[0]['url']}")
+            return final_url, candidates
+
+    print(f"No MRF candidates in the sitemaps of {site} ({fetched} sitemaps read)")
+    return None, []
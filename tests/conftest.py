@@ -0,0 +1,73 @@
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+# The modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import http_cache  # noqa: E402
+import rate_limiter  # noqa: E402
+
+
+@pytest.fixture
+def offline(monkeypatch, tmp_path):
+    """A throwaway HTTP cache and no politeness delays for the local fixture servers"""
+    cache = http_cache.ContentCache(str(tmp_path / "http_cache.sqlite3"))
+    monkeypatch.setattr(http_cache, "_cache", cache)
+    monkeypatch.setattr(rate_limiter, "_limiter", rate_limiter.RateLimiter(
+        policies={}, default_policy={"rate": 1000.0, "capacity": 1000, "jitter": 0}))
+    yield
+    cache.close()
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up on slow responses are part of the tests
+        pass
+
+
+@pytest.fixture
+def fixture_server():
+    """
+    Start a local HTTP server for a {path: handler} routing table, where handler(request) writes
+    the whole response. Returns the server's base URL.
+    """
+    servers = []
+
+    def start(routes):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                route = routes.get(self.path.split("?")[0])
+                if route is None:
+                    self.send_error(404)
+                else:
+                    route(self)
+
+            def log_message(self, *args):
+                pass
+
+        server = QuietServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def respond(status, body, content_type="text/plain"):
+    """Route handler sending one complete response"""
+    def handler(request):
+        data = body.encode("utf-8")
+        request.send_response(status)
+        request.send_header("Content-Type", content_type)
+        request.send_header("Content-Length", str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
+    return handler
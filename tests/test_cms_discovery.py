@@ -0,0 +1,110 @@
+import asyncio
+import socket
+import threading
+import time
+from conftest import respond
+from cms_discovery import CMS_PROBE_ERROR, probe_domains
+from get_source_and_mrf_cms_txt import fetch_cms_lines
+from http_cache import get_cache
+from http_utils import CMS_BLOCKED, CMS_FOUND, CMS_MISSING
+
+CMS_TXT = """location-name: Memorial Hospital
+source-page-url: https://example.org/price-transparency
+mrf-url: https://example.org/123456789_memorial-hospital_standardcharges.json
+"""
+
+
+def probe(root_urls, timeout=2):
+    results = asyncio.run(probe_domains(root_urls, concurrency=8, per_host=8, timeout=timeout))
+    return {result['root_url']: result for result in results}
+
+
+def sleep_then(seconds, handler):
+    def slow(request):
+        time.sleep(seconds)
+        handler(request)
+    return slow
+
+
+def test_probe_states(offline, fixture_server):
+    base = fixture_server({
+        "/found/cms-hpt.txt": respond(200, CMS_TXT),
+        "/soft404/cms-hpt.txt": respond(200, "<html><body>Page not found</body></html>", "text/html"),
+        "/blocked/cms-hpt.txt": respond(403, "Forbidden"),
+        "/challenge/cms-hpt.txt": respond(200, "<html><title>Just a moment...</title></html>", "text/html"),
+        "/slow-ok/cms-hpt.txt": sleep_then(0.3, respond(200, CMS_TXT)),
+    })
+    results = probe([f"{base}/found/", f"{base}/missing/", f"{base}/soft404/", f"{base}/blocked/",
+                     f"{base}/challenge/", f"{base}/slow-ok/"])
+
+    assert (results[f"{base}/found/"]['state'], results[f"{base}/found/"]['status_code']) == (CMS_FOUND, 200)
+    assert results[f"{base}/found/"]['cms_url'] == f"{base}/found/cms-hpt.txt"
+    assert (results[f"{base}/missing/"]['state'], results[f"{base}/missing/"]['status_code']) == (CMS_MISSING, 404)
+    assert results[f"{base}/soft404/"]['state'] == CMS_MISSING
+    assert (results[f"{base}/blocked/"]['state'], results[f"{base}/blocked/"]['status_code']) == (CMS_BLOCKED, 403)
+    assert results[f"{base}/challenge/"]['state'] == CMS_BLOCKED
+    assert results[f"{base}/slow-ok/"]['state'] == CMS_FOUND
+
+
+def test_slow_response_and_refused_connection_are_errors(offline, fixture_server):
+    base = fixture_server({"/slow/cms-hpt.txt": sleep_then(3, respond(200, CMS_TXT))})
+    with socket.socket() as closed:
+        closed.bind(("127.0.0.1", 0))
+        refused = f"http://127.0.0.1:{closed.getsockname()[1]}/"
+
+    results = probe([f"{base}/slow/", refused], timeout=0.5)
+    # A transport failure is retryable, not proof of a block
+    assert (results[f"{base}/slow/"]['state'], results[f"{base}/slow/"]['status_code']) == (CMS_PROBE_ERROR, None)
+    assert (results[refused]['state'], results[refused]['status_code']) == (CMS_PROBE_ERROR, None)
+
+
+def test_trickling_response_hits_the_probe_deadline(offline, fixture_server):
+    """Every read succeeds, so only the total deadline stops the request; its thread must not linger"""
+    hung_up = threading.Event()
+
+    def trickle(request):
+        request.send_response(200)
+        request.send_header("Content-Type", "text/plain")
+        request.end_headers()
+        try:
+            for _ in range(200):
+                request.wfile.write(b"#")
+                request.wfile.flush()
+                time.sleep(0.1)
+        except OSError:
+            hung_up.set()
+
+    base = fixture_server({"/trickle/cms-hpt.txt": trickle})
+    started = time.monotonic()
+    results = probe([f"{base}/trickle/"], timeout=0.5)
+    elapsed = time.monotonic() - started
+
+    assert results[f"{base}/trickle/"]['state'] == CMS_PROBE_ERROR
+    assert elapsed < 8
+    # The blocking request gave up too instead of reading the rest in the background
+    assert hung_up.wait(3)
+
+
+class BrowserStub:
+    """fetch_page/driver stand-in returning one rendered page"""
+
+    def __init__(self, body):
+        self.body = self.text = body
+        self.driver = self
+        self.title = ""
+
+    def fetch_page(self, url, wait_until=None):
+        return {'status': 200, 'body': self.body, 'content_type': "text/plain"}
+
+    def find_element(self, by, value):
+        return self
+
+
+def test_browser_fallback_only_caches_real_cms_files(offline):
+    url = "https://example.org/cms-hpt.txt"
+    challenge = BrowserStub("Checking your browser before accessing example.org")
+    assert fetch_cms_lines(challenge, url, CMS_BLOCKED) == [challenge.body]
+    assert get_cache().get(url) is None
+
+    assert fetch_cms_lines(BrowserStub(CMS_TXT), url, CMS_BLOCKED) == CMS_TXT.splitlines()
+    assert get_cache().get(url)['body'] == CMS_TXT
@@ -0,0 +1,58 @@
+import os
+import pandas as pd
+from openpyxl import Workbook
+import input_loader
+from input_loader import load_facilities
+
+ROWS = [
+    ["Facility ID", "Facility Name", "City/Town", "State", "Phone"],
+    ["060001", "Memorial Hospital", "Colorado Springs", "CO", "719"],
+    ["060002", "Parkview Medical Center", "Pueblo", "co ", "719"],
+    ["070001", "Yale New Haven Hospital", "New Haven", "CT", "203"],
+]
+
+
+def write_workbook(path, sheet="Updated Master List"):
+    workbook = Workbook()
+    workbook.active.title = sheet
+    for row in ROWS:
+        workbook.active.append(row)
+    workbook.save(path)
+
+
+def test_workbook_is_filtered_by_state_and_columns(tmp_path, monkeypatch):
+    monkeypatch.setattr(input_loader, "INPUT_CACHE_DIR", str(tmp_path / "cache"))
+    path = str(tmp_path / "master.xlsx")
+    write_workbook(path)
+
+    df = load_facilities(path, "Updated Master List", "CO")
+    assert list(df.columns) == input_loader.INPUT_COLUMNS
+    assert df['Facility Name'].tolist() == ["Memorial Hospital", "Parkview Medical Center"]
+
+
+def test_workbook_without_sheet_name_uses_the_active_sheet(tmp_path, monkeypatch):
+    monkeypatch.setattr(input_loader, "INPUT_CACHE_DIR", str(tmp_path / "cache"))
+    path = str(tmp_path / "master.xlsx")
+    write_workbook(path, sheet="Sheet With Another Name")
+
+    assert len(load_facilities(path, None, None)) == 3
+
+
+def test_cached_rows_are_reused_until_the_workbook_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(input_loader, "INPUT_CACHE_DIR", str(tmp_path / "cache"))
+    path = str(tmp_path / "master.xlsx")
+    write_workbook(path)
+    first = load_facilities(path, "Updated Master List", "CO")
+    assert os.listdir(tmp_path / "cache")
+
+    monkeypatch.setattr(input_loader, "read_workbook", lambda *args: (_ for _ in ()).throw(AssertionError("re-read")))
+    pd.testing.assert_frame_equal(load_facilities(path, "Updated Master List", "CO"), first)
+
+
+def test_csv_is_read_whole(tmp_path):
+    path = str(tmp_path / "test.csv")
+    pd.DataFrame(ROWS[1:], columns=ROWS[0]).to_csv(path, index=False)
+
+    df = load_facilities(path, None, "CO")
+    assert len(df) == 3
+    assert "Phone" in df.columns
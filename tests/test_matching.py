@@ -0,0 +1,76 @@
+import tracemalloc
+from cms_parser import LocationRecord
+from get_source_and_mrf_cms_txt import match_cms_records, match_cms_records_many
+from matching import LocationMatcher
+
+
+def records(*names):
+    return [LocationRecord(location_name=name, source_page_url=f"https://example.org/{n}",
+                           mrf_url=f"https://example.org/{n}.json") for n, name in enumerate(names)]
+
+
+def test_single_shared_generic_word_does_not_match():
+    matcher = LocationMatcher(records("Memorial Hospital", "Parkview Medical Center"))
+    assert matcher.match(["Saint Joseph Hospital Denver"]) == [None]
+
+
+def test_unseen_words_count_against_the_match():
+    matcher = LocationMatcher(records("Memorial Hospital", "Parkview Medical Center"))
+    [(exact, _)] = matcher.match(["Memorial Hospital"])
+    [(extended, _)] = matcher.match(["Memorial Hospital Saint Joseph"])
+    assert extended < exact
+
+
+def test_distinctive_words_decide_between_siblings():
+    matcher = LocationMatcher(records("Saint Mary Medical Center", "Saint Mary Regional Hospital",
+                                      "Saint Joseph Hospital"))
+    [(score, record)] = matcher.match(["St Mary Regional Hospital"])
+    assert record.location_name == "Saint Mary Regional Hospital"
+    assert score >= 0.35
+
+
+def test_exact_name_matches_with_full_score():
+    matcher = LocationMatcher(records("Memorial Hospital", "Parkview Medical Center"))
+    [(score, record)] = matcher.match(["Parkview Medical Center"])
+    assert record.location_name == "Parkview Medical Center"
+    assert abs(score - 1.0) < 1e-6
+
+
+def test_city_breaks_ties():
+    matcher = LocationMatcher(records("Community Hospital Denver", "Community Hospital Aurora"))
+    [(_, record)] = matcher.match(["Community Hospital"], cities=["Aurora"])
+    assert record.location_name == "Community Hospital Aurora"
+
+
+def test_one_word_names_need_one_shared_word():
+    matcher = LocationMatcher(records("Parkview", "Memorial Hospital"))
+    [(_, record)] = matcher.match(["Parkview"])
+    assert record.location_name == "Parkview"
+
+
+def test_empty_file_and_missing_names():
+    assert LocationMatcher([]).match(["Memorial Hospital"]) == [None]
+    assert LocationMatcher(records("Memorial Hospital")).match([float("nan")]) == [None]
+
+
+def test_standalone_script_uses_the_same_engine():
+    lines = ["location-name: Memorial Hospital", "source-page-url: https://example.org/p",
+             "mrf-url: https://example.org/m.json", "",
+             "location-name: Parkview Medical Center", "source-page-url: https://example.org/q",
+             "mrf-url: https://example.org/n.json"]
+    assert match_cms_records(lines, "Saint Joseph Hospital Denver") == []
+    assert match_cms_records(lines, "Parkview Medical Center Pueblo") == [("https://example.org/q",
+                                                                          "https://example.org/n.json")]
+    matcher = LocationMatcher(records("Memorial Hospital", "Parkview Medical Center"))
+    assert match_cms_records_many(matcher, ["Saint Joseph Hospital Denver", "Memorial Hospital"]) == [
+        [], [("https://example.org/0", "https://example.org/0.json")]]
+
+
+def test_large_file_stays_small():
+    names = [f"Location {n} w{n}a w{n}b Hospital" for n in range(5000)]
+    tracemalloc.start()
+    matcher = LocationMatcher(records(*names))
+    matcher.match(["Location 4321 w4321a w4321b Hospital"])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert peak < 50 * 1024 * 1024
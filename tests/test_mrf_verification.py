@@ -0,0 +1,65 @@
+import asyncio
+import time
+import pandas as pd
+import mrf_verification
+import selenium_utils
+from main import add_mrf_verification
+from mrf_verification import VERIFY_MATCH, VERIFY_UNKNOWN, verify, verify_mrf_file
+from selenium_utils import SeleniumHandler
+
+CANDIDATES = [{'url': "https://example.org/a_standardcharges.json", 'score': 5.0, 'text': ""},
+              {'url': "https://example.org/b_standardcharges.json", 'score': 4.0, 'text': ""}]
+
+
+def test_manual_search_verifies_with_the_row_fields(monkeypatch):
+    calls = []
+    monkeypatch.setattr(selenium_utils, "discover_from_sitemaps", lambda url: ("https://example.org/pt", CANDIDATES))
+    monkeypatch.setattr(selenium_utils, "rank_by_verification",
+                        lambda candidates, *args: calls.append(args) or candidates)
+    handler = SeleniumHandler.__new__(SeleniumHandler)
+    handler.sitemap_discovery = True
+    handler.http_crawl = True
+    handler.verify_mrf = True
+
+    row = {'Facility Name': "Memorial Hospital Central", 'City/Town': "Colorado Springs", 'State': "CO"}
+    source, mrf = handler._find_source_mrf("https://example.org", "Memorial Hospital Central Colorado Springs", row)
+    assert (source, mrf) == ("https://example.org/pt", CANDIDATES[0]['url'])
+    assert calls == [("Memorial Hospital Central", "Colorado Springs", "CO")]
+
+
+def test_trickling_mrf_stops_at_the_read_deadline(offline, fixture_server):
+    """Every read succeeds, so only the read deadline ends the download; the header read so far still counts"""
+    def trickle(request):
+        request.send_response(200)
+        request.send_header("Content-Type", "application/json")
+        request.end_headers()
+        request.wfile.write(b'{"hospital_name": "Memorial Hospital Central", "last_updated_on": "2024-07-01", ')
+        try:
+            for _ in range(200):
+                request.wfile.write(b" ")
+                request.wfile.flush()
+                time.sleep(0.1)
+        except OSError:
+            pass
+
+    base = fixture_server({"/standardcharges.json": trickle})
+    started = time.monotonic()
+    result = verify_mrf_file(f"{base}/standardcharges.json", "Memorial Hospital Central", timeout=0.5)
+    assert time.monotonic() - started < 5
+    assert (result['hospital_name'], result['verdict']) == ("Memorial Hospital Central", VERIFY_MATCH)
+
+
+def test_timed_out_checks_keep_every_column(monkeypatch):
+    real_wait_for = asyncio.wait_for
+    monkeypatch.setattr(mrf_verification, "verify_mrf_file", lambda *args: time.sleep(0.5))
+    monkeypatch.setattr(asyncio, "wait_for", lambda awaitable, timeout: real_wait_for(awaitable, 0.05))
+
+    df = pd.DataFrame({'Facility Name': ["Memorial Hospital", "Parkview Medical Center"],
+                       'City/Town': ["Colorado Springs", "Pueblo"], 'State': ["CO", "CO"],
+                       'File URL': ["https://example.org/a.json", "https://example.org/b.json"]})
+    results = verify(df)
+    assert list(results['verdict']) == [VERIFY_UNKNOWN, VERIFY_UNKNOWN]
+    assert results['hospital_name'].isna().all()
+
+    add_mrf_verification(df)
+    assert list(df['MRF Verified']) == [VERIFY_UNKNOWN, VERIFY_UNKNOWN]
@@ -0,0 +1,36 @@
+import pytest
+from selenium.common.exceptions import InvalidSessionIdException, WebDriverException
+from rate_limiter import RateLimiter
+from selenium_utils import SeleniumHandler, page_exists
+
+
+class FailingDriver:
+    def __init__(self, error):
+        self.error = error
+
+    def get(self, url):
+        raise self.error
+
+
+def handler_with(driver):
+    handler = SeleniumHandler.__new__(SeleniumHandler)
+    handler.driver = driver
+    handler.navigations = 0
+    handler.rate_limiter = RateLimiter(policies={}, default_policy={"rate": 1000.0, "capacity": 1000})
+    handler._drain_performance_log = lambda: []
+    return handler
+
+
+def test_unreachable_site_returns_false():
+    error = WebDriverException("unknown error: net::ERR_NAME_NOT_RESOLVED\n  (Session info: chrome=139.0)")
+    handler = handler_with(FailingDriver(error))
+    assert handler.navigate("https://no-such-hospital.invalid/") is False
+
+    response = handler.fetch_page("https://no-such-hospital.invalid/")
+    assert response['status'] is None and not page_exists(response)
+
+
+def test_driver_errors_are_raised():
+    handler = handler_with(FailingDriver(InvalidSessionIdException("invalid session id")))
+    with pytest.raises(InvalidSessionIdException):
+        handler.navigate("https://www.uchealth.org/")
@@ -0,0 +1,45 @@
+import multiprocessing
+import time
+from rate_limiter import RateLimiter
+
+POLICIES = {"bing.com": {"rate": 10.0, "capacity": 1, "jitter": 0, "shared": True}}
+
+
+def search(path, count, start, delays):
+    limiter = RateLimiter(policies=POLICIES, shared_path=path)
+    while time.time() < start:
+        time.sleep(0.001)
+    delays.put(sum(limiter.wait("https://www.bing.com/search?q=x") for _ in range(count)))
+
+
+def test_shared_bucket_paces_all_processes_together(tmp_path):
+    path = str(tmp_path / "rate_limits.sqlite3")
+    ctx = multiprocessing.get_context("spawn")
+    delays = ctx.Queue()
+    start = time.time() + 2
+    processes = [ctx.Process(target=search, args=(path, 5, start, delays)) for _ in range(4)]
+    for process in processes:
+        process.start()
+    totals = [delays.get(timeout=60) for _ in processes]
+    for process in processes:
+        process.join()
+    finished = time.time()
+
+    # 20 searches at 10/s from one bucket take about 1.9 s, not the 0.4 s of four separate buckets
+    assert finished - start >= 1.7
+    assert sum(totals) > 4
+
+
+def test_penalty_is_seen_by_other_limiters(tmp_path):
+    path = str(tmp_path / "rate_limits.sqlite3")
+    first = RateLimiter(policies=POLICIES, shared_path=path)
+    second = RateLimiter(policies=POLICIES, shared_path=path)
+    first.wait("www.bing.com")
+    first.penalize("www.bing.com", cooldown=1)
+    assert second.wait("www.bing.com") >= 0.9
+
+
+def test_hospital_sites_keep_per_process_buckets(tmp_path):
+    limiter = RateLimiter(policies=POLICIES, shared_path=str(tmp_path / "rate_limits.sqlite3"))
+    assert limiter.wait("https://www.uchealth.org/") == 0
+    assert not (tmp_path / "rate_limits.sqlite3").exists()
@@ -0,0 +1,70 @@
+import base64
+import os
+import pytest
+from serp_parser import (RESULT_ORGANIC, RESULT_TOP_CARD, RESULT_WEBSITE, extract_url_from_bing_redirect,
+                         parse_serp, ranked_results)
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "serp")
+
+
+def load(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as fh:
+        return fh.read()
+
+
+def test_website_button_by_aria_label():
+    parsed = parse_serp(load("website_aria.html"))
+    assert parsed[RESULT_WEBSITE] == ["https://www.uchealth.org/locations/uchealth-memorial-hospital-central/"]
+    # The "Directions" button and the pagination link are not results
+    assert all("maps" not in url and "first=11" not in url for urls in parsed.values() for url in urls)
+
+
+def test_top_card_and_organic_results():
+    parsed = parse_serp(load("website_aria.html"))
+    assert parsed[RESULT_TOP_CARD] == ["https://www.uchealth.org/"]
+    assert parsed[RESULT_ORGANIC] == [
+        "https://www.uchealth.org/locations/uchealth-memorial-hospital-central/",
+        "https://www.usnews.com/best-hospitals/area/co/uchealth-memorial-hospital-6840305",
+    ]
+
+
+def test_website_button_by_anchor_text_with_relative_redirects():
+    parsed = parse_serp(load("website_text.html"))
+    assert parsed[RESULT_WEBSITE] == ["https://www.centura.org/location/st-mary-corwin?x=1>"]
+    assert parsed[RESULT_TOP_CARD] == []
+    assert parsed[RESULT_ORGANIC][0] == "https://www.centura.org/location/st-mary-corwin?x=1>"
+
+
+def test_organic_only_page_skips_ads_and_duplicates():
+    parsed = parse_serp(load("organic_only.html"))
+    assert parsed[RESULT_WEBSITE] == []
+    assert parsed[RESULT_ORGANIC] == [
+        "https://www.parkviewmc.com/?a=~~~",
+        "https://www.healthgrades.com/hospital-directory/colorado-co-pueblo/parkview-medical-center-hgst96b8e13a060062",
+    ]
+
+
+def test_ranked_results_prefer_website_then_top_card_then_organic():
+    ranked = ranked_results(parse_serp(load("website_aria.html")))
+    assert [kind for _, kind in ranked] == [RESULT_WEBSITE, RESULT_TOP_CARD, RESULT_ORGANIC, RESULT_ORGANIC]
+    assert ranked[0] == ("https://www.uchealth.org/locations/uchealth-memorial-hospital-central/", RESULT_WEBSITE)
+
+
+@pytest.mark.parametrize("url", [
+    "https://www.uchealth.org/locations/uchealth-memorial-hospital-central/",
+    "https://www.centura.org/location/st-mary-corwin?x=1>",  # "_" in the encoding
+    "https://www.parkviewmc.com/?a=~~~",  # "-" in the encoding
+])
+def test_bing_redirect_decoding(url):
+    encoded = base64.urlsafe_b64encode(url.encode()).decode().rstrip("=")
+    redirect = f"https://www.bing.com/ck/a?!&&p=abc&ptn=3&ver=2&hsh=4&u=a1{encoded}&ntb=1"
+    assert extract_url_from_bing_redirect(redirect) == url
+
+
+def test_redirect_without_target():
+    assert extract_url_from_bing_redirect("https://www.bing.com/ck/a?!&&p=abc") is None
+
+
+def test_empty_page():
+    assert ranked_results(parse_serp("")) == []
+    assert ranked_results(parse_serp(None)) == []
@@ -0,0 +1,109 @@
+from conftest import respond
+import site_crawler
+from link_scoring import score_links
+from site_crawler import crawl_price_page, fetch_links
+
+MRF_LINK = '<a href="/files/123456789_memorial-hospital_standardcharges.json">Standard charges (JSON)</a>'
+
+
+def page(*anchors):
+    return respond(200, "<html><body>" + " ".join(anchors) + "</body></html>", "text/html")
+
+
+def counted(hits, path, handler):
+    def handler_counting(request):
+        hits[path] = hits.get(path, 0) + 1
+        handler(request)
+    return handler_counting
+
+
+def site(routes):
+    """Routes that count how often each page is requested"""
+    hits = {}
+    return hits, {path: counted(hits, path, handler) for path, handler in routes.items()}
+
+
+def redirect(location):
+    def handler(request):
+        request.send_response(301)
+        request.send_header("Location", location)
+        request.send_header("Content-Length", "0")
+        request.end_headers()
+    return handler
+
+
+def test_crawl_stops_at_max_depth(offline, fixture_server):
+    hits, routes = site({
+        "/": page('<a href="/billing">Billing</a>'),
+        "/billing": page('<a href="/billing/pricing">Pricing</a>'),
+        "/billing/pricing": page('<a href="/billing/pricing/transparency">Price transparency</a>'),
+        "/billing/pricing/transparency": page(MRF_LINK),
+    })
+    base = fixture_server(routes)
+
+    assert crawl_price_page(base + "/", max_depth=2) == (None, [])
+    assert "/billing/pricing/transparency" not in hits
+
+    source, candidates = crawl_price_page(base + "/", max_depth=3)
+    assert source == base + "/billing/pricing/transparency"
+    assert candidates[0]['url'] == base + "/files/123456789_memorial-hospital_standardcharges.json"
+
+
+def test_crawl_keeps_to_the_page_budget(offline, fixture_server):
+    hits, routes = site({"/": page(*(f'<a href="/news/{n}">News {n}</a>' for n in range(30)))})
+    routes.update({f"/news/{n}": counted(hits, f"/news/{n}", page()) for n in range(30)})
+    base = fixture_server(routes)
+
+    assert crawl_price_page(base + "/", max_pages=5, concurrency=2) == (None, [])
+    assert sum(hits.values()) == 5
+
+
+def test_pricing_links_are_visited_first(offline, fixture_server):
+    links = [f'<a href="/news/{n}">News {n}</a>' for n in range(10)] + ['<a href="/price-transparency">Prices</a>']
+    hits, routes = site({"/": page(*links), "/price-transparency": page(MRF_LINK)})
+    routes.update({f"/news/{n}": counted(hits, f"/news/{n}", page()) for n in range(10)})
+    base = fixture_server(routes)
+
+    source, _ = crawl_price_page(base + "/", concurrency=1)
+    assert source == base + "/price-transparency"
+    # The strong candidate ended the crawl before any news page
+    assert set(hits) == {"/", "/price-transparency"}
+
+
+def test_redirect_target_is_not_crawled_again(offline, fixture_server):
+    hits, routes = site({
+        "/": page('<a href="/old-prices">Pricing</a>'),
+        "/old-prices": redirect("/prices"),
+        # Menus link the page to itself
+        "/prices": page('<a href="/prices">Pricing</a>', '<a href="/prices/faq">Pricing FAQ</a>'),
+        "/prices/faq": page(),
+    })
+    base = fixture_server(routes)
+
+    crawl_price_page(base + "/", concurrency=1)
+    assert hits["/prices"] == 1
+    assert hits["/prices/faq"] == 1
+
+
+def test_page_body_is_read_up_to_the_limit(offline, fixture_server, monkeypatch):
+    monkeypatch.setattr(site_crawler, "MAX_PAGE_BYTES", 1024)
+    # The server ignores the Range header and sends everything
+    base = fixture_server({"/": page('<a href="/first">First</a>', " " * 4096, '<a href="/late">Late</a>')})
+
+    _, links = fetch_links(base + "/", timeout=5)
+    assert [link['href'] for link in links] == ["/first"]
+
+
+def test_link_scoring_prefers_machine_readable_mrf_files():
+    def link(href, text="", visible=True):
+        return {'href': href, 'text': text, 'aria_label': "", 'visible': visible}
+
+    candidates = score_links([
+        link("https://example.org/docs/price-list.pdf", "Price transparency (PDF)"),
+        link("https://example.org/files/123_memorial_standardcharges.json", "Download"),
+        link("https://example.org/files/123_memorial_standardcharges.json", "Standard charges", visible=False),
+        link("https://example.org/about", "About us"),
+        link("javascript:void(0)", "Standard charges"),
+    ])
+    assert [candidate['url'] for candidate in candidates] == [
+        "https://example.org/files/123_memorial_standardcharges.json", "https://example.org/docs/price-list.pdf"]
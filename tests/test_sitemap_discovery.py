@@ -0,0 +1,74 @@
+import gzip
+from conftest import respond
+import sitemap_discovery
+from sitemap_discovery import discover_from_sitemaps, iter_sitemap
+
+NS = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+
+
+def urlset(*locs):
+    return f'<?xml version="1.0" encoding="UTF-8"?><urlset {NS}>' + "".join(
+        f"<url><loc>{loc}</loc><lastmod>2024-07-01</lastmod></url>" for loc in locs) + "</urlset>"
+
+
+def sitemap_index(*locs):
+    return f'<?xml version="1.0" encoding="UTF-8"?><sitemapindex {NS}>' + "".join(
+        f"<sitemap><loc>{loc}</loc></sitemap>" for loc in locs) + "</sitemapindex>"
+
+
+def gzipped(text):
+    data = gzip.compress(text.encode("utf-8"))
+
+    def handler(request):
+        request.send_response(200)
+        request.send_header("Content-Type", "application/x-gzip")
+        request.send_header("Content-Length", str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
+    return handler
+
+
+def test_gzipped_sitemap_index_leads_to_the_file(offline, fixture_server):
+    routes = {}
+    base = fixture_server(routes)
+    mrf = f"{base}/files/123456789_memorial-hospital_standardcharges.json"
+    routes.update({
+        "/robots.txt": respond(200, f"User-agent: *\nSitemap: {base}/sitemap_index.xml.gz\n"),
+        "/sitemap_index.xml.gz": gzipped(sitemap_index(f"{base}/sitemap-pages.xml.gz",
+                                                       "https://elsewhere.example/sitemap.xml")),
+        "/sitemap-pages.xml.gz": gzipped(urlset(f"{base}/about", f"{base}/price-transparency", mrf)),
+    })
+
+    source, candidates = discover_from_sitemaps(base + "/")
+    assert source == f"{base}/price-transparency"
+    assert [candidate['url'] for candidate in candidates] == [mrf]
+
+
+def test_pricing_page_listed_in_the_sitemap_is_read(offline, fixture_server):
+    routes = {}
+    base = fixture_server(routes)
+    routes.update({
+        # No robots.txt: the usual sitemap location is tried
+        "/sitemap.xml": respond(200, urlset(f"{base}/news", f"{base}/patients/price-transparency"), "application/xml"),
+        "/patients/price-transparency": respond(
+            200, '<a href="/files/memorial_standardcharges.csv">Standard charges</a>', "text/html"),
+    })
+
+    source, candidates = discover_from_sitemaps(base + "/")
+    assert source == f"{base}/patients/price-transparency"
+    assert candidates[0]['url'] == f"{base}/files/memorial_standardcharges.csv"
+
+
+def test_sitemap_is_read_up_to_the_limit(offline, fixture_server, monkeypatch):
+    monkeypatch.setattr(sitemap_discovery, "MAX_SITEMAP_BYTES", 4096)
+    locs = [f"https://example.org/page-{n}" for n in range(500)]
+    base = fixture_server({"/sitemap.xml": respond(200, urlset(*locs), "application/xml")})
+
+    read = [loc for _, loc in iter_sitemap(f"{base}/sitemap.xml")]
+    assert 0 < len(read) < 100
+    assert read == locs[:len(read)]
+
+
+def test_html_error_page_is_not_a_sitemap(offline, fixture_server):
+    base = fixture_server({"/sitemap.xml": respond(200, "<html><body><p>Not found</body></html>", "text/html")})
+    assert list(iter_sitemap(f"{base}/sitemap.xml")) == []
@@ -0,0 +1,71 @@
+import threading
+import time
+from selenium_utils import SeleniumHandler
+
+
+class FakeDriver:
+    def __init__(self, profile):
+        self.profile = profile
+        self.quit_called = False
+
+    def quit(self):
+        self.quit_called = True
+
+
+class SlowSpareHandler(SeleniumHandler):
+    """SeleniumHandler whose browsers are stubs; the spare takes boot_seconds to start"""
+
+    def __init__(self, boot_seconds):
+        self.keep_spare = True
+        self.warm_profile = False
+        self.profile_dirs = ["profile-a", "profile-b"]
+        self.active_profile = 0
+        self._spare = None
+        self._spare_thread = None
+        self._closed = False
+        self.restart_count = 0
+        self.boot_seconds = boot_seconds
+        self.booting = {}
+        self.max_booting = 0
+        self.created = []
+        self.lock = threading.Lock()
+        self._init_driver()
+        self._start_spare()
+
+    def _create_driver(self, profile_dir):
+        with self.lock:
+            self.booting[profile_dir] = self.booting.get(profile_dir, 0) + 1
+            self.max_booting = max(self.max_booting, self.booting[profile_dir])
+        if profile_dir != self.profile_dirs[self.active_profile]:
+            time.sleep(self.boot_seconds)
+        driver = FakeDriver(profile_dir)
+        with self.lock:
+            self.booting[profile_dir] -= 1
+            self.created.append(driver)
+        return driver
+
+
+def test_slow_spare_is_not_started_twice_in_the_same_profile(monkeypatch):
+    sleep = time.sleep
+    # Skip the pause before a cold start so the first spare is still booting afterwards
+    monkeypatch.setattr("selenium_utils.time.sleep", lambda seconds: None if seconds == 2 else sleep(seconds))
+    handler = SlowSpareHandler(boot_seconds=0.5)
+    handler._take_spare = lambda timeout=0.05: SeleniumHandler._take_spare(handler, timeout)
+
+    handler._replace_driver()  # the spare is not ready: cold start
+    assert handler.driver.profile == "profile-a"
+    time.sleep(0.7)
+    assert handler.max_booting == 1
+
+    handler._replace_driver()  # the first spare finished in the meantime and is used now
+    assert handler.driver.profile == "profile-b"
+    assert handler.active_profile == 1
+
+
+def test_spare_finishing_after_close_is_quit():
+    handler = SlowSpareHandler(boot_seconds=0.5)
+    handler._take_spare = lambda timeout=0.05: SeleniumHandler._take_spare(handler, timeout)
+    handler.close()
+    time.sleep(0.7)
+    spares = [driver for driver in handler.created if driver.profile == "profile-b"]
+    assert len(spares) == 1 and spares[0].quit_called
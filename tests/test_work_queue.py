@@ -0,0 +1,143 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from work_queue import STATUS_DONE, STATUS_PENDING, LeaseKeeper, WorkQueue
+
+SPAWN = multiprocessing.get_context("spawn")
+
+
+def drain(path, owner):
+    """A main.py instance: claims rows until none is free and returns the ids it processed"""
+    queue = WorkQueue(path, owner=owner)
+    processed = []
+    while (task := queue.claim()) is not None:
+        facility_id, row, token = task
+        queue.submit(facility_id, token, {'Hospital Link': f"https://{row['name']}.org", 'owner': owner})
+        processed.append(facility_id)
+    queue.close()
+    return processed
+
+
+def claim(path, owner, lease_seconds):
+    queue = WorkQueue(path, owner=owner, lease_seconds=lease_seconds)
+    task = queue.claim()
+    queue.close()
+    return task
+
+
+def submit(path, owner, facility_id, token, result):
+    queue = WorkQueue(path, owner=owner)
+    stored = queue.submit(facility_id, token, result)
+    queue.close()
+    return stored
+
+
+def claim_and_die(path, lease_seconds):
+    WorkQueue(path, owner="crashed", lease_seconds=lease_seconds).claim()
+    os._exit(1)
+
+
+def enqueue(path, count, **options):
+    queue = WorkQueue(path, owner="parent", **options)
+    queue.enqueue((str(n), {'name': f"h{n}"}) for n in range(count))
+    return queue
+
+
+def test_processes_share_the_rows_without_overlap(tmp_path):
+    path = str(tmp_path / "queue.db")
+    queue = enqueue(path, 40)
+    with ProcessPoolExecutor(3, mp_context=SPAWN) as pool:
+        processed = [future.result() for future in [pool.submit(drain, path, f"p{n}") for n in range(3)]]
+
+    claimed = [facility_id for ids in processed for facility_id in ids]
+    assert sorted(claimed, key=int) == [str(n) for n in range(40)]
+    assert queue.drained()
+    assert len(queue.results()) == 40
+    queue.close()
+
+
+def test_expired_lease_goes_back_to_the_queue(tmp_path):
+    path = str(tmp_path / "queue.db")
+    queue = enqueue(path, 1, max_attempts=2)
+    process = SPAWN.Process(target=claim_and_die, args=(path, 2))
+    process.start()
+    process.join(30)
+    assert process.exitcode == 1
+    assert claim(path, "other", 0.5) is None  # still leased by the dead process
+
+    time.sleep(2.5)
+    with ProcessPoolExecutor(1, mp_context=SPAWN) as pool:
+        facility_id, row, _ = pool.submit(claim, path, "other", 0.5).result()
+    assert (facility_id, row) == ("0", {'name': "h0"})
+
+    # The second lease runs out too and the row has used its attempts
+    time.sleep(1)
+    assert queue.claim() is None
+    assert queue.results() == {"0": {'Hospital Link': "Error: lease expired"}}
+    queue.close()
+
+
+def test_heartbeat_keeps_the_lease(tmp_path):
+    path = str(tmp_path / "queue.db")
+    queue = enqueue(path, 1, lease_seconds=2)
+    with ProcessPoolExecutor(1, mp_context=SPAWN) as pool:
+        pool.submit(os.getpid).result()  # start the process before the lease clock runs
+        _, _, token = queue.claim()
+        for _ in range(3):
+            time.sleep(1.2)
+            assert queue.heartbeat(token)
+            assert pool.submit(claim, path, "other", 2).result() is None
+
+        time.sleep(2.5)
+        stolen = pool.submit(claim, path, "other", 2).result()
+    assert stolen[0] == "0"
+    # The lease now belongs to the other process
+    assert not queue.heartbeat(token)
+    queue.close()
+
+
+def test_lease_keeper_heartbeats_in_the_background(tmp_path):
+    path = str(tmp_path / "queue.db")
+    queue = enqueue(path, 1, lease_seconds=3)
+    _, _, token = queue.claim()
+    keeper = LeaseKeeper(path, lease_seconds=3)
+    keeper.hold(token)
+    try:
+        time.sleep(4)
+        with ProcessPoolExecutor(1, mp_context=SPAWN) as pool:
+            assert pool.submit(claim, path, "other", 3).result() is None
+    finally:
+        keeper.stop()
+    queue.close()
+
+
+def test_second_result_for_a_row_is_ignored(tmp_path):
+    path = str(tmp_path / "queue.db")
+    queue = enqueue(path, 1)
+    with ProcessPoolExecutor(2, mp_context=SPAWN) as pool:
+        _, _, slow_token = pool.submit(claim, path, "slow", 0.2).result()
+        time.sleep(0.5)  # the slow process is still working when its lease runs out
+        _, _, fast_token = pool.submit(claim, path, "fast", 300).result()
+
+        assert pool.submit(submit, path, "fast", "0", fast_token, {'Hospital Link': "https://fast.org"}).result()
+        assert not pool.submit(submit, path, "slow", "0", slow_token, {'Hospital Link': "https://slow.org"}).result()
+    assert queue.results() == {"0": {'Hospital Link': "https://fast.org"}}
+    queue.close()
+
+
+def test_error_returns_the_row_until_its_attempts_are_used(tmp_path):
+    path = str(tmp_path / "queue.db")
+    queue = enqueue(path, 1, max_attempts=2)
+    error = {'Hospital Link': "Error: search failed"}
+    with ProcessPoolExecutor(2, mp_context=SPAWN) as pool:
+        _, _, token = pool.submit(claim, path, "p0", 300).result()
+        assert not pool.submit(submit, path, "p0", "0", token, error).result()
+        assert queue.counts()[STATUS_PENDING] == 1
+
+        _, _, token = pool.submit(claim, path, "p1", 300).result()
+        assert pool.submit(submit, path, "p1", "0", token, error).result()
+    assert queue.counts()[STATUS_DONE] == 1
+    assert queue.results() == {"0": error}
+    assert queue.claim() is None
+    queue.close()
@@ -0,0 +1,90 @@
+import os
+import time
+from worker_pool import WorkerPool
+
+
+def flaky_worker(worker_id, task_queue, result_queue, headless, handler_options, budget_options):
+    """Stands in for _worker; dies right after taking row 2 the first time, before reporting it"""
+    marker = os.path.join(handler_options['tmp_dir'], "crashed")
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        index, row = task
+        if index == 2 and not os.path.exists(marker):
+            open(marker, "w").close()
+            os._exit(1)
+        result_queue.put(('start', worker_id, index, None))
+        result_queue.put(('done', worker_id, index, {'Hospital Link': f"https://{row['name']}.org"}))
+
+
+class FlakyPool(WorkerPool):
+    worker_target = staticmethod(flaky_worker)
+
+
+def test_row_taken_by_a_worker_that_died_before_reporting_it_is_retried(tmp_path):
+    pool = FlakyPool(2, handler_options={'tmp_dir': str(tmp_path)})
+    rows = [(index, {'name': f"h{index}"}) for index in range(5)]
+
+    started = time.monotonic()
+    results = list(pool.run(rows))
+
+    assert [index for index, _ in results] == [0, 1, 2, 3, 4]
+    assert results[2][1] == {'Hospital Link': "https://h2.org"}
+    assert pool.respawn_count == 1
+    assert time.monotonic() - started < 30
+
+
+def slow_worker(worker_id, task_queue, result_queue, headless, handler_options, budget_options):
+    """Row 0 is reported only after a long silence (a slow driver start); every run of a row is recorded"""
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        index, row = task
+        open(os.path.join(handler_options['tmp_dir'], f"run-{index}-{worker_id}"), "w").close()
+        if index == 0:
+            time.sleep(8)
+        result_queue.put(('start', worker_id, index, None))
+        result_queue.put(('done', worker_id, index, {'Hospital Link': f"https://{row['name']}.org"}))
+
+
+class SlowPool(WorkerPool):
+    worker_target = staticmethod(slow_worker)
+
+
+def test_row_of_a_slow_live_worker_is_not_run_twice(tmp_path):
+    pool = SlowPool(2, handler_options={'tmp_dir': str(tmp_path)})
+    results = list(pool.run((index, {'name': f"h{index}"}) for index in range(3)))
+
+    assert [index for index, _ in results] == [0, 1, 2]
+    assert sorted(name.rsplit("-", 1)[0] for name in os.listdir(tmp_path)) == ["run-0", "run-1", "run-2"]
+    assert pool.respawn_count == 0
+
+
+def crashing_worker(worker_id, task_queue, result_queue, headless, handler_options, budget_options):
+    """Dies on row 1 after reporting that it started it"""
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        index, row = task
+        result_queue.put(('start', worker_id, index, None))
+        if index == 1:
+            time.sleep(0.5)  # let the start message reach the parent
+            os._exit(1)
+        result_queue.put(('done', worker_id, index, {'Hospital Link': f"https://{row['name']}.org"}))
+
+
+class CrashingPool(WorkerPool):
+    worker_target = staticmethod(crashing_worker)
+
+
+def test_row_that_kills_its_worker_fails_after_its_attempts():
+    pool = CrashingPool(2, max_row_attempts=2)
+    results = dict(pool.run((index, {'name': f"h{index}"}) for index in range(3)))
+
+    assert results[1]['Hospital Link'] == "Error: worker crashed"
+    assert results[0] == {'Hospital Link': "https://h0.org"}
+    assert results[2] == {'Hospital Link': "https://h2.org"}
+    assert pool.respawn_count == 2
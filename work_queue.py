@@ -0,0 +1,251 @@
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from result_journal import is_finished
+
+
+# A claimed row is handed to another worker when its lease runs out without a heartbeat
+LEASE_SECONDS = 300
+MAX_ROW_ATTEMPTS = 2
+
+STATUS_PENDING = "pending"
+STATUS_LEASED = "leased"
+STATUS_DONE = "done"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    facility_id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    row TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    owner TEXT,
+    lease_token TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS tasks_claim ON tasks (status, lease_until, position);
+"""
+
+
+def default_owner():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """
+    Facility rows shared by any number of main.py processes on one machine, or on several
+    that share the database file over a filesystem with working POSIX locks.
+    Rows are claimed under a lease that the claimer keeps alive with heartbeats; rows whose
+    lease expires (crashed process, lost host) go back to pending. The first finished result
+    for a row wins and later submissions of the same row are ignored, so a row processed
+    twice after an expired lease still ends up in the output once.
+    """
+
+    def __init__(self, path, owner=None, lease_seconds=LEASE_SECONDS, max_attempts=MAX_ROW_ATTEMPTS):
+        self.path = path
+        self.owner = owner or default_owner()
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Autocommit; writes take the database lock explicitly with BEGIN IMMEDIATE.
+        # The lock is a POSIX file lock: safe between processes of one host, and across hosts
+        # only on a filesystem whose locks work between them (many NFS/SMB mounts do not).
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+
+    def _transaction(self, work):
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            value = work()
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+        return value
+
+    def enqueue(self, rows):
+        """
+        rows: iterable of (facility_id, row) pairs. Rows already in the queue are left alone,
+        so every process can enqueue the same input list. Returns the number of new rows.
+        """
+        def insert():
+            start = self.conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM tasks").fetchone()[0]
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO tasks (facility_id, position, row, updated_at) VALUES (?, ?, ?, ?)",
+                ((str(facility_id), start + n, json.dumps(row, default=str), time.time())
+                 for n, (facility_id, row) in enumerate(rows)),
+            )
+            return self.conn.total_changes - before
+        return self._transaction(insert)
+
+    def _expire_leases(self, now):
+        """Re-queue rows whose lease ran out, or fail them once they have used all their attempts"""
+        expired = self.conn.execute(
+            "SELECT facility_id, owner, attempts FROM tasks WHERE status = ? AND lease_until < ?",
+            (STATUS_LEASED, now),
+        ).fetchall()
+        for facility_id, owner, attempts in expired:
+            if attempts < self.max_attempts:
+                print(f"Lease of {owner} on facility {facility_id} expired, re-queueing")
+                self.conn.execute(
+                    "UPDATE tasks SET status = ?, owner = NULL, lease_token = NULL, lease_until = NULL, "
+                    "updated_at = ? WHERE facility_id = ?", (STATUS_PENDING, now, facility_id))
+            else:
+                print(f"Lease of {owner} on facility {facility_id} expired after {attempts} attempts, giving up")
+                result = json.dumps({'Hospital Link': "Error: lease expired"})
+                self.conn.execute(
+                    "UPDATE tasks SET status = ?, result = ?, lease_token = NULL, lease_until = NULL, "
+                    "updated_at = ? WHERE facility_id = ?", (STATUS_DONE, result, now, facility_id))
+
+    def claim(self):
+        """Lease the next pending row. Returns (facility_id, row, lease_token), or None if none is free"""
+        def take():
+            now = time.time()
+            self._expire_leases(now)
+            task = self.conn.execute(
+                "SELECT facility_id, row FROM tasks WHERE status = ? ORDER BY position LIMIT 1", (STATUS_PENDING,)
+            ).fetchone()
+            if task is None:
+                return None
+            token = uuid.uuid4().hex
+            self.conn.execute(
+                "UPDATE tasks SET status = ?, owner = ?, lease_token = ?, lease_until = ?, attempts = attempts + 1, "
+                "updated_at = ? WHERE facility_id = ?",
+                (STATUS_LEASED, self.owner, token, now + self.lease_seconds, now, task[0]),
+            )
+            return task[0], json.loads(task[1]), token
+        return self._transaction(take)
+
+    def heartbeat(self, token):
+        """Extend a lease. Returns False if it was lost (expired and handed to someone else)"""
+        now = time.time()
+        cursor = self.conn.execute(
+            "UPDATE tasks SET lease_until = ?, updated_at = ? WHERE lease_token = ? AND status = ?",
+            (now + self.lease_seconds, now, token, STATUS_LEASED),
+        )
+        return cursor.rowcount == 1
+
+    def submit(self, facility_id, token, result):
+        """
+        Record the result of a claimed row. Returns True if it was stored.
+        A finished result is kept even when the lease was lost, unless the row is already done;
+        an error only counts while the lease is still held, and sends the row back to pending
+        until it has used its attempts.
+        """
+        facility_id = str(facility_id)
+
+        def store():
+            task = self.conn.execute(
+                "SELECT status, lease_token, attempts FROM tasks WHERE facility_id = ?", (facility_id,)
+            ).fetchone()
+            if task is None or task[0] == STATUS_DONE:
+                return False
+            status, lease_token, attempts = task
+            now = time.time()
+            if is_finished(result) or (lease_token == token and attempts >= self.max_attempts):
+                self.conn.execute(
+                    "UPDATE tasks SET status = ?, result = ?, lease_token = NULL, lease_until = NULL, "
+                    "updated_at = ? WHERE facility_id = ?",
+                    (STATUS_DONE, json.dumps(result, default=str), now, facility_id),
+                )
+                return True
+            if lease_token == token:
+                self.conn.execute(
+                    "UPDATE tasks SET status = ?, owner = NULL, lease_token = NULL, lease_until = NULL, "
+                    "updated_at = ? WHERE facility_id = ?", (STATUS_PENDING, now, facility_id))
+            return False
+        return self._transaction(store)
+
+    def counts(self):
+        """{status: rows}, with expired leases still counted as leased until the next claim"""
+        counts = {STATUS_PENDING: 0, STATUS_LEASED: 0, STATUS_DONE: 0}
+        counts.update(self.conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+        return counts
+
+    def drained(self):
+        """True when no row is pending or leased by anyone"""
+        counts = self.counts()
+        return counts[STATUS_PENDING] == 0 and counts[STATUS_LEASED] == 0
+
+    def results(self):
+        """{facility_id: result} of every finished row, in the shape load_journal returns"""
+        rows = self.conn.execute(
+            "SELECT facility_id, result FROM tasks WHERE status = ? ORDER BY position", (STATUS_DONE,)
+        ).fetchall()
+        return {facility_id: json.loads(result) for facility_id, result in rows}
+
+    def close(self):
+        self.conn.close()
+
+
+class LeaseKeeper:
+    """
+    Background thread that heartbeats the leases of rows being processed, so a row that takes
+    longer than the lease (slow searches, CAPTCHA backoff) is not handed to another worker.
+    Uses its own connection so heartbeats never wait on the worker's.
+    """
+
+    def __init__(self, path, lease_seconds=LEASE_SECONDS):
+        self.queue = WorkQueue(path, lease_seconds=lease_seconds)
+        self.interval = max(lease_seconds / 3, 1)
+        self.tokens = set()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def hold(self, token):
+        with self.lock:
+            self.tokens.add(token)
+
+    def release(self, token):
+        with self.lock:
+            self.tokens.discard(token)
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            with self.lock:
+                tokens = list(self.tokens)
+            for token in tokens:
+                try:
+                    if not self.queue.heartbeat(token):
+                        print(f"Lease {token} was lost")
+                except sqlite3.Error as e:
+                    print(f"Heartbeat failed: {e}")
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join(timeout=5)
+        self.queue.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the progress of a shared work queue")
+    parser.add_argument("path", help="Queue database passed to main.py --queue")
+    args = parser.parse_args()
+
+    queue = WorkQueue(args.path)
+    counts = queue.counts()
+    owners = queue.conn.execute(
+        "SELECT owner, COUNT(*) FROM tasks WHERE status = ? GROUP BY owner", (STATUS_LEASED,)
+    ).fetchall()
+    queue.close()
+
+    total = sum(counts.values())
+    print(f"{counts[STATUS_DONE]} of {total} rows done, {counts[STATUS_LEASED]} leased, "
+          f"{counts[STATUS_PENDING]} pending")
+    for owner, leased in owners:
+        print(f"  {owner}: {leased} leased")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,295 @@
+import collections
+import multiprocessing
+import queue
+import time
+from selenium_utils import SeleniumHandler
+from pipeline import ErrorBudget, empty_result, facility_id_for, is_driver_error, process_row
+from cms_discovery import load_probe_results
+from metrics import get_metrics
+from work_queue import LEASE_SECONDS, LeaseKeeper, WorkQueue, default_owner
+
+
+def _process_task(worker_id, selenium, index, row, probe_results, domain_cache, budget):
+    """Process one row with the worker's driver and return its result, errors included"""
+    metrics = get_metrics()
+    print(f"[worker {worker_id}] Row {index}: {row['Facility Name']} {row['City/Town']}")
+
+    metrics.start("row", [facility_id_for(row, index)], worker=worker_id)
+    status = "ok"
+    try:
+        selenium.ensure_driver()
+        result = process_row(selenium, row, probe_results, domain_cache)
+        selenium.record_success()
+        budget.record(True)
+    except Exception as e:
+        status = "error"
+        print(f"[worker {worker_id}] Error processing row {index}: {e}")
+        result = empty_result()
+        result['Hospital Link'] = f"Error: {str(e)}"
+        selenium.record_error()
+        budget.record(False)
+
+        if is_driver_error(e):
+            print(f"[worker {worker_id}] Driver-related error detected. Restarting driver...")
+            selenium.restart_driver()
+    return result, status
+
+
+def _worker(worker_id, task_queue, result_queue, headless, handler_options, budget_options):
+    """Worker process: owns one SeleniumHandler and processes rows from the task queue"""
+    selenium = SeleniumHandler(headless=headless, **handler_options)
+    probe_results = load_probe_results()
+    domain_cache = {}
+    budget = ErrorBudget(**budget_options)
+
+    try:
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+
+            index, row = task
+            result_queue.put(('start', worker_id, index, None))
+            result, status = _process_task(worker_id, selenium, index, row, probe_results, domain_cache, budget)
+            result_queue.put(('done', worker_id, index, result))
+
+            # Restart the driver only when it has grown too large or keeps failing
+            selenium.recycle_if_needed()
+            get_metrics().finish(status)
+
+            # Retire this worker; the parent spawns a fresh one in its place
+            reason = budget.exhausted()
+            if reason:
+                print(f"[worker {worker_id}] Error budget exhausted ({reason}). Retiring worker.")
+                break
+    finally:
+        try:
+            selenium.close()
+        except:
+            pass
+
+
+def queue_worker(worker_id, queue_path, headless, handler_options, budget_options, lease_seconds=LEASE_SECONDS,
+                 poll_seconds=30):
+    """
+    Claim rows from a shared WorkQueue until it is drained. Leases are heartbeated while a row
+    is processed; rows leased by other processes are waited for, since their lease may expire
+    and come back to this worker. Returns when the queue is drained or the error budget is spent.
+    """
+    work_queue = WorkQueue(queue_path, owner=f"{default_owner()}:{worker_id}", lease_seconds=lease_seconds)
+    keeper = LeaseKeeper(queue_path, lease_seconds)
+    selenium = SeleniumHandler(headless=headless, **handler_options)
+    probe_results = load_probe_results()
+    domain_cache = {}
+    budget = ErrorBudget(**budget_options)
+
+    try:
+        while True:
+            task = work_queue.claim()
+            if task is None:
+                if work_queue.drained():
+                    break
+                time.sleep(poll_seconds)
+                continue
+
+            facility_id, row, token = task
+            keeper.hold(token)
+            try:
+                result, status = _process_task(worker_id, selenium, facility_id, row, probe_results,
+                                               domain_cache, budget)
+            finally:
+                keeper.release(token)
+            if not work_queue.submit(facility_id, token, result):
+                print(f"[worker {worker_id}] Result for facility {facility_id} not stored (done elsewhere or retried)")
+
+            selenium.recycle_if_needed()
+            get_metrics().finish(status)
+
+            reason = budget.exhausted()
+            if reason:
+                print(f"[worker {worker_id}] Error budget exhausted ({reason}). Leaving the queue.")
+                break
+    finally:
+        keeper.stop()
+        work_queue.close()
+        try:
+            selenium.close()
+        except:
+            pass
+
+
+class WorkerPool:
+    """
+    Runs N isolated SeleniumHandler instances in separate processes.
+    The parent hands each idle worker one row at a time through the worker's own task queue
+    and records that claim, so it always knows which process holds which row. Results are
+    yielded back in input order. Workers that exit are replaced and the row they held is
+    re-queued once they are gone.
+    """
+
+    # Process entry point; run with (worker_id, task_queue, result_queue, headless, handler_options, budget_options)
+    worker_target = staticmethod(_worker)
+
+    def __init__(self, workers, headless=True, max_respawns=None, max_row_attempts=2, handler_options=None,
+                 budget_options=None):
+        self.workers = workers
+        self.headless = headless
+        self.handler_options = handler_options or {}
+        self.budget_options = budget_options or {}
+        self.max_respawns = max_respawns if max_respawns is not None else workers * 3
+        self.max_row_attempts = max_row_attempts
+
+        # Chrome does not survive fork() well, always start workers fresh
+        self.ctx = multiprocessing.get_context("spawn")
+        self.result_queue = self.ctx.Queue()
+        self.processes = {}
+        self.task_queues = {}
+        # worker_id -> [index, started] of the row that worker holds
+        self.claims = {}
+        self.pending = collections.deque()
+        self.respawn_count = 0
+        self._next_worker_id = 0
+
+    def _spawn(self):
+        worker_id = self._next_worker_id
+        self._next_worker_id += 1
+        task_queue = self.ctx.Queue()
+        process = self.ctx.Process(
+            target=self.worker_target,
+            args=(worker_id, task_queue, self.result_queue, self.headless,
+                  self.handler_options, self.budget_options),
+            daemon=True,
+        )
+        process.start()
+        self.processes[worker_id] = process
+        self.task_queues[worker_id] = task_queue
+        return worker_id
+
+    def _dispatch(self):
+        """Hand the next pending rows to workers that hold none"""
+        for worker_id in self.processes:
+            if not self.pending:
+                return
+            if worker_id not in self.claims:
+                index = self.pending.popleft()
+                self.claims[worker_id] = [index, False]
+                self.task_queues[worker_id].put((index, self._rows[index]))
+
+    def _retry_or_fail(self, index, attempts, buffer, finished):
+        """Re-queue a row whose worker died, or fail it once it has used its attempts"""
+        if attempts[index] < self.max_row_attempts:
+            self.pending.appendleft(index)
+        else:
+            result = empty_result()
+            result['Hospital Link'] = "Error: worker crashed"
+            buffer[index] = result
+            finished.add(index)
+
+    def _handle(self, message, attempts, buffer, finished):
+        kind, worker_id, index, result = message
+        claim = self.claims.get(worker_id)
+        if claim is None or claim[0] != index:
+            # Only the claim of a worker that was reaped can be gone
+            return
+        if kind == 'start':
+            claim[1] = True
+            attempts[index] += 1
+        elif kind == 'done':
+            del self.claims[worker_id]
+            if index not in finished:
+                buffer[index] = result
+                finished.add(index)
+
+    def _drain_results(self, attempts, buffer, finished):
+        """Handle every message already sent, so a dead worker's last reports are seen before its claim"""
+        while True:
+            try:
+                message = self.result_queue.get_nowait()
+            except queue.Empty:
+                return
+            self._handle(message, attempts, buffer, finished)
+
+    def _reap_dead_workers(self, attempts, buffer, finished):
+        """Detect exited workers, re-queue the row they held and spawn replacements"""
+        dead = [worker_id for worker_id, process in self.processes.items() if not process.is_alive()]
+        if dead:
+            self._drain_results(attempts, buffer, finished)
+
+        for worker_id in dead:
+            process = self.processes.pop(worker_id)
+            self.task_queues.pop(worker_id).cancel_join_thread()
+            claim = self.claims.pop(worker_id, None)
+            if claim is not None and claim[0] not in finished:
+                index, started = claim
+                if started:
+                    print(f"Worker {worker_id} exited (code {process.exitcode}) while processing row {index}")
+                    self._retry_or_fail(index, attempts, buffer, finished)
+                else:
+                    # Taken but never started (a retiring worker, or a crash right after get()):
+                    # the row did not get its attempt
+                    print(f"Worker {worker_id} exited before starting row {index}, re-queueing it")
+                    self.pending.appendleft(index)
+
+            if self.respawn_count < self.max_respawns:
+                self.respawn_count += 1
+                new_id = self._spawn()
+                print(f"Spawned worker {new_id} to replace worker {worker_id}")
+
+    def run(self, rows):
+        """
+        rows: iterable of (index, row) pairs where row is a dict-like with the input columns.
+        Yields (index, result) in the same order as the input.
+        """
+        self._rows = {}
+        order = []
+        for index, row in rows:
+            self._rows[index] = dict(row)
+            order.append(index)
+        self.pending.extend(order)
+
+        attempts = {index: 0 for index in order}
+        buffer = {}
+        finished = set()
+        next_pos = 0
+
+        for _ in range(min(self.workers, len(order))):
+            self._spawn()
+
+        try:
+            while next_pos < len(order):
+                self._dispatch()
+                try:
+                    message = self.result_queue.get(timeout=5)
+                except queue.Empty:
+                    pass
+                else:
+                    self._handle(message, attempts, buffer, finished)
+
+                self._reap_dead_workers(attempts, buffer, finished)
+                if not self.processes and len(finished) < len(order):
+                    print("No workers left. Marking remaining rows as failed.")
+                    for index in order:
+                        if index not in finished:
+                            result = empty_result()
+                            result['Hospital Link'] = "Error: no workers available"
+                            buffer[index] = result
+                            finished.add(index)
+
+                # Release results in input order
+                while next_pos < len(order) and order[next_pos] in buffer:
+                    index = order[next_pos]
+                    yield index, buffer.pop(index)
+                    next_pos += 1
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        for task_queue in self.task_queues.values():
+            task_queue.put(None)
+        for process in self.processes.values():
+            process.join(timeout=30)
+            if process.is_alive():
+                process.terminate()
+        self.processes = {}
+        self.task_queues = {}
+        self.claims = {}